@@ -3,9 +3,62 @@
 
 import atexit
 import os
+import sys
+import time
+
+_IMPORT_START = time.perf_counter()  # taken before the app modules are imported, the start of the startup report
 
-from src.UI.FFTJScreen import FFTJUI
 from src.utils.AppDataConfig.Datafolder import DataFolder
+from src.utils.Language.LanguageCompiler import LanguageCompiler
+
+
+class StartupTimer:
+    """
+    Class used to time the stages of the app starting up
+    (Note: the report is only printed when the FFTJ_STARTUP_REPORT environment variable is set, run with
+    python -X importtime Start.py for a per module breakdown of the import stage)
+
+    ...
+
+    Attributes
+    ----------
+    ENV_VAR -> str
+        the environment variable that enables the report
+    enabled -> bool
+        if the report will be printed
+
+    Methods
+    -------
+    mark(stage: str)
+        records the time the given stage finished
+    report()
+        prints the duration of every stage to stderr
+    """
+
+    ENV_VAR: str = "FFTJ_STARTUP_REPORT"
+
+    def __init__(self, start: float):
+
+        self._start = start
+        self._marks: list[tuple[str, float]] = []
+        self._enabled = bool(os.environ.get(self.ENV_VAR))
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def mark(self, stage: str):
+        self._marks.append((stage, time.perf_counter()))
+
+    def report(self):
+        if not self._enabled:
+            return
+        print("Startup report:", file=sys.stderr)
+        previous = self._start
+        for stage, mark in self._marks:
+            print(f"  {stage:<28} {(mark - previous) * 1000:>8.1f}ms {(mark - self._start) * 1000:>8.1f}ms",
+                  file=sys.stderr)
+            previous = mark
 
 
 class FFTJAppManager:
@@ -14,13 +67,23 @@ class FFTJAppManager:
 
         self.VERSION = v
         self._status: int = -1
+        self.STARTUP_TIMER: StartupTimer = StartupTimer(_IMPORT_START)
         self.DATAFOLDER: DataFolder = DataFolder()
 
+        LanguageCompiler.set_disk_cache(os.path.join(self.DATAFOLDER.cache_folder, "languages"))
+
         atexit.register(self._clean_temp_folder)  # Clean temp folder when program exits
+        atexit.register(self.DATAFOLDER.config.flush)  # Save any config changes still waiting to be written
+        self.STARTUP_TIMER.mark("import core, data folder")
+
+        from src.UI.FFTJScreen import FFTJUI  # imported here so the report can time the UI imports separately
+        self.STARTUP_TIMER.mark("import ui")
 
         self.CLIENT: FFTJUI = FFTJUI(self)
 
     def _clean_temp_folder(self):
+        if not os.path.isdir(self.datafolder.temp_folder):
+            return
         files = os.listdir(self.datafolder.temp_folder)
         for file in files:
             fp = os.path.join(self.datafolder.temp_folder, file)
@@ -41,3 +104,7 @@ class FFTJAppManager:
     @property
     def datafolder(self) -> DataFolder:
         return self.DATAFOLDER
+
+    @property
+    def startup_timer(self) -> StartupTimer:
+        return self.STARTUP_TIMER
@@ -3,29 +3,32 @@
 
 import math
 import os
+from collections.abc import Callable
 from functools import cache
+from typing import TYPE_CHECKING
 from tkinter import *
 from tkinter.ttk import Combobox
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from PIL import ImageTk, Image as PILImage
 
-from src.UI.RegularExpressonEditor import RegexEditorUI
 from src.utils.Automata.AutomataLink import AutomataLink
 from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
-from src.utils.Automata.DFA import DeterministicFiniteAutomaton
 from src.utils.Automata.NDFA import NonDeterministicFiniteAutomaton
-from src.utils.IO.AutomatonFile import AutomatonFile
-from src.utils.Language.LanguageScript import LanguageScriptFile
-from src.utils.LayoutEngine.ForceDirected import ForceDirectedLayout
+from src.utils.Automata.UndoHistory import UndoHistory
 from src.utils.LayoutEngine.TransitionRenderer import TransitionManager, RenderedTransition
 from src.utils.TkUtils.DragAndDrop import DropZone, DragAndDropRoundedButton, DragManager, DragAndDropTransparentButton, \
     DDRenderable
 from src.utils.TkUtils.FloatingMenu import CustomMenu
-from src.utils.TkUtils.RealTimeUpdateManager import RealTimeUpdateManager, PulseColour
+from src.utils.TkUtils.RealTimeUpdateManager import RealTimeUpdateManager, PulseColour, LayoutAnimation
 from src.utils.TkUtils.RoundedButton import RoundedButton
 from src.utils.TkUtils.Tooltip import ToolTip
 from src.utils.TkUtils.TransparentButton import TransparentButton, TBCompound
 
+if TYPE_CHECKING:  # imported where they are first used, none of them are needed to show the editor
+    from src.utils.IO.AutomatonJournal import AutomatonJournal
+    from src.utils.LayoutEngine.ForceDirected import ForceDirectedLayout
+    from src.utils.LayoutEngine.LayoutWorker import LayoutWorker
+
 
 class EditorMouseMode:  # Enum to make mouse changes easier to manage
     SELECT, TRANSITION_DRAW = range(2)
@@ -44,6 +47,10 @@ class FFTJUI(Tk):
 
     DEFAULT_FONT: str = "Bahnschrift"
 
+    MAX_RECENT_FILES: int = 10
+    LAYOUT_TIME_BUDGET_MS: float = 1000  # a layout that has not converged by then is shown as it is
+    LAYOUT_PADDING: int = 60  # the space left between a new layout and the edges of the drop zone
+
     def __init__(self, runtime):
         super().__init__()
 
@@ -60,6 +67,7 @@ class FFTJUI(Tk):
         # Setup managers
         self._update_manager = RealTimeUpdateManager(self.screen)
         self._screen_drag_manager = DragManager(self, self.screen)
+        self._layout_worker: LayoutWorker | None = None  # lays out automata without blocking the update loop
 
         self.STATE_IMAGE_FP = os.path.join(self._runtime.datafolder.image_folder, "State.png")
         self.INITIAL_STATE_IMAGE_FP = os.path.join(self._runtime.datafolder.image_folder, "InitialState.png")
@@ -72,6 +80,10 @@ class FFTJUI(Tk):
         self._drop_zone_zoom: float = 0.0
         self._running: bool = True
         self._current_automaton: AutomatonBuilder = AutomatonBuilder()
+        self._journal: AutomatonJournal | None = None  # autosaves the current automaton once it has a file
+        self._layout_unsaved: bool = False  # whether states have moved since the journal last saved their positions
+        self._keep_layout_positions: bool = False  # whether the running layout's positions are shown unscaled
+        self._history: UndoHistory = UndoHistory(self._current_automaton)
         self._visible_state_table: dict[str: TransparentButton] = {}  # state_id: tb_tag
         self._current_cursor_type: int = EditorMouseMode.SELECT
 
@@ -82,19 +94,21 @@ class FFTJUI(Tk):
         self._drop_zone = DropZone(self.screen, width=730, height=480, bg=self.COLOUR_PALLET[0], highlightthickness=0)
         self._transition_manager = TransitionManager(self, self._drop_zone)
 
-        # Render Sections
-        self._file_section()
-        self._edit_section()
-        self._automata_edit_section()
-        self._automata_build_zone()
-
-        self._set_cursor_type(EditorMouseMode.SELECT)  # Initialise Cursor Buttons
-
-        # load previous automaton
-        self._load_open_automaton()
+        # Render Sections (one per idle callback so the window is shown before the rest of the UI is built)
+        self._pending_sections: list[tuple[str, Callable[[], None]]] = [
+            ("file section", self._file_section),
+            ("edit section", self._edit_section),
+            ("automaton section", self._automata_edit_section),
+            ("cursor buttons", lambda: self._set_cursor_type(EditorMouseMode.SELECT)),  # Initialise Cursor Buttons
+            ("build zone", self._automata_build_zone),
+            ("load open automaton", self._load_open_automaton)
+        ]
 
         self.protocol("WM_DELETE_WINDOW", self.close)
         self.tkraise()
+        self.update_idletasks()  # map the window
+        self._runtime.startup_timer.mark("window")
+        self.after_idle(self._build_next_section)
         try:
             self.update_loop()
         except TclError:
@@ -113,30 +127,38 @@ class FFTJUI(Tk):
         return self._running
 
     def update_loop(self):
+        config = self._runtime.datafolder.config
         while self._running:  # Main application loop
             self._update_manager.update()
+            config.flush_if_due()  # config changes are written once they stop changing, not on every change
             self.update()
 
     def close(self):
         self._running = False
+        self._cancel_layout()
+        self._runtime.datafolder.config.flush()
+        if self._journal is not None:
+            if self._layout_unsaved:
+                self._journal.compact()  # moving states is not journaled, the snapshot keeps them until a save
+            self._journal.close()
         self.destroy()
 
-    def _load_images(self):
-        self._state_image_raw = PILImage.open(self.STATE_IMAGE_FP)
-        self._state_image = self._state_image_raw
-        self._state_image_tk = ImageTk.PhotoImage(self._state_image_raw)
-
-        self._initial_state_image_raw = PILImage.open(self.INITIAL_STATE_IMAGE_FP)
-        self._initial_state_image = self._initial_state_image_raw
-        self._initial_state_image_tk = ImageTk.PhotoImage(self._initial_state_image_raw)
-
-        self._final_state_image_raw = PILImage.open(self.FINAL_STATE_IMAGE_FP)
-        self._final_state_image = self._final_state_image_raw
-        self._final_state_image_tk = ImageTk.PhotoImage(self._final_state_image_raw)
+    def _build_next_section(self):
+        if not self._running:
+            return
+        stage, build_section = self._pending_sections.pop(0)
+        build_section()
+        self._runtime.startup_timer.mark(stage)
+        if self._pending_sections:
+            self.after_idle(self._build_next_section)
+        else:
+            self._runtime.startup_timer.report()
 
-        self._initial_final_state_image_raw = PILImage.open(self.INITIAL_FINAL_STATE_IMAGE_FP)
-        self._initial_final_state_image = self._initial_final_state_image_raw
-        self._initial_final_state_image_tk = ImageTk.PhotoImage(self._initial_final_state_image_raw)
+    def _load_images(self):
+        # State images are only opened and resized when the first state is drawn (see _load_state_images)
+        self._state_image_raw: PILImage.Image | None = None
+        self._state_images_zoom: float = 0  # the zoom the state images should be sized for
+        self._loaded_state_images_zoom: float | None = None  # the zoom the state images are currently sized for
 
         self._select_cursor_image = PILImage.open(self.SELECT_CURSOR_IMAGE_FP)
         self._select_cursor_image = self._select_cursor_image.resize((20, 30))
@@ -146,26 +168,70 @@ class FFTJUI(Tk):
         self._cross_cursor_image = self._cross_cursor_image.resize((30, 30))
         self._cross_cursor_image_tk = ImageTk.PhotoImage(self._cross_cursor_image)
 
+    def _load_state_images(self):
+        if self._loaded_state_images_zoom == self._state_images_zoom:
+            return
+        if self._state_image_raw is None:
+            self._state_image_raw = PILImage.open(self.STATE_IMAGE_FP)
+            self._initial_state_image_raw = PILImage.open(self.INITIAL_STATE_IMAGE_FP)
+            self._final_state_image_raw = PILImage.open(self.FINAL_STATE_IMAGE_FP)
+            self._initial_final_state_image_raw = PILImage.open(self.INITIAL_FINAL_STATE_IMAGE_FP)
+
+        zoom_factor = self._state_images_zoom
+        square_w_h = int((100 * (zoom_factor - 10)) / (zoom_factor - 12))
+        rect_w = int((125 * (zoom_factor - 10)) / (zoom_factor - 12))
+
+        self._state_image = self._state_image_raw.resize((square_w_h, square_w_h))
+        self._state_image_tk = ImageTk.PhotoImage(self._state_image)
+
+        self._initial_state_image = self._initial_state_image_raw.resize((rect_w, square_w_h))
+        self._initial_state_image_tk = ImageTk.PhotoImage(self._initial_state_image)
+
+        self._final_state_image = self._final_state_image_raw.resize((square_w_h, square_w_h))
+        self._final_state_image_tk = ImageTk.PhotoImage(self._final_state_image)
+
+        self._initial_final_state_image = self._initial_final_state_image_raw.resize((rect_w, square_w_h))
+        self._initial_final_state_image_tk = ImageTk.PhotoImage(self._initial_final_state_image)
+
+        self._loaded_state_images_zoom = zoom_factor
+
     def _load_open_automaton(self):
         automaton_fp = self._runtime.datafolder.config.getValue("current_file")
-        if automaton_fp == "":
+        if automaton_fp == "" or not os.path.exists(automaton_fp):
             return
-        automaton_file = AutomatonFile(automaton_fp)
-        automaton_alphabet = automaton_file.get_alphabet()
-        automaton_states, final_states, initial_states = automaton_file.get_states()
-        automaton_transitions = automaton_file.get_transitions(automaton_states)
-        if automaton_file.is_deterministic():
-            finite_automata = DeterministicFiniteAutomaton(automaton_states, automaton_alphabet, automaton_transitions, initial_states, final_states)
-        else:
-            finite_automata = NonDeterministicFiniteAutomaton(automaton_states, automaton_alphabet, automaton_transitions, initial_states, final_states)
-        automaton_builder = AutomatonBuilder.get_builder_from_finite_automata(finite_automata)
-        self.new_automata(automaton_builder)
+        from src.utils.IO.AutomatonJournal import AutomatonJournal
+
+        # also recovers edits left in the journal by a crash
+        self._journal = AutomatonJournal.open(automaton_fp, get_positions=self._layout_positions)
+        saved_positions = self._journal.saved_positions
+        self.new_automata(self._journal.builder, undoable=False, initial_positions=saved_positions or None,
+                          keep_positions=bool(saved_positions))
+
+    def _remember_file(self, fp: str):
+        # Makes fp the current file and moves it to the top of the recent files (saved by the write behind config)
+        config = self._runtime.datafolder.config
+        recent_files = [recent_fp for recent_fp in config.getValue("recent_files") if recent_fp != fp]
+        recent_files.insert(0, fp)
+        del recent_files[self.MAX_RECENT_FILES:]
+        config.setValue("recent_files", recent_files)
+        config.setValue("current_file", fp)
+        self._recent_files_dropdown["values"] = recent_files
 
     def open_file(self, e: Event, fp: str | None = None):
         pass
 
     def save_current_file(self, e: Event):
-        pass
+        if self._journal is None:
+            from src.utils.IO.AutomatonJournal import AutomatonJournal
+
+            fp = filedialog.asksaveasfilename(defaultextension=".automaton",
+                                              filetypes=[("Automaton files", "*.automaton")])
+            if not fp:
+                return
+            self._journal = AutomatonJournal(fp, self._current_automaton, get_positions=self._layout_positions)
+        self._journal.save()
+        self._layout_unsaved = False
+        self._remember_file(self._journal.fp)
 
     def open_recent_file(self, e: Event, fp: str):
         pass
@@ -192,9 +258,9 @@ class FFTJUI(Tk):
         self.screen.create_text(50, 120, text="Recent Files:", fill=self.TEXT_DARK_COL, font=(self.DEFAULT_FONT, 10))
         recent_files_options = self._runtime.datafolder.config.getValue("recent_files")
         self._recent_files_dropdown_var = StringVar(value="Open recent file..")
-        recent_files_dropdown = Combobox(self.screen, values=recent_files_options, state="readonly",
-                                         textvariable=self._recent_files_dropdown_var, width=25)
-        self.screen.create_window((12, 135), window=recent_files_dropdown, anchor="nw")
+        self._recent_files_dropdown = Combobox(self.screen, values=recent_files_options, state="readonly",
+                                               textvariable=self._recent_files_dropdown_var, width=25)
+        self.screen.create_window((12, 135), window=self._recent_files_dropdown, anchor="nw")
         RoundedButton(self, self.screen, 195, 135, "> Open",
                       lambda e, var=self._recent_files_dropdown_var.get: self.open_recent_file(e, var),
                       padding=4, radius=4, hover_colour="#909090", click_colour=self.HEADER_COL)
@@ -208,10 +274,29 @@ class FFTJUI(Tk):
                       padding=15, radius=4, hover_colour="#909090", click_colour=self.HEADER_COL, width=200)
 
     def undo_action(self, e: Event):
-        pass
+        try:
+            changed = self._history.undo()
+        except ValueError as err:
+            messagebox.showerror("Undo error", str(err))
+            return
+        if changed:
+            self._show_history_builder()
 
     def redo_action(self, e: Event):
-        pass
+        try:
+            changed = self._history.redo()
+        except ValueError as err:
+            messagebox.showerror("Redo error", str(err))
+            return
+        if changed:
+            self._show_history_builder()
+
+    def _show_history_builder(self):
+        # Undoing a replaced automaton swaps the builder back, anything else only changed the current builder
+        if self._history.builder is not self._current_automaton:
+            self.new_automata(self._history.builder)
+        else:
+            self._refresh_automaton()
 
     def copy_action(self, e: Event):
         pass
@@ -246,14 +331,43 @@ class FFTJUI(Tk):
         if isinstance(finite_automata, NonDeterministicFiniteAutomaton):
             finite_automata = finite_automata.to_deterministic()
         new_builder = AutomatonBuilder.get_builder_from_finite_automata(finite_automata)
-        self.new_automata(new_builder)
+        self.new_automata(new_builder, initial_positions=self._seed_positions(finite_automata.source_states))
 
     def _simplify_current_dfa(self, _):
         finite_automata = self.current_automata.to_finite_automata()
+        determinised_sources = None
         if isinstance(finite_automata, NonDeterministicFiniteAutomaton):
             finite_automata = finite_automata.to_deterministic()
-        new_builder = AutomatonBuilder.get_builder_from_finite_automata(finite_automata.simplify())
-        self.new_automata(new_builder)
+            determinised_sources = finite_automata.source_states
+        minimal_automata = finite_automata.simplify()
+        source_states = minimal_automata.source_states
+        if determinised_sources is not None:  # map back through the determinisation to the states on screen
+            source_states = {state_id: [source_id for dfa_state_id in dfa_state_ids
+                                        for source_id in determinised_sources[dfa_state_id]]
+                             for state_id, dfa_state_ids in source_states.items()}
+        new_builder = AutomatonBuilder.get_builder_from_finite_automata(minimal_automata)
+        self.new_automata(new_builder, initial_positions=self._seed_positions(source_states))
+
+    def _state_centres(self) -> dict[int, tuple[float, float]]:
+        centres = {}
+        for state_id, state_widget in self._visible_state_table.items():
+            x_offset, y_offset = self._generate_offset_for_state_render(int(state_id))
+            centres[int(state_id)] = (state_widget.x + x_offset, state_widget.y + y_offset)
+        return centres
+
+    def _seed_positions(self, source_states: dict[int, list[int]] | None) -> dict[int, tuple[float, float]] | None:
+        # Starts each state of a converted automaton where the states it was made from are, so the layout only
+        # needs touching up and the user can still recognise it
+        if not source_states:
+            return None
+        centres = self._state_centres()
+        positions = {}
+        for state_id, source_ids in source_states.items():
+            source_centres = [centres[source_id] for source_id in source_ids if source_id in centres]
+            if source_centres:
+                positions[state_id] = (sum(x for x, _ in source_centres) / len(source_centres),
+                                       sum(y for _, y in source_centres) / len(source_centres))
+        return positions or None
 
     def _is_current_automata_equivalent_to(self, e: Event):
         pass
@@ -264,6 +378,7 @@ class FFTJUI(Tk):
         return (25 * ((zoom - 10) / (zoom - 11))) / 2
 
     def _set_state_image(self, state_id: int, state_widget: TransparentButton):
+        self._load_state_images()
         is_final = self._current_automaton.is_final(state_id)
         is_initial = self._current_automaton.is_initial(state_id)
         if is_final and is_initial:
@@ -326,6 +441,8 @@ class FFTJUI(Tk):
         if isinstance(widget_dropped, DragAndDropTransparentButton):
             if not self.is_mouse_select_mode():
                 return
+            self._cancel_layout()  # the layout would move the state straight back from where it was dropped
+            self._layout_unsaved = True
             widget_dropped.delete()
             state_id = widget_dropped.text
             del self._visible_state_table[str(state_id)]
@@ -344,6 +461,8 @@ class FFTJUI(Tk):
             if not status:
                 messagebox.showerror("State creation error.", state_id)
 
+            self._load_state_images()
+
             x_offset, y_offset = self._generate_offset_for_state_render(int(state_id))
             state_widget = DragAndDropTransparentButton(self, onto_widget, self._render_dropped_automata_state,
                                                         e.x - 265 - x_offset, e.y - 5 - y_offset, lambda _: None,
@@ -368,6 +487,10 @@ class FFTJUI(Tk):
                         command=lambda: self._delete_state(int(state_id), menu, state_widget))
 
     def _generate_dfa_by_regex(self, _):
+        # imported here as the editor and language compiler are only needed once a regex is entered
+        from src.UI.RegularExpressonEditor import RegexEditorUI
+        from src.utils.Language.LanguageScript import LanguageScriptFile
+
         editor_window = RegexEditorUI(self, self._runtime)
         if editor_window.regex.isspace():
             return
@@ -376,9 +499,8 @@ class FFTJUI(Tk):
                                            "Are you sure you want to replace the current automata?")
             if not is_ok:
                 return
-        language_script = LanguageScriptFile.load_by_string(editor_window.regex, self._runtime.datafolder)
-        ndfa = language_script.language.to_non_deterministic_finite_automaton()
-        dfa = ndfa.to_deterministic().simplify()
+        language_script = LanguageScriptFile.from_string(editor_window.regex)
+        dfa = language_script.language.to_minimal_deterministic_finite_automaton()
         automaton_builder = AutomatonBuilder.get_builder_from_finite_automata(dfa)
         self.new_automata(automaton_builder)
 
@@ -396,15 +518,52 @@ class FFTJUI(Tk):
                         font=(self.DEFAULT_FONT, 12, "bold"), cursor="hand2", width=15,
                         command=lambda: self._delete_state(state_id, menu, state_widget))
 
-    def new_automata(self, automaton: AutomatonBuilder):
+    def new_automata(self, automaton: AutomatonBuilder, undoable: bool = True,
+                     initial_positions: dict[int, tuple[float, float]] | None = None, keep_positions: bool = False):
+        # With keep_positions the initial positions are where the states are shown (e.g. a saved layout) rather than
+        # a starting point for a layout that fills the drop zone, only the states without one are laid out
         self.clear_automaton()
         self._current_automaton = automaton
+        self._history.replace_builder(automaton, undoable)  # does nothing if undo/redo already swapped to it
+        if self._journal is not None:
+            self._journal.attach(automaton)
+        if not automaton.states:
+            return  # e.g. undoing back to the empty automaton the editor starts with, there is nothing to lay out
+        self._load_state_images()
+
+        self._keep_layout_positions = keep_positions and bool(initial_positions)
+        if self._keep_layout_positions and all(state.id in initial_positions for state in automaton.states):
+            self._render_automaton(self._widget_positions(initial_positions))  # nothing needs laying out
+            return
+        self._layout_unsaved = True
 
-        force_layout = ForceDirectedLayout(automaton, iterations=1000)
-        force_layout.calculate_layout()
-        state_positions = force_layout.positions
+        from src.utils.LayoutEngine.ForceDirected import ForceDirectedLayout
 
-        # Calculate the bounding box of the initial positions
+        # The states are shown at their starting positions straight away and moved as the layout is calculated on
+        # the layout worker's thread
+        force_layout = ForceDirectedLayout(automaton, iterations=1000, time_budget_ms=self.LAYOUT_TIME_BUDGET_MS,
+                                           initial_positions=initial_positions,
+                                           relax_depth=0 if self._keep_layout_positions else 1)
+        if self._keep_layout_positions:
+            self._render_automaton(self._widget_positions(force_layout.positions))
+        else:
+            self._render_automaton(self._spread_positions(force_layout.positions))
+        self._start_layout(force_layout)
+
+    def _start_layout(self, force_layout: "ForceDirectedLayout"):
+        # Calculates the layout on the layout worker's thread, moving the rendered states as positions arrive
+        if self._layout_worker is None:
+            from src.utils.LayoutEngine.LayoutWorker import LayoutWorker
+            self._layout_worker = LayoutWorker()
+        self._layout_worker.start(force_layout)
+        self._update_manager.register_job(LayoutAnimation(self._layout_worker, self._apply_layout_positions))
+
+    def _cancel_layout(self):
+        if self._layout_worker is not None:
+            self._layout_worker.cancel()
+
+    def _spread_positions(self, state_positions: dict[int, tuple[float, float]]) -> dict[int, tuple[float, float]]:
+        # Scales layout positions to fill the drop zone, returning the position of each state's widget
         min_x = min(pos[0] for pos in state_positions.values())
         max_x = max(pos[0] for pos in state_positions.values())
         min_y = min(pos[1] for pos in state_positions.values())
@@ -412,20 +571,81 @@ class FFTJUI(Tk):
 
         drop_zone_width = 730
         drop_zone_height = 480
-        padding = 60
+        padding = self.LAYOUT_PADDING
 
-        spread_factor_x = (drop_zone_width - 2 * padding) / (max_x - min_x)
-        spread_factor_y = (drop_zone_height - 2 * padding) / (max_y - min_y)
+        # a single state (or a line of them) has no width or height to spread
+        spread_factor_x = (drop_zone_width - 2 * padding) / max(max_x - min_x, 1)
+        spread_factor_y = (drop_zone_height - 2 * padding) / max(max_y - min_y, 1)
 
         spread_factor = min(spread_factor_x, spread_factor_y)
 
-        for state in self._current_automaton.states:
-            x_offset, y_offset = self._generate_offset_for_state_render(state.id)
-            positions = state_positions[state.id]
+        widget_positions: dict[int, tuple[float, float]] = {}
+        for state_id, positions in state_positions.items():
+            x_offset, y_offset = self._generate_offset_for_state_render(state_id)
             spread_positions = ((positions[0] - min_x) * spread_factor + padding,
                                 (positions[1] - min_y) * spread_factor + padding)
+            widget_positions[state_id] = (spread_positions[0] - x_offset, spread_positions[1] - y_offset)
+        return widget_positions
+
+    def _widget_positions(self, state_positions: dict[int, tuple[float, float]]) -> dict[int, tuple[float, float]]:
+        # The position of the widget of each state centred on the given positions
+        widget_positions: dict[int, tuple[float, float]] = {}
+        for state_id, (x, y) in state_positions.items():
+            x_offset, y_offset = self._generate_offset_for_state_render(state_id)
+            widget_positions[state_id] = (x - x_offset, y - y_offset)
+        return widget_positions
+
+    def _layout_positions(self) -> dict[int, tuple[float, float]]:
+        # The centre of each shown state at zoom 0, the zoom automata are opened at (the state images are scaled
+        # along with the positions when zooming, so scaling the centres back is near enough)
+        scale = 1.8 ** (self._drop_zone_zoom / 5)
+        return {state_id: (x * scale, y * scale) for state_id, (x, y) in self._state_centres().items()}
+
+    def _apply_layout_positions(self, state_positions: dict[int, tuple[float, float]]):
+        # Moves the rendered states to the latest positions sent by the layout worker
+        if not state_positions:
+            return
+        self._layout_unsaved = True
+        if self._keep_layout_positions:
+            widget_positions = self._widget_positions(state_positions)
+        else:
+            widget_positions = self._spread_positions(state_positions)
+        for state_id, (x, y) in widget_positions.items():
+            state_widget = self._visible_state_table.get(str(state_id))
+            if state_widget is not None:  # the state may have been deleted while the layout ran
+                state_widget.moveto(x, y)
+        for transition in self._transition_manager.registered_rendered_transitions:
+            transition.render()
+
+    def _refresh_automaton(self):
+        # Redraws the current automaton after it was changed outside the editor (e.g. by undo), states keep where
+        # they were and only the states without a widget yet are laid out
+        if not self._visible_state_table:
+            self.new_automata(self._current_automaton)  # nothing on screen to keep, lay out from scratch
+            return
+        widget_positions = {int(state_id): (state_widget.x, state_widget.y)
+                            for state_id, state_widget in self._visible_state_table.items()}
+        centres = self._state_centres()
+        self._clear_rendered_automaton()  # also cancels any layout still running
+        if all(state.id in widget_positions for state in self._current_automaton.states):
+            self._render_automaton(widget_positions)
+            return
+
+        from src.utils.LayoutEngine.ForceDirected import ForceDirectedLayout
+
+        # The new states are shown next to their neighbours straight away and settled on the layout worker's thread
+        force_layout = ForceDirectedLayout(self._current_automaton, time_budget_ms=self.LAYOUT_TIME_BUDGET_MS,
+                                           initial_positions=centres, relax_depth=0)
+        self._keep_layout_positions = True
+        self._render_automaton(self._widget_positions(force_layout.positions))
+        self._start_layout(force_layout)
+
+    def _render_automaton(self, widget_positions: dict[int, tuple[float, float]]):
+        self._load_state_images()
+        for state in self._current_automaton.states:
+            x, y = widget_positions[state.id]
             state_widget = DragAndDropTransparentButton(self, self._drop_zone, self._render_dropped_automata_state,
-                                                        spread_positions[0] - x_offset, spread_positions[1] - y_offset, lambda _: None,
+                                                        x, y, lambda _: None,
                                                         text=state.id, image=self._state_image_tk, padding=5,
                                                         compound=TBCompound.CENTER, text_font=(self.DEFAULT_FONT, 15),
                                                         drag_text=str(state.id), disabled_func=self.is_mouse_select_mode)
@@ -525,23 +745,10 @@ class FFTJUI(Tk):
         for y in range(start_step, 475, start_step):
             self._drop_zone.create_line((5, y), (725, y), fill=self.COLOUR_PALLET[3], tag="dz_grid")
 
-        # redraw all states and transitions
-        square_w_h = int((100 * (zoom_factor - 10)) / (zoom_factor - 12))
-        rect_w = int((125 * (zoom_factor - 10)) / (zoom_factor - 12))
+        # redraw all states and transitions (the state images are resized when the first state is redrawn)
+        self._state_images_zoom = zoom_factor
         image_z_factor = math.copysign(1, direction) if not direction == 0 else 0
 
-        self._state_image = self._state_image_raw.resize((square_w_h, square_w_h))
-        self._state_image_tk = ImageTk.PhotoImage(self._state_image)
-
-        self._initial_state_image = self._initial_state_image_raw.resize((rect_w, square_w_h))
-        self._initial_state_image_tk = ImageTk.PhotoImage(self._initial_state_image)
-
-        self._final_state_image = self._final_state_image_raw.resize((square_w_h, square_w_h))
-        self._final_state_image_tk = ImageTk.PhotoImage(self._final_state_image)
-
-        self._initial_final_state_image = self._initial_final_state_image_raw.resize((rect_w, square_w_h))
-        self._initial_final_state_image_tk = ImageTk.PhotoImage(self._initial_final_state_image)
-
         mult = 1.8 ** ((1 / 5) * -image_z_factor)
         for state_id, button_widget in self._visible_state_table.items():
             self._set_state_image(int(state_id), button_widget)
@@ -607,8 +814,12 @@ class FFTJUI(Tk):
 
     def clear_automaton(self):
         self._current_automaton = AutomatonBuilder()
+        self._clear_rendered_automaton()
+        self.set_zoom(0)
+
+    def _clear_rendered_automaton(self):
+        self._cancel_layout()  # its positions are for states that are no longer shown
         for state in self._visible_state_table.values():
             state.delete()
         self._visible_state_table = {}
         self._transition_manager.clear()
-        self.set_zoom(0)
@@ -0,0 +1,247 @@
+# FlippyFlappingTheJ
+# ./src/cli.py
+#
+# Headless command line entry point (python -m src.cli ...)
+# Note: nothing imported here may import tkinter or PIL, so the CLI can run on machines without a display
+
+import argparse
+import json
+import sys
+import time
+
+from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+from src.utils.Automata.NDFA import NonDeterministicFiniteAutomaton
+from src.utils.IO.AutomatonFile import AutomatonFile
+from src.utils.IO.BatchPipeline import BatchPipeline, print_progress
+from src.utils.IO.BinaryAutomatonFile import BinaryAutomatonFile
+from src.utils.Language.LanguageCompiler import LanguageCompiler
+from src.utils.Language.LanguageScript import LanguageScriptFile
+from src.utils.LayoutEngine.LayoutBenchmark import LayoutBenchmark, LayoutBenchmarkResult
+
+
+def load_automaton(fp: str, language: str | None = None) -> DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton:
+    if fp.endswith(".lsf"):
+        script = LanguageScriptFile(fp)
+        automata_language = script.language if language is None else script.get_language(language)
+        return automata_language.to_minimal_deterministic_finite_automaton()
+    if fp.endswith(BinaryAutomatonFile.EXTENSION):
+        with BinaryAutomatonFile(fp) as binary_file:
+            return binary_file.to_finite_automaton()
+    return AutomatonFile(fp).to_finite_automaton()
+
+
+def save_automaton(automaton: DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton, fp: str):
+    if fp.endswith(BinaryAutomatonFile.EXTENSION):
+        BinaryAutomatonFile.write(fp, automaton).close()
+    else:
+        automaton.to_file(fp)
+
+
+def to_deterministic(automaton: DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton) -> DeterministicFiniteAutomaton:
+    if isinstance(automaton, NonDeterministicFiniteAutomaton):
+        return automaton.to_deterministic()
+    return automaton
+
+
+def _read_inputs(inputs: list[str]) -> list[str]:
+    if inputs == ["-"]:
+        return [line.rstrip("\r\n") for line in sys.stdin]
+    return inputs
+
+
+def run_command(args: argparse.Namespace) -> int:
+    if args.automaton.endswith(BinaryAutomatonFile.EXTENSION):
+        automaton = BinaryAutomatonFile(args.automaton)  # runs straight from the memory mapped file
+    else:
+        automaton = load_automaton(args.automaton, args.language)
+    all_accepted = True
+    for input_string in _read_inputs(args.inputs):
+        accepted = automaton.run(input_string)
+        all_accepted = all_accepted and accepted
+        print(f"{input_string}\t{'accept' if accepted else 'reject'}")
+    return 0 if all_accepted else 1
+
+
+def convert_command(args: argparse.Namespace) -> int:
+    dfa = to_deterministic(load_automaton(args.automaton, args.language))
+    save_automaton(dfa, args.output)
+    print(f"{args.output}: {len(dfa.states)} states, {len(dfa.transitions)} transitions")
+    return 0
+
+
+def minimise_command(args: argparse.Namespace) -> int:
+    dfa = to_deterministic(load_automaton(args.automaton, args.language)).simplify()
+    save_automaton(dfa, args.output)
+    print(f"{args.output}: {len(dfa.states)} states, {len(dfa.transitions)} transitions")
+    return 0
+
+
+def equiv_command(args: argparse.Namespace) -> int:
+    dfa1 = to_deterministic(load_automaton(args.automaton1))
+    dfa2 = to_deterministic(load_automaton(args.automaton2))
+    equivalent = dfa1.is_equivalent_to(dfa2)
+    print("equivalent" if equivalent else "not equivalent")
+    return 0 if equivalent else 1
+
+
+def compile_lsf_command(args: argparse.Namespace) -> int:
+    script = LanguageScriptFile(args.script)
+    languages = script.languages if args.language is None else [(args.language, script.get_language(args.language))]
+    if len(languages) > 1 and "{name}" not in args.output:
+        print("error: the script defines several languages, include {name} in the output path "
+              "or choose one with --language", file=sys.stderr)
+        return 2
+    for i, (name, automata_language) in enumerate(languages):
+        dfa = automata_language.to_minimal_deterministic_finite_automaton()
+        output = args.output.replace("{name}", name if name is not None else str(i))
+        save_automaton(dfa, output)
+        print(f"{output}: {len(dfa.states)} states, {len(dfa.transitions)} transitions")
+    return 0
+
+
+def bench_command(args: argparse.Namespace) -> int:
+    print(f"{'file':<40} {'load':>10} {'determinise':>12} {'minimise':>10} {'states':>8}")
+    for fp in args.files:
+        timings = {"load": 0.0, "determinise": 0.0, "minimise": 0.0}
+        states = 0
+        for _ in range(args.repeat):
+            LanguageCompiler.clear_cache()  # time real compilations rather than cache hits
+
+            start = time.perf_counter()
+            automaton = load_automaton(fp)
+            timings["load"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            dfa = to_deterministic(automaton)
+            timings["determinise"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            states = len(dfa.simplify().states)
+            timings["minimise"] += time.perf_counter() - start
+
+        print(f"{fp:<40} {timings['load'] / args.repeat * 1000:>8.2f}ms "
+              f"{timings['determinise'] / args.repeat * 1000:>10.2f}ms "
+              f"{timings['minimise'] / args.repeat * 1000:>8.2f}ms {states:>8}")
+    return 0
+
+
+def pack_command(args: argparse.Namespace) -> int:
+    automaton = load_automaton(args.automaton)
+    save_automaton(automaton, args.output)
+    print(f"{args.output}: {len(automaton.states)} states, {len(automaton.transitions)} transitions")
+    return 0
+
+
+def batch_command(args: argparse.Namespace) -> int:
+    pipeline = BatchPipeline(args.folder, args.output, args.workers, args.vectors, args.cache_dir)
+    start = time.perf_counter()
+    if args.results == "-":
+        counts = pipeline.run(sys.stdout, None if args.quiet else print_progress)
+    else:
+        with open(args.results, "w", encoding="utf-8") as results_file:
+            counts = pipeline.run(results_file, None if args.quiet else print_progress)
+    print(f"{sum(counts.values())} automata in {time.perf_counter() - start:.2f}s: {counts['ok']} ok, "
+          f"{counts['failed']} failed, {counts['error']} errors", file=sys.stderr)
+    return 0 if counts["failed"] == 0 and counts["error"] == 0 else 1
+
+
+def bench_layout_command(args: argparse.Namespace) -> int:
+    def print_result(result: LayoutBenchmarkResult):
+        outcome = result.error or (f"{result.seconds * 1000:.1f}ms, {result.crossings} crossings, "
+                                   f"stress {result.stress:.3f}, {result.overlaps} overlaps")
+        print(f"{result.automaton} ({result.states} states) {result.engine}: {outcome}", file=sys.stderr)
+
+    benchmark = LayoutBenchmark(args.seed, args.size, args.engine)
+    report = benchmark.report(benchmark.run(None if args.quiet else print_result))
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+    return 0 if all(result["error"] is None for result in report["results"]) else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli",
+                                     description="Headless FlippyFlappingTheJ automaton operations.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="folder to persist compiled languages in between runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run an automaton on input strings")
+    run_parser.add_argument("automaton", help=".automaton, .bautomaton or .lsf file")
+    run_parser.add_argument("inputs", nargs="+", help="input strings ('-' reads one per line from stdin)")
+    run_parser.add_argument("-l", "--language", default=None, help="language name when running a .lsf file")
+    run_parser.set_defaults(func=run_command)
+
+    convert_parser = subparsers.add_parser("convert", help="convert an NDFA to a DFA")
+    convert_parser.add_argument("automaton", help=".automaton, .bautomaton or .lsf file")
+    convert_parser.add_argument("output", help="output .automaton or .bautomaton file")
+    convert_parser.add_argument("-l", "--language", default=None, help="language name when converting a .lsf file")
+    convert_parser.set_defaults(func=convert_command)
+
+    minimise_parser = subparsers.add_parser("minimise", help="minimise an automaton")
+    minimise_parser.add_argument("automaton", help=".automaton, .bautomaton or .lsf file")
+    minimise_parser.add_argument("output", help="output .automaton or .bautomaton file")
+    minimise_parser.add_argument("-l", "--language", default=None, help="language name when minimising a .lsf file")
+    minimise_parser.set_defaults(func=minimise_command)
+
+    equiv_parser = subparsers.add_parser("equiv", help="check if two automata accept the same language")
+    equiv_parser.add_argument("automaton1", help=".automaton, .bautomaton or .lsf file")
+    equiv_parser.add_argument("automaton2", help=".automaton, .bautomaton or .lsf file")
+    equiv_parser.set_defaults(func=equiv_command)
+
+    compile_parser = subparsers.add_parser("compile-lsf", help="compile a language script to minimal DFA files")
+    compile_parser.add_argument("script", help=".lsf file")
+    compile_parser.add_argument("output", help="output .automaton or .bautomaton file ({name} is replaced by the language name)")
+    compile_parser.add_argument("-l", "--language", default=None, help="only compile the named language")
+    compile_parser.set_defaults(func=compile_lsf_command)
+
+    bench_parser = subparsers.add_parser("bench", help="time loading, determinising and minimising files")
+    bench_parser.add_argument("files", nargs="+", help=".automaton or .lsf files")
+    bench_parser.add_argument("-r", "--repeat", type=int, default=5, help="runs to average over")
+    bench_parser.set_defaults(func=bench_command)
+
+    pack_parser = subparsers.add_parser("pack", help="convert between .automaton (JSON) and .bautomaton (binary) "
+                                                     "files without changing the automaton")
+    pack_parser.add_argument("automaton", help=".automaton, .bautomaton or .lsf file")
+    pack_parser.add_argument("output", help="output .automaton or .bautomaton file")
+    pack_parser.set_defaults(func=pack_command)
+
+    batch_parser = subparsers.add_parser("batch", help="load, determinise, minimise and test a directory tree")
+    batch_parser.add_argument("folder", help="folder searched recursively for .automaton and .lsf files")
+    batch_parser.add_argument("-o", "--output", default=None, help="folder to write the minimised automata to")
+    batch_parser.add_argument("-r", "--results", default="-", help="file to write the JSON lines results to")
+    batch_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    batch_parser.add_argument("-v", "--vectors", default=None, help="test vectors run against every automaton")
+    batch_parser.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    batch_parser.set_defaults(func=batch_command)
+
+    bench_layout_parser = subparsers.add_parser("bench-layout", help="time the layout engines on synthetic automata "
+                                                                     "and measure the quality of their layouts")
+    bench_layout_parser.add_argument("-s", "--seed", type=int, default=0, help="seed of the automata and layouts")
+    bench_layout_parser.add_argument("--size", choices=list(LayoutBenchmark.SIZES), default="small",
+                                     help="size of the synthetic automata")
+    bench_layout_parser.add_argument("-e", "--engine", action="append", choices=LayoutBenchmark.ENGINES, default=None,
+                                     help="engine to benchmark, may be repeated (default: all)")
+    bench_layout_parser.add_argument("-o", "--output", default="-", help="file to write the JSON report to")
+    bench_layout_parser.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    bench_layout_parser.set_defaults(func=bench_layout_command)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.cache_dir is not None:
+        LanguageCompiler.set_disk_cache(args.cache_dir)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
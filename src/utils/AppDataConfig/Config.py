@@ -2,18 +2,38 @@
 # ./src/utils/AppDataConfig/Config.py
 
 import json
+import os
+import tempfile
+import time
+from functools import lru_cache
+
+from src.utils.IO.FileMode import match_file_mode
+
+
+@lru_cache(maxsize=256)
+def _split_path(path) -> tuple[str, ...]:
+    # Dotted paths are split once and reused for later lookups of the same path (a config only uses a few)
+    return tuple(str(path).split("."))
 
 
 class ConfigurationFile:
 
-    __slots__ = ("url", "data")
+    # With write_behind set, changes are only kept in memory (and marked dirty) until flush() or flush_if_due()
+    # is called, otherwise every change is written straight away. Either way the file is replaced atomically.
 
-    def __init__(self, fp):
+    __slots__ = ("url", "data", "write_behind", "flush_delay", "_dirty", "_last_change")
+
+    def __init__(self, fp, write_behind=False, flush_delay=1.0, load=True):
 
         self.url = fp
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay  # seconds without changes before flush_if_due() writes
+        self._dirty = False
+        self._last_change = 0.0
 
-        with open(r'%s' % self.url, "r") as read_file:
-            self.data = json.load(read_file)
+        if load:
+            with open(r'%s' % self.url, "r") as read_file:
+                self.data = json.load(read_file)
 
     def __str__(self):
         return f"ConfigurationFile: {self.url}"
@@ -27,28 +47,18 @@ class ConfigurationFile:
     def __setitem__(self, key, value):
         self.setValue(key, value)
 
+    @property
+    def dirty(self):
+        return self._dirty
+
     def getPath(self):
         return self.url
 
     def getConfigurationSection(self, name):
-        return ConfigurationSection(self.url, self.data[name])
+        return ConfigurationSection(self.url, self.data[name], self)
 
     def getValue(self, path):
-        try:
-            section = self.data
-            if str(path).__contains__("."):
-                sp = str(path).split(".")
-                for i in range(len(sp)):
-                    if i == len(sp) - 1:
-                        if isinstance(section[sp[i]], dict) or isinstance(section[sp[i]], list):
-                            return ConfigurationSection(self.url, section[sp[i]])
-                        else:
-                            return section[sp[i]]
-                    section = section[sp[i]]
-            else:
-                return section[path]
-        except KeyError:
-            return False
+        return _get_value(self, self.data, path)
 
     def _set_value_recursion(self, sec, split, val):
         if len(split) > 1:
@@ -59,30 +69,51 @@ class ConfigurationFile:
         return sec
 
     def setValue(self, path, value):
+        self._set_value_recursion(self.data, _split_path(path), value)
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        self._dirty = True
+        self._last_change = time.monotonic()
+        if not self.write_behind:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        contents = json.dumps(self.data, indent=4, sort_keys=True, separators=(',', ': '))
+
+        # Write to a temporary file first so a crash mid write can never leave a truncated config behind
+        fd, temp_fp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.url)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as write_file:
+                write_file.write(contents)
+            match_file_mode(temp_fp, self.url)
+            os.replace(temp_fp, self.url)
+        except BaseException:
+            if os.path.exists(temp_fp):
+                os.remove(temp_fp)
+            raise
+        self._dirty = False
 
-        if str(path).__contains__("."):
-            sp = str(path).split(".")
-            self._set_value_recursion(self.data, sp, value)
-            with open(self.url, "w") as write_file:
-                write_file.write(json.dumps(self.data))
-        else:
-            self.data[path] = value
-            with open(r'%s' % self.url, "w") as write_file:
-                write_file.write(json.dumps(self.data, indent=4, sort_keys=True, separators=(',', ': ')).replace("\\n", "\n"))
+    def flush_if_due(self):
+        if self._dirty and time.monotonic() - self._last_change >= self.flush_delay:
+            self.flush()
 
 
 class ConfigurationSection(object):
 
-    __slots__ = ("url", "section")
+    __slots__ = ("url", "section", "root")
 
-    def __init__(self, fp, section):
+    def __init__(self, fp, section, root=None):
 
         self.section = section
         self.url = fp
+        self.root = root  # the file the section belongs to (changes are saved through it)
 
     @staticmethod
     def getSectionFromFile(fp, key):
-        file = ConfigurationFile(fp)
+        file = ConfigurationFile(fp)  # written straight away, the section keeps it as its root to save changes
         return file.getConfigurationSection(key)
 
     def __str__(self):
@@ -101,24 +132,10 @@ class ConfigurationSection(object):
         return self.section
 
     def getConfigurationSection(self, name):
-        return ConfigurationSection(self.url, self.section[name])
+        return ConfigurationSection(self.url, self.section[name], self.root)
 
     def getValue(self, path):
-        try:
-            section = self.section
-            if str(path).__contains__("."):
-                sp = str(path).split(".")
-                for i in range(len(sp)):
-                    if i == len(sp) - 1:
-                        if isinstance(section[sp], dict) or isinstance(section[sp], list):
-                            return ConfigurationSection(self.url, section[sp])
-                        else:
-                            return section[sp]
-                    section = section[sp]
-            else:
-                return section[path]
-        except KeyError:
-            return False
+        return _get_value(self.root, self.section, path, self.url)
 
     def _set_value_recursion(self, sec, split, val):
         if len(split) > 1:
@@ -129,13 +146,22 @@ class ConfigurationSection(object):
         return sec
 
     def setValue(self, path, value):
-
-        if str(path).__contains__("."):
-            sp = str(path).split(".")
-            self._set_value_recursion(self.section, sp, value)
-            with open(self.url, "w") as write_file:
-                write_file.write(json.dumps(self.section))
-        else:
-            self.section[path] = value
-            with open(r'%s' % self.url, "w") as write_file:
-                write_file.write(json.dumps(self.section, indent=4, sort_keys=True, separators=(',', ': ')).replace("\\n", "\n"))
+        if self.root is None:
+            raise ValueError(f"{self} has no file to save changes to, get it from a ConfigurationFile.")
+        self._set_value_recursion(self.section, _split_path(path), value)
+        self.root.mark_dirty()
+
+
+def _get_value(root, section, path, url=None):
+    try:
+        split = _split_path(path)
+        if len(split) == 1:
+            return section[path]
+        for key in split[:-1]:
+            section = section[key]
+        value = section[split[-1]]
+        if isinstance(value, dict) or isinstance(value, list):
+            return ConfigurationSection(url if url is not None else root.url, value, root)
+        return value
+    except KeyError:
+        return False
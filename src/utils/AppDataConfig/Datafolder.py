@@ -14,7 +14,8 @@ class DataFolder:
         self._assets_folder = os.path.join(rf"{self._cwd}", "assets")
         self._image_folder = os.path.join(self._assets_folder, "Images")
         self._temp_folder = os.path.join(self._assets_folder, "temp")
-        self._config = ConfigurationFile(os.path.join(self._assets_folder, "config.json"))
+        self._cache_folder = os.path.join(self._assets_folder, "cache")
+        self._config = ConfigurationFile(os.path.join(self._assets_folder, "config.json"), write_behind=True)
 
     @property
     def assets_folder(self) -> str:
@@ -35,3 +36,7 @@ class DataFolder:
     @property
     def temp_folder(self) -> str:
         return self._temp_folder
+
+    @property
+    def cache_folder(self) -> str:
+        return self._cache_folder
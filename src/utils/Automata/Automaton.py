@@ -25,6 +25,9 @@ class Automaton:
         id of the start state
     final_states -> list[int]
         list of ids of final states
+    source_states -> dict[int, list[int]] | None
+        for an automaton made from another (e.g. by to_deterministic or simplify), the ids of the other automaton's
+        states each state stands for, None otherwise
 
     Methods
     -------
@@ -44,6 +47,7 @@ class Automaton:
         self._transitions = transitions
         self._start_state = start_state
         self._final_states = final_states
+        self._source_states: dict[int, list[int]] | None = None
 
         self._validate_states(states)
 
@@ -93,7 +97,15 @@ class Automaton:
     def final_states(self) -> list[int]:
         return self._final_states
 
-    def to_file(self, fp: str) -> AutomatonFile: ...
+    @property
+    def source_states(self) -> dict[int, list[int]] | None:
+        return self._source_states
+
+    @source_states.setter
+    def source_states(self, value: dict[int, list[int]] | None):
+        self._source_states = value
+
+    def to_file(self, fp: str, compact: bool = False) -> AutomatonFile: ...
 
     def run(self, input_string: str) -> bool: ...
 
@@ -3,6 +3,9 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
 from src.utils.Automata.AutomataLink import AutomataLink
 from src.utils.Automata.AutomataState import AutomataState
 from src.utils.Automata.DFA import DeterministicFiniteAutomaton
@@ -11,6 +14,19 @@ from src.utils.Language.AutomataAlphabet import AutomataAlphabet
 from src.utils.Language.AutomataChar import AutomataChar
 
 
+@dataclass(frozen=True)
+class BuilderOperation:
+    """
+    A successful change made to an AutomatonBuilder, as passed to its listeners
+    (Note: operations made by another operation, e.g. the transitions removed along with a state, are nested and
+    are passed to listeners before the operation that caused them)
+    """
+
+    name: str  # the AutomatonBuilder method, e.g. "add_state"
+    args: dict = field(default_factory=dict)  # everything needed to redo (and undo) the operation
+    nested: bool = False
+
+
 class AutomatonBuilder:
     """
     A class to build and manipulate finite automata, including both deterministic (DFA) and non-deterministic (NDFA) types.
@@ -43,6 +59,12 @@ class AutomatonBuilder:
     to_finite_automata() -> DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton:
         Converts the builder to a finite automaton.
 
+    add_listener(listener: Callable[[BuilderOperation], None]):
+        Calls the listener after every successful change to the automaton.
+
+    remove_listener(listener: Callable[[BuilderOperation], None]):
+        Stops calling a listener.
+
     add_state(is_final: bool, is_initial: bool, _id: int = None) -> tuple[bool, str]:
         Adds a state to the automaton.
 
@@ -55,7 +77,7 @@ class AutomatonBuilder:
     is_char_in_alphabet(char: str) -> AutomataChar | None:
         Checks if a character is in the automaton's alphabet.
 
-    add_transition(state_from_id: int, state_to_id: int, link_by: str) -> tuple[bool, str]:
+    add_transition(state_from_id: int, state_to_id: int, link_by: str, _id: int = None) -> tuple[bool, str]:
         Adds a transition between states in the automaton.
 
     get_transition(transition_id: int) -> AutomataLink | None:
@@ -83,6 +105,8 @@ class AutomatonBuilder:
         # tracking variables
         self._transition_id_counter: int = 0
         self._state_id_counter: int = 0
+        self._listeners: list[Callable[[BuilderOperation], None]] = []
+        self._operation_depth: int = 0  # > 0 while an operation is making other operations
 
     def __str__(self) -> str:
         return (f"DFA(States: {list(map(str, self.states))},"
@@ -133,6 +157,20 @@ class AutomatonBuilder:
     def alphabet(self) -> AutomataAlphabet:
         return self._alphabet
 
+    def add_listener(self, listener: Callable[[BuilderOperation], None]):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[BuilderOperation], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, name: str, **args):
+        if not self._listeners:
+            return
+        operation = BuilderOperation(name, args, self._operation_depth > 0)
+        for listener in self._listeners[:]:
+            listener(operation)
+
     def is_deterministic(self) -> bool:
         init_li: list[int] = [0 for _ in self._alphabet]
         state_and_transitions: dict[int, list[int]] = {}
@@ -169,6 +207,8 @@ class AutomatonBuilder:
                 self._final_states.append(_id)
             if is_initial:
                 self._initial_state = _id
+            self._state_id_counter = max(self._state_id_counter, _id + 1)  # later states must not reuse the id
+            self._notify("add_state", id=_id, final=is_final, initial=is_initial)
             return True, str(_id)
         state = AutomataState(self._state_id_counter, is_final, is_initial)
         if is_final:
@@ -177,6 +217,7 @@ class AutomatonBuilder:
             self._initial_state = self._state_id_counter
         self._state_id_counter += 1
         self._states.append(state)
+        self._notify("add_state", id=state.id, final=is_final, initial=is_initial)
         return True, str(self._state_id_counter - 1)
 
     def get_state(self, state_id: int) -> AutomataState | None:
@@ -198,10 +239,15 @@ class AutomatonBuilder:
         if old_state.is_final:
             self._final_states.remove(state_id)
 
-        for transition in self._transitions[:]:
-            if transition.state_to.id == state_id or transition.state_from.id == state_id:
-                self.remove_transition(transition.id)
+        self._operation_depth += 1
+        try:
+            for transition in self._transitions[:]:
+                if transition.state_to.id == state_id or transition.state_from.id == state_id:
+                    self.remove_transition(transition.id)
+        finally:
+            self._operation_depth -= 1
 
+        self._notify("remove_state", id=state_id, final=old_state.is_final, initial=old_state.is_initial)
         return True, ""
 
     def is_char_in_alphabet(self, char: str) -> AutomataChar | None:
@@ -210,7 +256,8 @@ class AutomatonBuilder:
                 return achar
         return None
 
-    def add_transition(self, state_from_id: int, state_to_id: int, link_by: str | list[str] | None) -> tuple[bool, str]:
+    def add_transition(self, state_from_id: int, state_to_id: int, link_by: str | list[str] | None,
+                       _id: int = None) -> tuple[bool, str]:
         link_by_char = []
         if isinstance(link_by, str):
             temp_char = self.is_char_in_alphabet(link_by)
@@ -235,10 +282,13 @@ class AutomatonBuilder:
         if state_from is None or state_to is None:
             return False, "States do not exist!"
 
-        transition = AutomataLink(self._transition_id_counter, state_from, state_to, link_by_char)
-        self._transition_id_counter += 1
+        transition_id = self._transition_id_counter if _id is None else _id
+        transition = AutomataLink(transition_id, state_from, state_to, link_by_char)
+        self._transition_id_counter = max(self._transition_id_counter, transition_id + 1)
         self._transitions.append(transition)
-        return True, str(self._transition_id_counter - 1)
+        self._notify("add_transition", id=transition_id, state_from=state_from_id, state_to=state_to_id,
+                     link_by=None if link_by_char is None else [char.char for char in link_by_char])
+        return True, str(transition_id)
 
     def get_transition(self, transition_id: int) -> AutomataLink | None:
         for transition in self._transitions:
@@ -269,11 +319,13 @@ class AutomatonBuilder:
                 break
         if old_transition is None:
             return False, "Transition does not exist"
-        if old_transition.link_by is None:
-            return True, ""
-        for char in old_transition.link_by:
-            if not self._exists_char_in_transitions(char):
-                self._remove_char_from_alphabet(char)
+        if old_transition.link_by is not None:
+            for char in old_transition.link_by:
+                if not self._exists_char_in_transitions(char):
+                    self._remove_char_from_alphabet(char)
+        self._notify("remove_transition", id=transition_id, state_from=old_transition.state_from.id,
+                     state_to=old_transition.state_to.id,
+                     link_by=None if old_transition.link_by is None else [char.char for char in old_transition.link_by])
         return True, ""
 
     def toggle_state_initial(self, state_id: int) -> tuple[bool, str]:
@@ -282,6 +334,7 @@ class AutomatonBuilder:
             for state in self._states:
                 if state.id == state_id:
                     state.is_initial = False
+            self._notify("toggle_state_initial", id=state_id)
             return True, ""
         if self._initial_state is not None:
             return False, "There already exists an initial state"
@@ -289,6 +342,7 @@ class AutomatonBuilder:
             if state.id == state_id:
                 state.is_initial = True
         self._initial_state = state_id
+        self._notify("toggle_state_initial", id=state_id)
         return True, ""
 
     def toggle_state_final(self, state_id: int) -> tuple[bool, str]:
@@ -298,10 +352,12 @@ class AutomatonBuilder:
             if state.is_final:
                 self._final_states.remove(state_id)
                 state.is_final = False
-                return True, ""
-            self._final_states.append(state_id)
-            state.is_final = True
+            else:
+                self._final_states.append(state_id)
+                state.is_final = True
+            self._notify("toggle_state_final", id=state_id)
             return True, ""
+        return False, "State does not exist"
 
     def is_final(self, state_id: int) -> bool:
         return state_id in self.final_states
@@ -61,15 +61,11 @@ class DeterministicFiniteAutomaton(Automaton):
                 final_states.append(state.id)
                 continue
             other_states.append(state.id)
-        final_states_node = Node(set(final_states))
-        final_states_node.parent = simplification.root
-        simplification.root.children.append(final_states_node)
-        other_states_node = Node(set(other_states))
-        other_states_node.parent = simplification.root
-        simplification.root.children.append(other_states_node)
+        cur_sets = [set(state_set) for state_set in (final_states, other_states) if state_set]
+        for state_set in cur_sets:  # an empty partition would become a leaf without any states
+            simplification.root.add_child(Node(state_set))
 
         prev_sets = []
-        cur_sets = [set(final_states), set(other_states)]
         i = 0
         times_complete = 0
 
@@ -141,7 +137,18 @@ class DeterministicFiniteAutomaton(Automaton):
         for transition_id, state_id in transition_to_update:
             new_dfa_transitions[transition_id].state_to = new_dfa_states[state_id]
 
-        return DeterministicFiniteAutomaton(new_dfa_states, self.alphabet, new_dfa_transitions, initial_state, final_states)
+        dfa = DeterministicFiniteAutomaton(new_dfa_states, self.alphabet, new_dfa_transitions, initial_state, final_states)
+        dfa.source_states = {state_id: sorted(node.value) for state_id, node in enumerate(new_states)}
+        return dfa
+
+    def copy(self) -> Self:
+        states = [AutomataState(state.id, state.is_final, state.is_initial) for state in self.states]
+        state_table = {state.id: state for state in states}
+        transitions = [AutomataLink(transition.id, state_table[transition.state_from.id],
+                                    state_table[transition.state_to.id], transition.link_by[:])
+                       for transition in self.transitions]
+        return DeterministicFiniteAutomaton(states, self.alphabet.copy(), transitions, self.start_state,
+                                            self.final_states[:])
 
     def negate(self):
         final_states = []
@@ -151,6 +158,43 @@ class DeterministicFiniteAutomaton(Automaton):
                 final_states.append(state.id)
         self._final_states = final_states[:]
 
+    def is_equivalent_to(self, other: Self) -> bool:
+        # Hopcroft-Karp: merge the start states and every pair of states reached by the same symbol, the DFAs
+        # differ only if a merged pair disagrees on being final (missing transitions go to a shared dead state)
+        symbols = list(dict.fromkeys([char.char for char in self.alphabet] + [char.char for char in other.alphabet]))
+        tables: tuple[dict[tuple[int, str], int], ...] = ({}, {})  # (state_id, symbol): state_to_id
+        for automaton, table in zip((self, other), tables):
+            for transition in automaton.transitions:
+                for char in transition.link_by:
+                    table[(transition.state_from.id, char.char)] = transition.state_to.id
+        finals = (set(self.final_states), set(other.final_states))
+        dead = None
+
+        parents: dict[tuple[int, int | None], tuple[int, int | None]] = {}
+
+        def find(item: tuple[int, int | None]) -> tuple[int, int | None]:
+            parents.setdefault(item, item)
+            while parents[item] != item:
+                parents[item] = parents[parents[item]]
+                item = parents[item]
+            return item
+
+        pending = [((0, self.start_state), (1, other.start_state))]
+        while pending:
+            item1, item2 = pending.pop()
+            root1, root2 = find(item1), find(item2)
+            if root1 == root2:
+                continue
+            if (item1[1] in finals[item1[0]]) != (item2[1] in finals[item2[0]]):
+                return False
+            parents[root1] = root2
+            for symbol in symbols:
+                next_states = []
+                for automaton, state_id in (item1, item2):
+                    next_states.append((automaton, tables[automaton].get((state_id, symbol), dead)))
+                pending.append((next_states[0], next_states[1]))
+        return True
+
     def get_transitions_from_state(self, state_id: int, symbol: str = None) -> list[AutomataLink]:
         transitions = []
         for link in self.transitions:
@@ -166,7 +210,8 @@ class DeterministicFiniteAutomaton(Automaton):
         return transitions
 
     def run(self, input_string: str) -> bool:
-        current_state = self.states[self.start_state]
+        # start_state is an id, states loaded from a file are not in id order so it is not also an index
+        current_state = next(state for state in self.states if state.id == self.start_state)
         for char in input_string:
             transitions = self.get_transitions_from_state(current_state.id, char)
             if not transitions:
@@ -186,23 +231,6 @@ class DeterministicFiniteAutomaton(Automaton):
                 transition_table[state.id][symbol.char] = state_ids
         return transition_table
 
-    def to_file(self, fp: str) -> AutomatonFile:
-        file_contents = {"is_deterministic": True, "alphabet": [char.char for char in self.alphabet]}
-        states = {}
-        transitions = {}
-
-        for state in self.states:
-            states[str(state.id)] = {"initial": state.is_initial, "final": state.is_final}
-        file_contents["states"] = states
-
-        for transition in self.transitions:
-            transitions[str(transition.id)] = {"from": transition.state_from.id, "to": transition.state_to.id,
-                                               "link_by": [char.char for char in transition.link_by]}
-        file_contents["transitions"] = transitions
-
-        with open(fp, "w") as write_file:
-            write_file.write(
-                json.dumps(file_contents, indent=4, sort_keys=True, separators=(',', ': ')).replace("\\n", "\n"))
-
-        return AutomatonFile(fp)
+    def to_file(self, fp: str, compact: bool = False) -> AutomatonFile:
+        return AutomatonFile.write(fp, self, True, compact)
 
@@ -199,7 +199,10 @@ class NonDeterministicFiniteAutomaton(Automaton):
         for link in links_to_update:
             transitions[link[0]].state_to = states[link[1]]
 
-        return DeterministicFiniteAutomaton(states, self.alphabet, transitions, start_state, final_states)
+        dfa = DeterministicFiniteAutomaton(states, self.alphabet, transitions, start_state, final_states)
+        dfa.source_states = {state_id: json.loads(derived_states)
+                             for state_id, derived_states in enumerate(conversion_table)}
+        return dfa
 
     def negate(self) -> DeterministicFiniteAutomaton:
         dfa = self.to_deterministic()
@@ -218,22 +221,5 @@ class NonDeterministicFiniteAutomaton(Automaton):
             current_states = list(set(new_states))
         return len([state for state in current_states if state in self.final_states]) > 0
 
-    def to_file(self, fp: str) -> AutomatonFile:
-        file_contents = {"is_deterministic": False, "alphabet": [char.char for char in self.alphabet]}
-        states = {}
-        transitions = {}
-
-        for state in self.states:
-            states[str(state.id)] = {"initial": state.is_initial, "final": state.is_final}
-        file_contents["states"] = states
-
-        for transition in self.transitions:
-            transitions[str(transition.id)] = {"from": transition.state_from.id, "to": transition.state_to.id,
-                                               "link_by": [char.char for char in transition.link_by] if transition.link_by is not None else []}
-        file_contents["transitions"] = transitions
-
-        with open(fp, "w") as write_file:
-            write_file.write(
-                json.dumps(file_contents, indent=4, sort_keys=True, separators=(',', ': ')).replace("\\n", "\n"))
-
-        return AutomatonFile(fp)
+    def to_file(self, fp: str, compact: bool = False) -> AutomatonFile:
+        return AutomatonFile.write(fp, self, False, compact)
@@ -0,0 +1,193 @@
+# FlippyFlappingTheJ
+# ./src/utils/Automata/UndoHistory.py
+
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from src.utils.Automata.AutomatonBuilder import AutomatonBuilder, BuilderOperation
+
+
+class UndoHistory:
+    """
+    Class used to undo and redo the changes made to an AutomatonBuilder
+    (Note: a step only stores the operations it made, which are enough to work out their inverses, so the memory
+    used per step is O(size of the edit) rather than a copy of the automaton)
+    (Note: nested operations, e.g. the transitions removed along with a state, are part of the same step as the
+    operation that made them, as is everything made inside group())
+
+    Replacing the whole automaton (e.g. importing a regex or converting to a DFA) is a single step that keeps a
+    reference to the replaced builder, which is never changed after being replaced.
+
+    ...
+
+    Attributes
+    ----------
+    builder -> AutomatonBuilder
+        the automaton currently being edited
+    max_steps -> int
+        the number of steps kept, older steps are forgotten
+    can_undo -> bool
+        whether there is a step to undo
+    can_redo -> bool
+        whether there is an undone step to redo
+
+    Methods
+    -------
+    group() -> Iterator[None]
+        context manager making every operation inside it a single step
+    replace_builder(builder: AutomatonBuilder, undoable: bool = True)
+        starts editing another builder, as a step if undoable otherwise forgetting every step
+    undo() -> bool
+        undoes the last step, returning False if there was nothing to undo
+    redo() -> bool
+        redoes the last undone step, returning False if there was nothing to redo
+    clear()
+        forgets every step
+    """
+
+    REPLACE_BUILDER: str = "replace_builder"
+
+    def __init__(self, builder: AutomatonBuilder, max_steps: int = 1000):
+
+        self._builder = builder
+        self._max_steps = max_steps
+        self._undo_steps: deque[tuple[BuilderOperation, ...]] = deque(maxlen=max_steps)
+        self._redo_steps: list[tuple[BuilderOperation, ...]] = []
+        self._pending: list[BuilderOperation] = []  # operations of the step being made
+        self._group_depth: int = 0
+        self._applying: bool = False  # set while undoing or redoing so those operations are not recorded
+
+        self._builder.add_listener(self._record)
+
+    @property
+    def builder(self) -> AutomatonBuilder:
+        return self._builder
+
+    @property
+    def max_steps(self) -> int:
+        return self._max_steps
+
+    @property
+    def can_undo(self) -> bool:
+        return len(self._undo_steps) > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return len(self._redo_steps) > 0
+
+    def _record(self, operation: BuilderOperation):
+        if self._applying:
+            return
+        self._pending.append(operation)
+        if not operation.nested and self._group_depth == 0:
+            self._end_step()
+
+    def _end_step(self):
+        if not self._pending:
+            return
+        self._undo_steps.append(tuple(self._pending))
+        self._pending = []
+        self._redo_steps.clear()  # a new edit branches off, the undone steps can no longer be redone
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        self._group_depth += 1
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                self._end_step()
+
+    def replace_builder(self, builder: AutomatonBuilder, undoable: bool = True):
+        if builder is self._builder:
+            return
+        if undoable:
+            self._pending.append(BuilderOperation(self.REPLACE_BUILDER, {"old": self._builder, "new": builder}))
+            self._end_step()
+        else:
+            self.clear()
+        self._swap_builder(builder)
+
+    def _swap_builder(self, builder: AutomatonBuilder):
+        self._builder.remove_listener(self._record)
+        self._builder = builder
+        self._builder.add_listener(self._record)
+
+    def undo(self) -> bool:
+        if not self._undo_steps:
+            return False
+        step = self._undo_steps.pop()
+        self._applying = True
+        try:
+            for operation in reversed(step):
+                self._apply_inverse(operation)
+        finally:
+            self._applying = False
+        self._redo_steps.append(step)
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo_steps:
+            return False
+        step = self._redo_steps.pop()
+        self._applying = True
+        try:
+            for operation in step:
+                if not operation.nested:  # nested operations are made again by the operation that caused them
+                    self._apply(operation)
+        finally:
+            self._applying = False
+        self._undo_steps.append(step)
+        return True
+
+    def clear(self):
+        self._undo_steps.clear()
+        self._redo_steps.clear()
+        self._pending = []
+
+    def _apply(self, operation: BuilderOperation):
+        args = operation.args
+        if operation.name == self.REPLACE_BUILDER:
+            self._swap_builder(args["new"])
+            return
+        if operation.name == "add_state":
+            success, err = self._builder.add_state(args["final"], args["initial"], _id=args["id"])
+        elif operation.name == "remove_state":
+            success, err = self._builder.remove_state(args["id"])
+        elif operation.name == "add_transition":
+            success, err = self._builder.add_transition(args["state_from"], args["state_to"], args["link_by"],
+                                                        _id=args["id"])
+        elif operation.name == "remove_transition":
+            success, err = self._builder.remove_transition(args["id"])
+        elif operation.name == "toggle_state_initial":
+            success, err = self._builder.toggle_state_initial(args["id"])
+        elif operation.name == "toggle_state_final":
+            success, err = self._builder.toggle_state_final(args["id"])
+        else:
+            raise ValueError(f"Unknown builder operation '{operation.name}'.")
+        if not success:
+            raise ValueError(f"Builder operation {operation.name} {args} could not be redone: {err}")
+
+    def _apply_inverse(self, operation: BuilderOperation):
+        args = operation.args
+        if operation.name == self.REPLACE_BUILDER:
+            self._swap_builder(args["old"])
+            return
+        if operation.name == "add_state":
+            success, err = self._builder.remove_state(args["id"])
+        elif operation.name == "remove_state":
+            # its transitions come before it in the step, so they are added back straight after this
+            success, err = self._builder.add_state(args["final"], args["initial"], _id=args["id"])
+        elif operation.name == "add_transition":
+            success, err = self._builder.remove_transition(args["id"])
+        elif operation.name == "remove_transition":
+            success, err = self._builder.add_transition(args["state_from"], args["state_to"], args["link_by"],
+                                                        _id=args["id"])
+        elif operation.name in ("toggle_state_initial", "toggle_state_final"):
+            success, err = getattr(self._builder, operation.name)(args["id"])  # a toggle is its own inverse
+        else:
+            raise ValueError(f"Unknown builder operation '{operation.name}'.")
+        if not success:
+            raise ValueError(f"Builder operation {operation.name} {args} could not be undone: {err}")
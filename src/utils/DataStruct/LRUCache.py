@@ -0,0 +1,75 @@
+# FlippyFlappingTheJ
+# ./src/utils/DataStruct/LRUCache.py
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+        Class used to implement a size bounded least recently used cache
+
+        ...
+
+        Attributes
+        ----------
+        capacity -> int
+            the maximum amount of entries held before the least recently used entry is evicted
+
+        Methods
+        -------
+        get(key: any, default: any = None) -> any
+            returns the value stored for a key (marking it as recently used) or the default if not cached
+        put(key: any, value: any)
+            stores a value for a key, evicting the least recently used entry if the cache is full
+        remove(key: any) -> any
+            removes a key from the cache and returns its value (None if not cached)
+        clear()
+            clears the cache
+    """
+
+    def __init__(self, capacity: int = 128):
+
+        if capacity < 1:
+            raise ValueError("LRU cache capacity must be at least 1.")
+
+        self._capacity = capacity
+        self._entries: OrderedDict[any, any] = OrderedDict()
+
+    def __str__(self) -> str:
+        return f"LRUCache({len(self)}/{self.capacity})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: any) -> bool:
+        return key in self._entries
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, value: int):
+        if value < 1:
+            raise ValueError("LRU cache capacity must be at least 1.")
+        self._capacity = value
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def get(self, key: any, default: any = None) -> any:
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: any, value: any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def remove(self, key: any) -> any:
+        return self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,222 @@
+# FlippyFlappingTheJ
+# ./src/utils/DataStruct/QuadTree.py
+
+import math
+
+
+class QuadTree:
+    """
+        Class used to implement a point region quadtree which keeps the mass (number of points) and centre of mass of
+        every cell, as needed for Barnes-Hut approximation
+        Note: the tree is built once from a list of points and never changed, build a new tree when the points move
+
+        ...
+
+        Attributes
+        ----------
+        points -> list[tuple[float, float]]
+            represents the points stored in the tree
+        leaf_size -> int
+            represents the most points a cell holds before it is split into four
+        node_count -> int
+            represents the number of cells in the tree
+
+        Methods
+        -------
+        approximate(x: float, y: float, theta: float, max_distance: float = math.inf)
+                -> list[tuple[float, float, int]]
+            returns the (x, y, mass) of every point and far away cell needed to approximate the points' effect on (x, y)
+        approximate_all(theta: float, max_distance: float = math.inf, indices: ndarray | None = None)
+                -> tuple[ndarray, ndarray, ndarray, ndarray]
+            does approximate() for every point in the tree (or the points at indices) at once with numpy, returning
+            the index of the point each (x, y, mass) is for
+    """
+
+    MAX_DEPTH: int = 32  # stops coincident points being split forever
+
+    def __init__(self, points: list[tuple[float, float]], leaf_size: int = 1):
+        self._points = points
+        self._leaf_size = max(1, leaf_size)
+
+        # Cells are stored in parallel lists indexed by cell number (the root is cell 0), the children of a cell and
+        # the points in a leaf are contiguous runs of _child_cells and _leaf_indices
+        self._mass: list[int] = []
+        self._com_x: list[float] = []
+        self._com_y: list[float] = []
+        self._centre_x: list[float] = []
+        self._centre_y: list[float] = []
+        self._half_size: list[float] = []
+        self._child_offset: list[int] = []
+        self._child_count: list[int] = []
+        self._leaf_offset: list[int] = []
+        self._leaf_count: list[int] = []
+        self._child_cells: list[int] = []
+        self._leaf_indices: list[int] = []
+        self._arrays: dict | None = None  # numpy copies of the lists above, made by the first approximate_all()
+
+        if points:
+            min_x = min(x for x, _ in points)
+            max_x = max(x for x, _ in points)
+            min_y = min(y for _, y in points)
+            max_y = max(y for _, y in points)
+            half_size = max(max_x - min_x, max_y - min_y, 1e-9) / 2
+            self._build(list(range(len(points))), (min_x + max_x) / 2, (min_y + max_y) / 2, half_size, 0)
+
+    @property
+    def points(self) -> list[tuple[float, float]]:
+        return self._points
+
+    @property
+    def leaf_size(self) -> int:
+        return self._leaf_size
+
+    @property
+    def node_count(self) -> int:
+        return len(self._mass)
+
+    def _build(self, indices: list[int], centre_x: float, centre_y: float, half_size: float, depth: int) -> int:
+        cell = len(self._mass)
+        points = self._points
+        self._mass.append(len(indices))
+        self._com_x.append(sum(points[i][0] for i in indices) / len(indices))
+        self._com_y.append(sum(points[i][1] for i in indices) / len(indices))
+        self._centre_x.append(centre_x)
+        self._centre_y.append(centre_y)
+        self._half_size.append(half_size)
+        self._child_offset.append(0)
+        self._child_count.append(0)
+
+        if len(indices) <= self._leaf_size or depth >= self.MAX_DEPTH:
+            self._leaf_offset.append(len(self._leaf_indices))
+            self._leaf_count.append(len(indices))
+            self._leaf_indices.extend(indices)
+            return cell
+        self._leaf_offset.append(0)
+        self._leaf_count.append(0)
+
+        quadrants: tuple[list[int], ...] = ([], [], [], [])
+        for i in indices:
+            x, y = points[i]
+            quadrants[(x >= centre_x) + 2 * (y >= centre_y)].append(i)
+
+        quarter = half_size / 2
+        children = []
+        for quadrant, quadrant_indices in enumerate(quadrants):
+            if quadrant_indices:
+                child_x = centre_x + (quarter if quadrant & 1 else -quarter)
+                child_y = centre_y + (quarter if quadrant & 2 else -quarter)
+                children.append(self._build(quadrant_indices, child_x, child_y, quarter, depth + 1))
+        self._child_offset[cell] = len(self._child_cells)
+        self._child_count[cell] = len(children)
+        self._child_cells.extend(children)
+        return cell
+
+    def approximate(self, x: float, y: float, theta: float,
+                    max_distance: float = math.inf) -> list[tuple[float, float, int]]:
+        # A cell of width s at distance d from (x, y) is used as a single mass when s / d < theta, cells entirely
+        # further away than max_distance are skipped as they can not affect (x, y)
+        if not self._mass:
+            return []
+        points = self._points
+        mass, com_x, com_y = self._mass, self._com_x, self._com_y
+        centre_x, centre_y, half_size = self._centre_x, self._centre_y, self._half_size
+        child_offset, child_count, child_cells = self._child_offset, self._child_count, self._child_cells
+        leaf_offset, leaf_count, leaf_indices = self._leaf_offset, self._leaf_count, self._leaf_indices
+        theta_sq = theta * theta
+        max_distance_sq = max_distance * max_distance
+
+        output: list[tuple[float, float, int]] = []
+        stack = [0]
+        while stack:
+            cell = stack.pop()
+            half = half_size[cell]
+            gap_x = abs(x - centre_x[cell]) - half
+            gap_y = abs(y - centre_y[cell]) - half
+            inside = gap_x <= 0 and gap_y <= 0
+            if not inside:
+                gap_x = max(gap_x, 0.0)
+                gap_y = max(gap_y, 0.0)
+                if gap_x * gap_x + gap_y * gap_y >= max_distance_sq:
+                    continue
+
+            if leaf_count[cell]:
+                offset = leaf_offset[cell]
+                output.extend((points[i][0], points[i][1], 1) for i in leaf_indices[offset:offset + leaf_count[cell]])
+                continue
+            if not inside:
+                dx = com_x[cell] - x
+                dy = com_y[cell] - y
+                if 4 * half * half < theta_sq * (dx * dx + dy * dy):
+                    output.append((com_x[cell], com_y[cell], mass[cell]))
+                    continue
+            offset = child_offset[cell]
+            stack.extend(child_cells[offset:offset + child_count[cell]])
+        return output
+
+    def approximate_all(self, theta: float, max_distance: float = math.inf, indices=None):
+        # Walks the tree for every point at once, one level per loop, keeping a (point, cell) pair for each cell
+        # still to be looked at
+        import numpy as np  # imported here as numpy is optional and only needed by callers already using it
+
+        if self._arrays is None:
+            self._arrays = {name: np.array(getattr(self, "_" + name), dtype=np.float64)
+                            for name in ("com_x", "com_y", "centre_x", "centre_y", "half_size")}
+            self._arrays.update({name: np.array(getattr(self, "_" + name), dtype=np.intp)
+                                 for name in ("mass", "child_offset", "child_count", "leaf_offset", "leaf_count",
+                                              "child_cells", "leaf_indices")})
+            self._arrays["points"] = np.array(self._points, dtype=np.float64).reshape(-1, 2)
+        arrays = self._arrays
+        point_x = arrays["points"][:, 0]
+        point_y = arrays["points"][:, 1]
+        theta_sq = theta * theta
+        max_distance_sq = max_distance * max_distance
+
+        found_points, found_x, found_y, found_mass = [np.empty(0, dtype=np.intp)], [np.empty(0)], [np.empty(0)], \
+            [np.empty(0, dtype=np.intp)]
+        point = np.arange(len(self._points)) if indices is None else np.asarray(indices, dtype=np.intp)
+        cell = np.zeros(len(point), dtype=np.intp)
+        while len(point):
+            x = point_x[point]
+            y = point_y[point]
+            half = arrays["half_size"][cell]
+            gap_x = np.abs(x - arrays["centre_x"][cell]) - half
+            gap_y = np.abs(y - arrays["centre_y"][cell]) - half
+            inside = (gap_x <= 0) & (gap_y <= 0)
+            np.maximum(gap_x, 0, out=gap_x)
+            np.maximum(gap_y, 0, out=gap_y)
+            near = inside | (gap_x * gap_x + gap_y * gap_y < max_distance_sq)
+            point, cell, inside, x, y, half = point[near], cell[near], inside[near], x[near], y[near], half[near]
+
+            leaf_count = arrays["leaf_count"][cell]
+            leaf = leaf_count > 0
+            leaf_points = arrays["leaf_indices"][_ragged_range(arrays["leaf_offset"][cell[leaf]], leaf_count[leaf])]
+            found_points.append(np.repeat(point[leaf], leaf_count[leaf]))
+            found_x.append(point_x[leaf_points])
+            found_y.append(point_y[leaf_points])
+            found_mass.append(np.ones(len(leaf_points), dtype=np.intp))
+
+            inner = ~leaf
+            dx = arrays["com_x"][cell] - x
+            dy = arrays["com_y"][cell] - y
+            far = inner & ~inside & (4 * half * half < theta_sq * (dx * dx + dy * dy))
+            found_points.append(point[far])
+            found_x.append(arrays["com_x"][cell[far]])
+            found_y.append(arrays["com_y"][cell[far]])
+            found_mass.append(arrays["mass"][cell[far]])
+
+            split = inner & ~far
+            child_count = arrays["child_count"][cell[split]]
+            point = np.repeat(point[split], child_count)
+            cell = arrays["child_cells"][_ragged_range(arrays["child_offset"][cell[split]], child_count)]
+
+        return (np.concatenate(found_points), np.concatenate(found_x), np.concatenate(found_y),
+                np.concatenate(found_mass))
+
+
+def _ragged_range(starts, counts):
+    # The indices start[0]..start[0]+count[0]-1, start[1]..start[1]+count[1]-1, ... as one numpy array
+    import numpy as np
+
+    total = int(counts.sum())
+    run_starts = np.cumsum(counts) - counts
+    return np.repeat(starts - run_starts, counts) + np.arange(total)
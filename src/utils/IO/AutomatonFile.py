@@ -1,36 +1,74 @@
 # FlippyFlappingTheJ
 # ./src/utils/IO/AutomatonFile.py
 
+import json
 import os.path
+import tempfile
+from collections.abc import Iterable
+from typing import Self, TextIO
 
 from src.utils.AppDataConfig.Config import ConfigurationFile
 from src.utils.Automata.AutomataLink import AutomataLink
 from src.utils.Automata.AutomataState import AutomataState
+from src.utils.IO.FileMode import match_file_mode
 from src.utils.Language.AutomataAlphabet import AutomataAlphabet
 from src.utils.Language.AutomataChar import AutomataChar
 
 
 class AutomatonFile(ConfigurationFile):
+    """
+    Class used to read and write .automaton files
+    (Note: the file is only parsed when it is first read from, so writing a file and getting its AutomatonFile
+    back does not read the whole file in again)
+    (Note: the optional "positions" section holds where each state was last shown, so reopening a file does not need
+    it laid out again, files without it are still read as before)
+
+    ...
+
+    Methods
+    -------
+    is_deterministic() -> bool
+        checks if the file holds a deterministic automaton
+    get_alphabet() -> AutomataAlphabet
+        returns the alphabet of the automaton
+    get_states() -> tuple[list[AutomataState], list[int], int]
+        returns the states, final state ids and initial state id of the automaton
+    get_transitions(states: list[AutomataState], alphabet: AutomataAlphabet | None = None) -> list[AutomataLink]
+        returns the transitions of the automaton between the given states (sharing the alphabet's chars if given)
+    get_positions() -> dict[int, tuple[float, float]]
+        returns the saved position of each state id (empty if the file has none)
+    to_finite_automaton() -> DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton
+        loads the whole automaton
+    write(fp: str, automaton: Automaton, is_deterministic: bool, compact: bool = False,
+          positions: dict[int, tuple[float, float]] | None = None) -> AutomatonFile
+        streams an automaton, and the positions of its states if given, to a .automaton file (compact files are
+        written without indentation)
+    """
+
+    INDENT: int = 4
+    POSITION_DIGITS: int = 2  # positions are rounded to this many decimal places when written
 
     def __init__(self, fp: str):
-        super().__init__(fp)
 
-        _, extension = os.path.splitext(self.url)
+        _, extension = os.path.splitext(fp)
         if not extension == ".automaton":
             raise ValueError(f"File type: {extension}, Expected .automaton")
 
+        super().__init__(fp, load=False)
+
+    def __getattr__(self, name: str):
+        if name != "data":
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        with open(self.url, "r") as read_file:
+            self.data = json.load(read_file)
+        return self.data
+
     def is_deterministic(self) -> bool:
         return bool(self.getValue("is_deterministic"))
 
     def get_alphabet(self) -> AutomataAlphabet:
-        alphabet_chars = list(self.getValue("alphabet"))
-        alphabet = AutomataAlphabet()
-
-        for char in alphabet_chars:
-            automata_char = AutomataChar(char)
-            alphabet.add(automata_char)
-
-        return alphabet
+        alphabet_chars = dict.fromkeys(self.getValue("alphabet"))  # removes duplicates while keeping the order
+        return AutomataAlphabet([AutomataChar(char) for char in alphabet_chars])
 
     def get_states(self) -> tuple[list[AutomataState], list[int], int]:
         """
@@ -61,26 +99,120 @@ class AutomatonFile(ConfigurationFile):
 
         return states, final_states, initial_state
 
-    def get_transitions(self, states: list[AutomataState]) -> list[AutomataLink]:
+    def get_transitions(self, states: list[AutomataState], alphabet: AutomataAlphabet | None = None) -> list[AutomataLink]:
         file_transitions = self.getValue("transitions")
+        is_deterministic = self.is_deterministic()
+
+        states_by_id = {state.id: state for state in states}
+        chars: dict[str, AutomataChar] = {char.char: char for char in alphabet} if alphabet is not None else {}
 
         transitions: list[AutomataLink] = []
 
         for transition_id, details in file_transitions.items():
-            state_from: AutomataState | None = None
-            state_to: AutomataState | None = None
-            for state in states:
-                if state.id == int(details["from"]):
-                    state_from = state
-                if state.id == int(details["to"]):
-                    state_to = state
+            state_from = states_by_id.get(int(details["from"]))
+            state_to = states_by_id.get(int(details["to"]))
             if state_from is None or state_to is None:
                 raise ValueError(f"State {details["from"]} or {details["to"]} does not exist in states passed in")
 
-            link_by: list[AutomataChar] = []
-            for char in details["by"]:
-                link_by.append(AutomataChar(char))
+            link_by: list[AutomataChar] | None = []
+            for char in details["by"] if "by" in details else details["link_by"]:  # files written by to_file use link_by
+                automata_char = chars.get(char)
+                if automata_char is None:
+                    automata_char = chars[char] = AutomataChar(char)
+                link_by.append(automata_char)
+            if not link_by and not is_deterministic:
+                link_by = None  # to_file writes lambda links as an empty list
 
             transitions.append(AutomataLink(int(transition_id), state_from, state_to, link_by))
 
         return transitions
+
+    def get_positions(self) -> dict[int, tuple[float, float]]:
+        file_positions = self.getValue("positions")
+        if not file_positions:
+            return {}
+        return {int(state_id): (float(x), float(y)) for state_id, (x, y) in file_positions.items()}
+
+    @staticmethod
+    def write(fp: str, automaton, is_deterministic: bool, compact: bool = False,
+              positions: dict[int, tuple[float, float]] | None = None) -> Self:
+        # Write to a temporary file first so a failed save never leaves a half written file behind
+        folder = os.path.dirname(os.path.abspath(fp))
+        fd, temp_fp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as write_file:
+                AutomatonFile._write_automaton(write_file, automaton, is_deterministic, compact, positions)
+            match_file_mode(temp_fp, fp)
+            os.replace(temp_fp, fp)
+        except BaseException:
+            if os.path.exists(temp_fp):
+                os.remove(temp_fp)
+            raise
+
+        return AutomatonFile(fp)
+
+    @staticmethod
+    def _write_automaton(write_file: TextIO, automaton, is_deterministic: bool, compact: bool,
+                         positions: dict[int, tuple[float, float]] | None = None):
+        # The output matches json.dumps(..., indent=4, sort_keys=True) (or the compact separators) of the whole
+        # file, but every state and transition is formatted and written on its own so the file is never in memory
+        newline = "" if compact else "\n"
+        item_separator, key_separator = (",", ":") if compact else (",", ": ")
+        indents = [newline + " " * (0 if compact else AutomatonFile.INDENT * depth) for depth in range(5)]
+        encode = json.JSONEncoder().encode
+
+        def encode_list(values: list, depth: int) -> str:
+            if not values:
+                return "[]"
+            return ("[" + indents[depth + 1] + (item_separator + indents[depth + 1]).join(map(encode, values)) +
+                    indents[depth] + "]")
+
+        def encode_object(items: list[tuple[str, str]], depth: int) -> str:
+            if not items:
+                return "{}"
+            return ("{" + indents[depth + 1] +
+                    (item_separator + indents[depth + 1]).join(f"\"{key}\"{key_separator}{value}" for key, value in items)
+                    + indents[depth] + "}")
+
+        def write_section(key: str, entries: Iterable[tuple[str, str]], last: bool = False):
+            write_file.write(f"{indents[1]}\"{key}\"{key_separator}")
+            first = True
+            for entry_key, value in entries:
+                write_file.write(("{" if first else item_separator) + indents[2] + encode(entry_key) + key_separator + value)
+                first = False
+            write_file.write("{}" if first else indents[1] + "}")
+            if not last:
+                write_file.write(item_separator)
+
+        states = sorted(automaton.states, key=lambda state: str(state.id))
+        transitions = sorted(automaton.transitions, key=lambda transition: str(transition.id))
+
+        write_file.write("{")
+        write_file.write(f"{indents[1]}\"alphabet\"{key_separator}"
+                         f"{encode_list([char.char for char in automaton.alphabet], 1)}{item_separator}")
+        write_file.write(f"{indents[1]}\"is_deterministic\"{key_separator}{encode(is_deterministic)}{item_separator}")
+        if positions:
+            write_section("positions", ((str(state.id), encode_list([round(coordinate, AutomatonFile.POSITION_DIGITS)
+                                                                     for coordinate in positions[state.id]], 2))
+                                        for state in states if state.id in positions))
+        write_section("states", ((str(state.id), encode_object([("final", encode(state.is_final)),
+                                                                ("initial", encode(state.is_initial))], 2))
+                                 for state in states))
+        write_section("transitions", ((str(transition.id), encode_object([
+            ("from", encode(transition.state_from.id)),
+            ("link_by", encode_list([char.char for char in transition.link_by]
+                                    if transition.link_by is not None else [], 3)),
+            ("to", encode(transition.state_to.id))], 2)) for transition in transitions), last=True)
+        write_file.write(indents[0] + "}")
+
+    def to_finite_automaton(self):
+        # imported here since the automata modules import this file
+        from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+        from src.utils.Automata.NDFA import NonDeterministicFiniteAutomaton
+
+        alphabet = self.get_alphabet()
+        states, final_states, initial_state = self.get_states()
+        transitions = self.get_transitions(states, alphabet)
+        if self.is_deterministic():
+            return DeterministicFiniteAutomaton(states, alphabet, transitions, initial_state, final_states)
+        return NonDeterministicFiniteAutomaton(states, alphabet, transitions, initial_state, final_states)
@@ -0,0 +1,299 @@
+# FlippyFlappingTheJ
+# ./src/utils/IO/AutomatonJournal.py
+
+import json
+import os
+from collections.abc import Callable
+from typing import Self, TextIO
+
+from src.utils.Automata.AutomatonBuilder import AutomatonBuilder, BuilderOperation
+from src.utils.IO.AutomatonFile import AutomatonFile
+
+
+class AutomatonJournal:
+    """
+    Class used to autosave an open .automaton document as an append only journal of builder operations
+    (Note: every change is appended to "<document>.journal" as it happens, so autosaving costs O(change) rather than
+    O(automaton) and a crash loses at most the operation being written. The journal is compacted into a snapshot
+    beside the document, "<document name>.autosave.automaton", on compact() or once it holds compact_threshold
+    operations.)
+    (Note: the document itself is only ever written by save(), autosaving never replaces what the user saved)
+
+    A journal applies to the snapshot if there is one (and it is not older than the document) and to the document
+    otherwise. Its first line records the name, size and modification time of the file it applies to, a journal
+    whose file has since been replaced (e.g. by a compaction that crashed before resetting the journal) is ignored
+    when the document is opened.
+
+    Moving a state is not a builder operation so is not journaled, the positions of the states (taken from
+    get_positions) are written to the snapshot whenever it is compacted and to the document when it is saved.
+
+    ...
+
+    Attributes
+    ----------
+    JOURNAL_EXTENSION -> str
+        the extension added to the document path to get its journal path
+    SNAPSHOT_SUFFIX -> str
+        the suffix added to the document name to get its snapshot path
+    fp -> str
+        the path of the document
+    journal_fp -> str
+        the path of the journal
+    snapshot_fp -> str
+        the path of the snapshot the journal is compacted into
+    builder -> AutomatonBuilder
+        the automaton being journaled
+    operation_count -> int
+        the number of operations in the journal since the last compaction
+    get_positions -> Callable[[], dict[int, tuple[float, float]]] | None
+        returns the positions of the states to save in the document (None keeps saved_positions)
+    saved_positions -> dict[int, tuple[float, float]]
+        the positions of the states saved in the document (or its snapshot) when it was opened
+
+    Methods
+    -------
+    open(fp: str, compact_threshold: int = 1000, sync: bool = True,
+         get_positions: Callable[[], dict[int, tuple[float, float]]] | None = None) -> AutomatonJournal
+        opens a document, recovering its snapshot and journal if they were left behind
+    attach(builder: AutomatonBuilder)
+        journals another builder (replacing the snapshot with it, the document is left as it was saved)
+    compact()
+        writes the builder to the snapshot and starts a new, empty journal
+    save()
+        writes the builder to the document and removes the snapshot and journal
+    close()
+        stops journaling and closes the journal file
+    replay(builder: AutomatonBuilder, operations: list[dict])
+        applies journaled operations to a builder
+    """
+
+    JOURNAL_EXTENSION: str = ".journal"
+    SNAPSHOT_SUFFIX: str = ".autosave"
+
+    def __init__(self, fp: str, builder: AutomatonBuilder, compact_threshold: int = 1000, sync: bool = True,
+                 get_positions: Callable[[], dict[int, tuple[float, float]]] | None = None):
+
+        self._fp = fp
+        self._journal_fp = fp + self.JOURNAL_EXTENSION
+        self._snapshot_fp = self._snapshot_path(fp)
+        self._builder = builder
+        self._compact_threshold = compact_threshold
+        self._sync = sync  # fsync every operation so it survives the OS crashing as well as the app
+        self._operation_count = 0
+        self._journal_file: TextIO | None = None
+        self._get_positions = get_positions
+        self._saved_positions: dict[int, tuple[float, float]] = {}
+
+        self._builder.add_listener(self._record)
+
+    @property
+    def fp(self) -> str:
+        return self._fp
+
+    @property
+    def journal_fp(self) -> str:
+        return self._journal_fp
+
+    @property
+    def snapshot_fp(self) -> str:
+        return self._snapshot_fp
+
+    @property
+    def builder(self) -> AutomatonBuilder:
+        return self._builder
+
+    @property
+    def operation_count(self) -> int:
+        return self._operation_count
+
+    @property
+    def get_positions(self) -> Callable[[], dict[int, tuple[float, float]]] | None:
+        return self._get_positions
+
+    @get_positions.setter
+    def get_positions(self, get_positions: Callable[[], dict[int, tuple[float, float]]] | None):
+        self._get_positions = get_positions
+
+    @property
+    def saved_positions(self) -> dict[int, tuple[float, float]]:
+        return self._saved_positions
+
+    @staticmethod
+    def open(fp: str, compact_threshold: int = 1000, sync: bool = True,
+             get_positions: Callable[[], dict[int, tuple[float, float]]] | None = None) -> Self:
+        builder = AutomatonBuilder()
+        saved_positions = {}
+        base_fp = AutomatonJournal._base_path(fp)
+        if os.path.exists(base_fp):
+            automaton_file = AutomatonFile(base_fp)
+            AutomatonJournal._load_snapshot(builder, automaton_file)
+            saved_positions = automaton_file.get_positions()
+
+        operations = AutomatonJournal._read_journal(fp, base_fp)
+        AutomatonJournal.replay(builder, operations)
+
+        journal = AutomatonJournal(fp, builder, compact_threshold, sync, get_positions)
+        # states the journal removed have no position to keep, states it added have none saved
+        state_ids = {state.id for state in builder.states}
+        journal._saved_positions = {state_id: position for state_id, position in saved_positions.items()
+                                    if state_id in state_ids}
+        if operations:
+            # Keep appending to the recovered journal rather than writing a snapshot straight away
+            journal._operation_count = len(operations)
+            journal._journal_file = open(journal._journal_fp, "a", encoding="utf-8")
+        return journal
+
+    @staticmethod
+    def _load_snapshot(builder: AutomatonBuilder, automaton_file: AutomatonFile):
+        # Unlike AutomatonBuilder.get_builder_from_finite_automata this keeps every transition and its id intact,
+        # journaled operations refer to transitions by id
+        automaton = automaton_file.to_finite_automaton()
+        for state in automaton.states:
+            builder.add_state(state.is_final, state.is_initial, _id=state.id)
+        for transition in automaton.transitions:
+            link_by = None if transition.link_by is None else [char.char for char in transition.link_by]
+            builder.add_transition(transition.state_from.id, transition.state_to.id, link_by, _id=transition.id)
+
+    @staticmethod
+    def _snapshot_path(fp: str) -> str:
+        root, extension = os.path.splitext(fp)
+        return root + AutomatonJournal.SNAPSHOT_SUFFIX + extension
+
+    @staticmethod
+    def _base_path(fp: str) -> str:
+        # The file the journal applies to. A snapshot older than the document was left by a save that crashed
+        # before removing it, the document already holds its changes.
+        snapshot_fp = AutomatonJournal._snapshot_path(fp)
+        if not os.path.exists(snapshot_fp):
+            return fp
+        if os.path.exists(fp) and os.stat(snapshot_fp).st_mtime_ns < os.stat(fp).st_mtime_ns:
+            return fp
+        return snapshot_fp
+
+    @staticmethod
+    def _stamp(base_fp: str) -> dict:
+        if not os.path.exists(base_fp):
+            return {}
+        stat = os.stat(base_fp)
+        return {"base": os.path.basename(base_fp), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @staticmethod
+    def _read_journal(fp: str, base_fp: str) -> list[dict]:
+        journal_fp = fp + AutomatonJournal.JOURNAL_EXTENSION
+        try:
+            with open(journal_fp, "r", encoding="utf-8") as read_file:
+                lines = read_file.read().splitlines()
+        except FileNotFoundError:
+            return []
+        if not lines:
+            return []
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return []
+        if header != AutomatonJournal._stamp(base_fp):
+            return []  # the journal belongs to an older snapshot or document, which already holds its changes
+
+        operations = []
+        for line in lines[1:]:
+            try:
+                operations.append(json.loads(line))
+            except ValueError:
+                break  # the last operation was cut off mid write, everything before it is still valid
+        return operations
+
+    @staticmethod
+    def replay(builder: AutomatonBuilder, operations: list[dict]):
+        for operation in operations:
+            name = operation["op"]
+            if name == "add_state":
+                success, err = builder.add_state(operation["final"], operation["initial"], _id=operation["id"])
+            elif name == "remove_state":
+                success, err = builder.remove_state(operation["id"])
+            elif name == "add_transition":
+                success, err = builder.add_transition(operation["from"], operation["to"], operation["by"],
+                                                      _id=operation["id"])
+            elif name == "remove_transition":
+                success, err = builder.remove_transition(operation["id"])
+            elif name == "toggle_state_initial":
+                success, err = builder.toggle_state_initial(operation["id"])
+            elif name == "toggle_state_final":
+                success, err = builder.toggle_state_final(operation["id"])
+            else:
+                raise ValueError(f"Unknown journal operation '{name}'.")
+            if not success:
+                raise ValueError(f"Journal operation {operation} could not be replayed: {err}")
+
+    @staticmethod
+    def _encode(operation: BuilderOperation) -> dict:
+        args = operation.args
+        if operation.name == "add_state":
+            return {"op": operation.name, "id": args["id"], "final": args["final"], "initial": args["initial"]}
+        if operation.name == "add_transition":
+            return {"op": operation.name, "id": args["id"], "from": args["state_from"], "to": args["state_to"],
+                    "by": args["link_by"]}
+        return {"op": operation.name, "id": args["id"]}
+
+    def _record(self, operation: BuilderOperation):
+        if operation.nested:
+            return  # replaying the operation that caused it makes it again
+        if self._journal_file is None:
+            self._start_journal()
+
+        self._journal_file.write(json.dumps(self._encode(operation), ensure_ascii=False) + "\n")
+        self._journal_file.flush()
+        if self._sync:
+            os.fsync(self._journal_file.fileno())
+        self._operation_count += 1
+
+        if self._operation_count >= self._compact_threshold:
+            self.compact()
+
+    def _start_journal(self):
+        # Only called while the builder matches the file the journal will apply to (the snapshot or document it
+        # was opened from, just compacted into or just saved to)
+        if self._journal_file is not None:
+            self._journal_file.close()
+        with open(self._journal_fp, "w", encoding="utf-8") as write_file:
+            write_file.write(json.dumps(self._stamp(self._base_path(self._fp))) + "\n")
+        self._journal_file = open(self._journal_fp, "a", encoding="utf-8")
+        self._operation_count = 0
+
+    def _write_automaton(self, fp: str):
+        automaton = self._builder.to_finite_automata()
+        # without get_positions the positions the document was opened with are kept
+        positions = self._get_positions() if self._get_positions is not None else self._saved_positions
+        AutomatonFile.write(fp, automaton, self._builder.is_deterministic(), positions=positions)
+
+    def attach(self, builder: AutomatonBuilder):
+        if builder is self._builder:
+            return
+        self._builder.remove_listener(self._record)
+        self._builder = builder
+        self._builder.add_listener(self._record)
+        self.compact()  # a whole new automaton is cheaper to save as a snapshot than as operations
+
+    def compact(self):
+        # The new snapshot no longer matches the old journal's header, so the old journal is stale even if the app
+        # crashes before the new one is started
+        self._write_automaton(self._snapshot_fp)
+        self._start_journal()
+
+    def save(self):
+        self._write_automaton(self._fp)
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        # The document now holds every change, a crash before these are removed leaves a snapshot older than it
+        # (which is ignored) or one whose journal replays to the same automaton
+        for fp in (self._journal_fp, self._snapshot_fp):
+            if os.path.exists(fp):
+                os.remove(fp)
+        self._operation_count = 0
+
+    def close(self):
+        self._builder.remove_listener(self._record)
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
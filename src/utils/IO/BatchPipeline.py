@@ -0,0 +1,233 @@
+# FlippyFlappingTheJ
+# ./src/utils/IO/BatchPipeline.py
+
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, TextIO
+
+from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+from src.utils.Automata.NDFA import NonDeterministicFiniteAutomaton
+from src.utils.IO.AutomatonFile import AutomatonFile
+from src.utils.IO.BinaryAutomatonFile import BinaryAutomatonFile
+from src.utils.Language.LanguageCompiler import LanguageCompiler
+from src.utils.Language.LanguageScript import LanguageScriptFile
+
+
+@dataclass
+class BatchResult:
+    """
+    The outcome of processing a single automaton (a .lsf file gives one result per language)
+    """
+
+    path: str
+    language: str | None = None
+    status: str = "ok"  # "ok", "failed" (a test vector did not match) or "error"
+    error: str | None = None
+    states: int = 0
+    minimal_states: int = 0
+    output: str | None = None
+    vectors: list[dict] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class BatchPipeline:
+    """
+    Class used to process whole directory trees of .automaton, .bautomaton and .lsf files
+    (Note: files are spread over a process pool and each one goes through load -> determinise -> minimise ->
+    run test vectors -> write, a failing file only produces an error result and never stops the batch)
+    (Note: results are written in the sorted order of the input paths no matter which worker finishes first)
+
+    Test vectors are read from a "<file>.vectors" file next to each input and/or a vectors file shared by every
+    input, one input string per line optionally followed by a tab and "accept" or "reject" (lines starting with
+    # are ignored, an empty line is the empty string).
+
+    ...
+
+    Attributes
+    ----------
+    EXTENSIONS -> tuple[str, ...]
+        the file extensions picked up when scanning a directory
+    input_folder -> str
+        the directory tree being processed
+    output_folder -> str | None
+        the folder the minimised automata are written to, mirroring the input tree (None to not write them).
+        x.automaton is written as x.automaton, any other file has .automaton added (x.lsf.automaton, or
+        x.lsf.<language>.automaton for each named language)
+    workers -> int
+        the number of worker processes (1 processes the files in this process)
+
+    Methods
+    -------
+    find_files() -> list[str]
+        returns the sorted paths of every file to process
+    run(results_file: TextIO, progress: Callable[[int, int, BatchResult], None] | None = None) -> dict[str, int]
+        processes every file, writing one JSON result per line, and returns the count of each status
+    process_file(path: str, input_folder: str, output_folder: str | None, shared_vectors: str | None)
+            -> list[BatchResult]
+        processes a single file (the function run by the workers)
+    read_vectors(fp: str) -> list[tuple[str, bool | None]]
+        reads a test vectors file
+    """
+
+    EXTENSIONS: tuple[str, ...] = (".automaton", BinaryAutomatonFile.EXTENSION, ".lsf")
+
+    def __init__(self, input_folder: str, output_folder: str | None = None, workers: int | None = None,
+                 vectors_file: str | None = None, cache_folder: str | None = None):
+
+        self._input_folder = input_folder
+        self._output_folder = output_folder
+        self._workers = max(1, workers if workers is not None else (os.cpu_count() or 1))
+        self._vectors_file = vectors_file
+        self._cache_folder = cache_folder
+
+    @property
+    def input_folder(self) -> str:
+        return self._input_folder
+
+    @property
+    def output_folder(self) -> str | None:
+        return self._output_folder
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def find_files(self) -> list[str]:
+        files = []
+        for root, dirs, filenames in os.walk(self._input_folder):
+            dirs.sort()
+            for filename in filenames:
+                if filename.endswith(self.EXTENSIONS):
+                    files.append(os.path.join(root, filename))
+        files.sort()
+        return files
+
+    def run(self, results_file: TextIO,
+            progress: Callable[[int, int, BatchResult], None] | None = None) -> dict[str, int]:
+        files = self.find_files()
+        counts = {"ok": 0, "failed": 0, "error": 0}
+
+        def write(done: int, results: list[BatchResult]):
+            for result in results:
+                counts[result.status] += 1
+                results_file.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+                if progress is not None:
+                    progress(done, len(files), result)
+
+        if self._workers == 1:
+            _init_worker(self._cache_folder)
+            for done, path in enumerate(files, 1):
+                write(done, BatchPipeline.process_file(path, self._input_folder, self._output_folder,
+                                                       self._vectors_file))
+            return counts
+
+        # Results are buffered until every earlier file has finished so the output order never depends on timing
+        with ProcessPoolExecutor(max_workers=self._workers, initializer=_init_worker,
+                                 initargs=(self._cache_folder,)) as executor:
+            futures: list[Future] = [executor.submit(BatchPipeline.process_file, path, self._input_folder,
+                                                     self._output_folder, self._vectors_file) for path in files]
+            for done, (path, future) in enumerate(zip(files, futures), 1):
+                try:
+                    results = future.result()
+                except Exception as e:  # e.g. a worker process dying
+                    results = [BatchResult(path, status="error", error=f"{type(e).__name__}: {e}")]
+                write(done, results)
+        return counts
+
+    @staticmethod
+    def process_file(path: str, input_folder: str, output_folder: str | None,
+                     shared_vectors: str | None) -> list[BatchResult]:
+        start = time.perf_counter()
+        try:
+            vectors = BatchPipeline.read_vectors(shared_vectors) if shared_vectors is not None else []
+            if os.path.exists(path + ".vectors"):
+                vectors += BatchPipeline.read_vectors(path + ".vectors")
+
+            if path.endswith(".lsf"):
+                script = LanguageScriptFile(path)
+                automata = [(name if name is not None else str(i) if len(script.languages) > 1 else None,
+                             language.to_minimal_deterministic_finite_automaton())
+                            for i, (name, language) in enumerate(script.languages)]
+            elif path.endswith(BinaryAutomatonFile.EXTENSION):
+                with BinaryAutomatonFile(path) as binary_file:
+                    automata = [(None, binary_file.to_finite_automaton())]
+            else:
+                automata = [(None, AutomatonFile(path).to_finite_automaton())]
+        except Exception as e:
+            return [BatchResult(path, status="error", error=_describe(e), seconds=time.perf_counter() - start)]
+
+        results = []
+        for name, automaton in automata:
+            result = BatchResult(path, language=name)
+            try:
+                BatchPipeline._process_automaton(result, automaton, input_folder, output_folder, vectors)
+            except Exception as e:
+                result.status = "error"
+                result.error = _describe(e)
+            results.append(result)
+        for result in results:
+            result.seconds = (time.perf_counter() - start) / len(results)
+        return results
+
+    @staticmethod
+    def _process_automaton(result: BatchResult, automaton: DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton,
+                           input_folder: str, output_folder: str | None, vectors: list[tuple[str, bool | None]]):
+        result.states = len(automaton.states)
+        dfa = automaton.to_deterministic() if isinstance(automaton, NonDeterministicFiniteAutomaton) else automaton
+        dfa = dfa.simplify()
+        result.minimal_states = len(dfa.states)
+
+        for input_string, expected in vectors:
+            accepted = dfa.run(input_string)
+            result.vectors.append({"input": input_string, "accepted": accepted, "expected": expected})
+            if expected is not None and accepted != expected:
+                result.status = "failed"
+
+        if output_folder is not None:
+            # The source extension is kept so x.lsf and x.bautomaton never overwrite the output of x.automaton
+            relative = os.path.relpath(result.path, input_folder)
+            if result.language is not None:
+                relative += "." + result.language
+            if not relative.endswith(".automaton"):
+                relative += ".automaton"
+            result.output = os.path.join(output_folder, relative)
+            os.makedirs(os.path.dirname(result.output), exist_ok=True)
+            dfa.to_file(result.output)
+
+    @staticmethod
+    def read_vectors(fp: str) -> list[tuple[str, bool | None]]:
+        vectors = []
+        with open(fp, "r", encoding="utf-8") as read_file:
+            for line_number, line in enumerate(read_file, 1):
+                line = line.rstrip("\r\n")
+                if line.startswith("#"):
+                    continue
+                input_string, _, expected = line.partition("\t")
+                if expected not in ("", "accept", "reject"):
+                    raise ValueError(f"{fp}:{line_number}: Expected 'accept' or 'reject', got '{expected}'.")
+                vectors.append((input_string, None if not expected else expected == "accept"))
+        return vectors
+
+
+def _init_worker(cache_folder: str | None):
+    if cache_folder is not None:
+        LanguageCompiler.set_disk_cache(cache_folder)
+
+
+def _describe(e: Exception) -> str:
+    frame = traceback.extract_tb(e.__traceback__)[-1] if e.__traceback__ is not None else None
+    location = f" ({os.path.basename(frame.filename)}:{frame.lineno})" if frame is not None else ""
+    return f"{type(e).__name__}: {e}{location}"
+
+
+def print_progress(done: int, total: int, result: BatchResult, stream: TextIO = sys.stderr):
+    label = result.path if result.language is None else f"{result.path} [{result.language}]"
+    message = f"[{done}/{total}] {result.status:<6} {label}"
+    if result.error is not None:
+        message += f" - {result.error}"
+    print(message, file=stream)
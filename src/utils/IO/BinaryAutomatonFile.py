@@ -0,0 +1,380 @@
+# FlippyFlappingTheJ
+# ./src/utils/IO/BinaryAutomatonFile.py
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator
+from typing import Self
+
+from src.utils.Automata.AutomataLink import AutomataLink
+from src.utils.Automata.AutomataState import AutomataState
+from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+from src.utils.Automata.NDFA import NonDeterministicFiniteAutomaton
+from src.utils.IO.AutomatonFile import AutomatonFile
+from src.utils.IO.FileMode import match_file_mode
+from src.utils.Language.AutomataAlphabet import AutomataAlphabet
+from src.utils.Language.AutomataChar import AutomataChar
+
+
+class BinaryAutomatonFile:
+    """
+    Class used to read and write .bautomaton files, a binary alternative to .automaton files
+    (Note: the file is memory mapped and every table is read in place through memoryviews, so opening a large
+    automaton is O(1) and queries such as run() can start before (or without) the automaton being materialised)
+
+    File format (little endian, every section starts on a 4 byte boundary)
+        header: magic "FFTJAUT\\0" | format version u16 | flags u16 (bit 0: deterministic) | state count u32 |
+                symbol count u32 | edge count u32 | link count u32 | start state index u32
+        alphabet: symbol offsets u32 (symbol count + 1) | utf-8 symbol bytes
+        state ids i32 (state count)
+        final state bitset
+        CSR edges: row offsets u32 (state count + 1) | edge targets u32 | edge symbols u32 (NO_SYMBOL for lambda)
+                   | edge link indexes u32 (edges of a row are sorted by symbol)
+        link ids i32 (link count, so links with several symbols are kept together when converting back)
+
+    ...
+
+    Attributes
+    ----------
+    EXTENSION -> str
+        the file extension of binary automaton files
+    fp -> str
+        the path of the file
+    is_deterministic -> bool
+        if the file holds a deterministic automaton
+    state_count -> int
+        the number of states
+    edge_count -> int
+        the number of (state, symbol, state) edges
+    alphabet -> list[str]
+        the symbols of the automaton
+    start_state -> int
+        the index of the start state
+
+    Methods
+    -------
+    state_id(index: int) -> int
+        returns the id of the state at an index
+    is_final(index: int) -> bool
+        checks if the state at an index is final
+    edges(index: int) -> Iterator[tuple[str | None, int]]
+        returns the (symbol, target index) edges leaving a state (None is a lambda edge)
+    step(index: int, symbol: str) -> list[int]
+        returns the indexes of the states reached from a state by a symbol
+    run(input_string: str) -> bool
+        runs the automaton on the input string straight from the file
+    to_finite_automaton() -> DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton
+        materialises the whole automaton
+    close()
+        unmaps the file
+    write(fp: str, automaton: DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton) -> BinaryAutomatonFile
+        writes an automaton to a binary automaton file
+    from_json(json_fp: str, fp: str) -> BinaryAutomatonFile
+        converts a .automaton file to a binary automaton file
+    to_json(fp: str) -> AutomatonFile
+        converts this file to a .automaton file
+    """
+
+    EXTENSION: str = ".bautomaton"
+    MAGIC: bytes = b"FFTJAUT\0"
+    FORMAT_VERSION: int = 1
+    HEADER = struct.Struct("<8sHHIIIII")
+    DETERMINISTIC_FLAG: int = 1
+    NO_SYMBOL: int = 0xFFFFFFFF
+
+    def __init__(self, fp: str):
+
+        _, extension = os.path.splitext(fp)
+        if not extension == self.EXTENSION:
+            raise ValueError(f"File type: {extension}, Expected {self.EXTENSION}")
+
+        self._fp = fp
+        with open(fp, "rb") as read_file:
+            # Checked before mapping, mmap cannot map an empty file and would fail with an unhelpful error
+            self._read_header(read_file.read(self.HEADER.size))
+            self._mmap = mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self._views: list[memoryview] = [self._buffer]
+        self._alphabet: list[str] | None = None
+        self._symbol_index: dict[str, int] | None = None
+
+        try:
+            self._read_layout()
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+    def _read_header(self, header: bytes):
+        if len(header) < self.HEADER.size:
+            raise ValueError(f"{self._fp} is not a binary automaton file (it is empty or truncated).")
+        magic, version, flags, states, symbols, edges, links, start = self.HEADER.unpack(header)
+        if magic != self.MAGIC:
+            raise ValueError(f"{self._fp} is not a binary automaton file.")
+        if version != self.FORMAT_VERSION:
+            raise ValueError(f"{self._fp} uses unsupported format version {version}.")
+
+        self._flags = flags
+        self._state_count = states
+        self._symbol_count = symbols
+        self._edge_count = edges
+        self._link_count = links
+        self._start_state = start
+
+    def _read_layout(self):
+        states, symbols, edges, links = self._state_count, self._symbol_count, self._edge_count, self._link_count
+        offset = self.HEADER.size
+        self._symbol_offsets, offset = self._table(offset, symbols + 1, "I")
+        self._symbol_bytes_offset = offset
+        offset = self._align(offset + self._symbol_offsets[symbols])
+        self._state_ids, offset = self._table(offset, states, "i")
+        self._final_bitset = self._buffer[offset:offset + (states + 7) // 8]
+        self._views.append(self._final_bitset)
+        offset = self._align(offset + (states + 7) // 8)
+        self._row_offsets, offset = self._table(offset, states + 1, "I")
+        self._edge_targets, offset = self._table(offset, edges, "I")
+        self._edge_symbols, offset = self._table(offset, edges, "I")
+        self._edge_links, offset = self._table(offset, edges, "I")
+        self._link_ids, offset = self._table(offset, links, "i")
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return (offset + 3) & ~3
+
+    def _table(self, offset: int, count: int, typecode: str) -> tuple[memoryview | array, int]:
+        end = offset + count * 4
+        if end > len(self._buffer):
+            raise ValueError(f"{self._fp} is truncated.")
+        if sys.byteorder == "little":
+            view = self._buffer[offset:end].cast(typecode)
+            self._views.append(view)
+            return view, end
+        table = array(typecode, self._buffer[offset:end])  # the file is little endian so big endian hosts need a copy
+        table.byteswap()
+        return table, end
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def fp(self) -> str:
+        return self._fp
+
+    @property
+    def is_deterministic(self) -> bool:
+        return bool(self._flags & self.DETERMINISTIC_FLAG)
+
+    @property
+    def state_count(self) -> int:
+        return self._state_count
+
+    @property
+    def edge_count(self) -> int:
+        return self._edge_count
+
+    @property
+    def alphabet(self) -> list[str]:
+        if self._alphabet is None:
+            start = self._symbol_bytes_offset
+            self._alphabet = [bytes(self._buffer[start + self._symbol_offsets[i]:start + self._symbol_offsets[i + 1]])
+                              .decode("utf-8") for i in range(self._symbol_count)]
+        return self._alphabet
+
+    @property
+    def start_state(self) -> int:
+        return self._start_state
+
+    def _get_symbol_index(self) -> dict[str, int]:
+        if self._symbol_index is None:
+            self._symbol_index = {symbol: i for i, symbol in enumerate(self.alphabet)}
+        return self._symbol_index
+
+    def state_id(self, index: int) -> int:
+        return self._state_ids[index]
+
+    def is_final(self, index: int) -> bool:
+        return bool(self._final_bitset[index >> 3] & (1 << (index & 7)))
+
+    def edges(self, index: int) -> Iterator[tuple[str | None, int]]:
+        alphabet = self.alphabet
+        for edge in range(self._row_offsets[index], self._row_offsets[index + 1]):
+            symbol = self._edge_symbols[edge]
+            yield None if symbol == self.NO_SYMBOL else alphabet[symbol], self._edge_targets[edge]
+
+    def _step_by_index(self, index: int, symbol: int) -> list[int]:
+        row_start, row_end = self._row_offsets[index], self._row_offsets[index + 1]
+        edge = bisect_left(self._edge_symbols, symbol, row_start, row_end)
+        targets = []
+        while edge < row_end and self._edge_symbols[edge] == symbol:
+            targets.append(self._edge_targets[edge])
+            edge += 1
+        return targets
+
+    def step(self, index: int, symbol: str) -> list[int]:
+        symbol_index = self._get_symbol_index().get(symbol)
+        if symbol_index is None:
+            return []
+        return self._step_by_index(index, symbol_index)
+
+    def _lambda_closure(self, indexes: set[int]) -> set[int]:
+        stack = list(indexes)
+        while stack:
+            for target in self._step_by_index(stack.pop(), self.NO_SYMBOL):
+                if target not in indexes:
+                    indexes.add(target)
+                    stack.append(target)
+        return indexes
+
+    def run(self, input_string: str) -> bool:
+        if self._state_count == 0:
+            return False
+        symbol_index = self._get_symbol_index()
+        if self.is_deterministic:
+            current = self._start_state
+            for char in input_string:
+                symbol = symbol_index.get(char)
+                targets = self._step_by_index(current, symbol) if symbol is not None else []
+                if not targets:
+                    return False
+                current = targets[0]
+            return self.is_final(current)
+
+        current_states = self._lambda_closure({self._start_state})
+        for char in input_string:
+            symbol = symbol_index.get(char)
+            if symbol is None:
+                return False
+            current_states = self._lambda_closure({target for state in current_states
+                                                   for target in self._step_by_index(state, symbol)})
+            if not current_states:
+                return False
+        return any(self.is_final(state) for state in current_states)
+
+    def to_finite_automaton(self) -> DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton:
+        alphabet = AutomataAlphabet([AutomataChar(symbol) for symbol in self.alphabet])
+        chars = alphabet.get_all()
+
+        states: list[AutomataState] = []
+        final_states: list[int] = []
+        for index in range(self._state_count):
+            state = AutomataState(self._state_ids[index], self.is_final(index), index == self._start_state)
+            states.append(state)
+            if state.is_final:
+                final_states.append(state.id)
+
+        links: dict[int, AutomataLink] = {}
+        for index in range(self._state_count):
+            for edge in range(self._row_offsets[index], self._row_offsets[index + 1]):
+                link_index = self._edge_links[edge]
+                symbol = self._edge_symbols[edge]
+                link = links.get(link_index)
+                if link is None:
+                    link = AutomataLink(self._link_ids[link_index], states[index], states[self._edge_targets[edge]],
+                                        None if symbol == self.NO_SYMBOL else [])  # lambda links are linked by None
+                    links[link_index] = link
+                if symbol != self.NO_SYMBOL:
+                    link.link_by.append(chars[symbol])
+        transitions = [links[link_index] for link_index in sorted(links)]
+
+        start_state = self._state_ids[self._start_state] if self._state_count else None
+        if self.is_deterministic:
+            return DeterministicFiniteAutomaton(states, alphabet, transitions, start_state, final_states)
+        return NonDeterministicFiniteAutomaton(states, alphabet, transitions, start_state, final_states)
+
+    @staticmethod
+    def write(fp: str, automaton: DeterministicFiniteAutomaton | NonDeterministicFiniteAutomaton) -> Self:
+        symbols = [char.char for char in automaton.alphabet]
+        symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        state_index = {state.id: i for i, state in enumerate(automaton.states)}
+        state_count = len(automaton.states)
+
+        rows: list[list[tuple[int, int, int]]] = [[] for _ in range(state_count)]  # (symbol, target, link) per state
+        for link_index, transition in enumerate(automaton.transitions):
+            row = rows[state_index[transition.state_from.id]]
+            target = state_index[transition.state_to.id]
+            if not transition.link_by:
+                row.append((BinaryAutomatonFile.NO_SYMBOL, target, link_index))
+            for char in transition.link_by or ():
+                row.append((symbol_index[char.char], target, link_index))
+
+        row_offsets = array("I", [0])
+        edge_targets, edge_symbols, edge_links = array("I"), array("I"), array("I")
+        for row in rows:
+            row.sort()
+            for symbol, target, link_index in row:
+                edge_symbols.append(symbol)
+                edge_targets.append(target)
+                edge_links.append(link_index)
+            row_offsets.append(len(edge_targets))
+
+        encoded_symbols = [symbol.encode("utf-8") for symbol in symbols]
+        symbol_offsets = array("I", [0])
+        for encoded in encoded_symbols:
+            symbol_offsets.append(symbol_offsets[-1] + len(encoded))
+
+        final_bitset = bytearray((state_count + 7) // 8)
+        for state in automaton.states:
+            if state.is_final:
+                index = state_index[state.id]
+                final_bitset[index >> 3] |= 1 << (index & 7)
+
+        flags = BinaryAutomatonFile.DETERMINISTIC_FLAG if isinstance(automaton, DeterministicFiniteAutomaton) else 0
+        start_state = state_index.get(automaton.start_state, 0)
+
+        def pad(data: bytearray):
+            data += bytes(-len(data) % 4)
+
+        def add_table(data: bytearray, table: array):
+            if sys.byteorder != "little":
+                table = array(table.typecode, table)
+                table.byteswap()
+            data += table.tobytes()
+
+        output = bytearray(BinaryAutomatonFile.HEADER.pack(BinaryAutomatonFile.MAGIC,
+                                                           BinaryAutomatonFile.FORMAT_VERSION, flags, state_count,
+                                                           len(symbols), len(edge_targets),
+                                                           len(automaton.transitions), start_state))
+        add_table(output, symbol_offsets)
+        output += b"".join(encoded_symbols)
+        pad(output)
+        add_table(output, array("i", [state.id for state in automaton.states]))
+        output += final_bitset
+        pad(output)
+        for table in (row_offsets, edge_targets, edge_symbols, edge_links):
+            add_table(output, table)
+        add_table(output, array("i", [transition.id for transition in automaton.transitions]))
+
+        # Write to a temporary file first so a crash (or an open memory map of the old file) never sees half a file
+        folder = os.path.dirname(os.path.abspath(fp))
+        fd, temp_fp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as write_file:
+                write_file.write(output)
+            match_file_mode(temp_fp, fp)
+            os.replace(temp_fp, fp)
+        except OSError:
+            if os.path.exists(temp_fp):
+                os.remove(temp_fp)
+            raise
+
+        return BinaryAutomatonFile(fp)
+
+    @staticmethod
+    def from_json(json_fp: str, fp: str) -> Self:
+        return BinaryAutomatonFile.write(fp, AutomatonFile(json_fp).to_finite_automaton())
+
+    def to_json(self, fp: str) -> AutomatonFile:
+        return self.to_finite_automaton().to_file(fp)
@@ -0,0 +1,252 @@
+# FlippyFlappingTheJ
+# ./src/utils/IO/CompiledLanguageCache.py
+
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from src.utils.Automata.AutomataLink import AutomataLink
+from src.utils.Automata.AutomataState import AutomataState
+from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+from src.utils.Language.AutomataAlphabet import AutomataAlphabet
+from src.utils.Language.AutomataChar import AutomataChar
+from src.utils.IO.FileMode import match_file_mode
+
+
+class CompiledLanguageCache:
+    """
+    Class used to persist compiled (minimised) language DFAs on disk
+    (Note: entries are content addressed by a hash of the normalised language text and the compiler version,
+    written atomically, and the least recently used entries are evicted once the cache grows past its size limit)
+
+    Entry format (little endian)
+        magic "FFTJDFA" | format version u8 | state count u32 | symbol count u32 | start index u32
+        symbols (u16 byte length + utf-8 bytes each) | final state bitset | transition table (i32 per state
+        per symbol, -1 for no transition)
+
+    ...
+
+    Attributes
+    ----------
+    folder -> str
+        the folder the cache entries are stored in
+    max_size -> int
+        the maximum total size of the cache entries in bytes
+    compiler_version -> int
+        version of the compiler the entries were produced by (part of every key)
+
+    Methods
+    -------
+    key_for(language: str) -> str
+        returns the cache key of a normalised language
+    get(language: str) -> DeterministicFiniteAutomaton | None
+        returns the cached DFA of a normalised language (None if not cached)
+    put(language: str, dfa: DeterministicFiniteAutomaton)
+        stores the DFA of a normalised language, evicting old entries if needed
+    clear()
+        removes every cache entry
+    encode_dfa(dfa: DeterministicFiniteAutomaton) -> bytes
+        encodes a DFA in the compact binary entry format
+    decode_dfa(data: bytes) -> DeterministicFiniteAutomaton
+        decodes a DFA from the compact binary entry format
+    """
+
+    MAGIC: bytes = b"FFTJDFA"
+    FORMAT_VERSION: int = 1
+    EXTENSION: str = ".fdfa"
+    HEADER = struct.Struct("<7sBIII")
+
+    def __init__(self, folder: str, compiler_version: int, max_size: int = 64 * 1024 * 1024):
+
+        self._folder = folder
+        self._compiler_version = compiler_version
+        self._max_size = max_size
+        self._total_size: int | None = None  # calculated on first write
+
+    @property
+    def folder(self) -> str:
+        return self._folder
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def compiler_version(self) -> int:
+        return self._compiler_version
+
+    def key_for(self, language: str) -> str:
+        return hashlib.sha256(f"{self._compiler_version}\0{language}".encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._folder, key + self.EXTENSION)
+
+    def get(self, language: str) -> DeterministicFiniteAutomaton | None:
+        fp = self._entry_path(self.key_for(language))
+        try:
+            with open(fp, "rb") as read_file:
+                data = read_file.read()
+            os.utime(fp)  # mark as recently used
+        except OSError:
+            return None
+        try:
+            return self.decode_dfa(data)
+        except (ValueError, struct.error, UnicodeDecodeError):
+            self._remove_entry(fp)  # corrupt entries are treated as missing
+            return None
+
+    def put(self, language: str, dfa: DeterministicFiniteAutomaton):
+        os.makedirs(self._folder, exist_ok=True)
+        data = self.encode_dfa(dfa)
+        fp = self._entry_path(self.key_for(language))
+
+        # Write to a temporary file first so a crash can never leave a half written entry behind
+        fd, temp_fp = tempfile.mkstemp(dir=self._folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as write_file:
+                write_file.write(data)
+            match_file_mode(temp_fp, fp)  # entries in a shared cache folder must stay readable by everyone using it
+            old_size = os.path.getsize(fp) if os.path.exists(fp) else 0
+            os.replace(temp_fp, fp)
+        except OSError:
+            if os.path.exists(temp_fp):
+                os.remove(temp_fp)
+            raise
+
+        if self._total_size is None:
+            self._total_size = self._calculate_total_size()
+        else:
+            self._total_size += len(data) - old_size
+        if self._total_size > self._max_size:
+            self._evict()
+
+    def clear(self):
+        for fp in self._list_entries():
+            self._remove_entry(fp)
+        self._total_size = 0
+
+    def _list_entries(self) -> list[str]:
+        if not os.path.isdir(self._folder):
+            return []
+        return [os.path.join(self._folder, file) for file in os.listdir(self._folder) if file.endswith(self.EXTENSION)]
+
+    def _calculate_total_size(self) -> int:
+        total = 0
+        for fp in self._list_entries():
+            try:
+                total += os.path.getsize(fp)
+            except OSError:
+                pass
+        return total
+
+    def _remove_entry(self, fp: str):
+        try:
+            os.remove(fp)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries: list[tuple[float, int, str]] = []
+        for fp in self._list_entries():
+            try:
+                stat = os.stat(fp)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fp))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, fp in entries:
+            if total <= self._max_size:
+                break
+            self._remove_entry(fp)
+            total -= size
+        self._total_size = total
+
+    @staticmethod
+    def encode_dfa(dfa: DeterministicFiniteAutomaton) -> bytes:
+        symbols = [symbol.char for symbol in dfa.alphabet]
+        symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        state_index = {state.id: i for i, state in enumerate(dfa.states)}
+        state_count = len(dfa.states)
+
+        final_bitset = bytearray((state_count + 7) // 8)
+        for state in dfa.states:
+            if state.is_final:
+                index = state_index[state.id]
+                final_bitset[index // 8] |= 1 << (index % 8)
+
+        table = array("i", [-1]) * (state_count * len(symbols))
+        for transition in dfa.transitions:
+            row = state_index[transition.state_from.id] * len(symbols)
+            for char in transition.link_by:
+                table[row + symbol_index[char.char]] = state_index[transition.state_to.id]
+        if sys.byteorder != "little":
+            table.byteswap()
+
+        output = bytearray(CompiledLanguageCache.HEADER.pack(CompiledLanguageCache.MAGIC,
+                                                             CompiledLanguageCache.FORMAT_VERSION, state_count,
+                                                             len(symbols), state_index[dfa.start_state]))
+        for symbol in symbols:
+            encoded = symbol.encode("utf-8")
+            output += struct.pack("<H", len(encoded)) + encoded
+        output += final_bitset
+        output += table.tobytes()
+        return bytes(output)
+
+    @staticmethod
+    def decode_dfa(data: bytes) -> DeterministicFiniteAutomaton:
+        magic, version, state_count, symbol_count, start_state = CompiledLanguageCache.HEADER.unpack_from(data, 0)
+        if magic != CompiledLanguageCache.MAGIC or version != CompiledLanguageCache.FORMAT_VERSION:
+            raise ValueError("Not a compiled language cache entry.")
+        if not 0 <= start_state < state_count:
+            raise ValueError("Compiled language cache entry has no valid start state.")
+        offset = CompiledLanguageCache.HEADER.size
+
+        alphabet = AutomataAlphabet()
+        for _ in range(symbol_count):
+            (length,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            if offset + length > len(data):
+                raise ValueError("Compiled language cache entry is truncated.")
+            alphabet.alphabet.append(AutomataChar(data[offset:offset + length].decode("utf-8")))
+            offset += length
+
+        bitset_size = (state_count + 7) // 8
+        final_bitset = data[offset:offset + bitset_size]
+        if len(final_bitset) != bitset_size:
+            raise ValueError("Compiled language cache entry is truncated.")
+        offset += bitset_size
+
+        table = array("i")
+        table.frombytes(data[offset:offset + state_count * symbol_count * table.itemsize])
+        if len(table) != state_count * symbol_count:
+            raise ValueError("Compiled language cache entry is truncated.")
+        if offset + len(table) * table.itemsize != len(data):
+            raise ValueError("Compiled language cache entry has trailing data.")
+        if sys.byteorder != "little":
+            table.byteswap()
+        if any(state_to >= state_count or state_to < -1 for state_to in table):
+            raise ValueError("Compiled language cache entry has a transition to a state that does not exist.")
+
+        states: list[AutomataState] = []
+        final_states: list[int] = []
+        for state_id in range(state_count):
+            is_final = bool(final_bitset[state_id // 8] & (1 << (state_id % 8)))
+            states.append(AutomataState(state_id, is_final, state_id == start_state))
+            if is_final:
+                final_states.append(state_id)
+
+        transitions: list[AutomataLink] = []
+        for state_id in range(state_count):
+            row = state_id * symbol_count
+            for symbol_id, symbol in enumerate(alphabet):
+                state_to = table[row + symbol_id]
+                if state_to < 0:
+                    continue
+                transitions.append(AutomataLink(len(transitions), states[state_id], states[state_to], [symbol]))
+
+        return DeterministicFiniteAutomaton(states, alphabet, transitions, start_state, final_states)
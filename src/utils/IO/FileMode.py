@@ -0,0 +1,31 @@
+# FlippyFlappingTheJ
+# ./src/utils/IO/FileMode.py
+
+import os
+import stat
+
+
+def _read_umask() -> int:
+    # os.umask can only be read by setting it, which changes it for every thread until it is restored
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once when the module is first imported (at startup, before any other thread writes files)
+_DEFAULT_FILE_MODE: int = 0o666 & ~_read_umask()
+
+
+def default_file_mode() -> int:
+    # The mode open() gives new files
+    return _DEFAULT_FILE_MODE
+
+
+def match_file_mode(temp_fp: str, fp: str):
+    # tempfile.mkstemp creates files only their owner can read, so before a temporary file replaces fp it is given
+    # fp's mode (or the mode of a new file if fp does not exist yet)
+    try:
+        mode = stat.S_IMODE(os.stat(fp).st_mode)
+    except FileNotFoundError:
+        mode = default_file_mode()
+    os.chmod(temp_fp, mode)
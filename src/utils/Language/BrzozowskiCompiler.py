@@ -0,0 +1,383 @@
+# FlippyFlappingTheJ
+# ./src/utils/Language/BrzozowskiCompiler.py
+
+from __future__ import annotations
+
+from src.utils.Automata.AutomataLink import AutomataLink
+from src.utils.Automata.AutomataState import AutomataState
+from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+from src.utils.DataStruct.Stack import Stack
+from src.utils.Language.AutomataAlphabet import AutomataAlphabet
+from src.utils.Language.AutomataChar import AutomataChar
+from src.utils.Language.LanguageParser import LanguageNode, SymbolNode, ConcatNode, UnionNode, StarNode
+
+
+class TermKind:  # Enum to make term kinds easier to manage
+    EMPTY, LAMBDA, SYMBOL, CONCAT, UNION, STAR = range(6)
+
+
+class DerivativeTerm:
+    """
+    Class used to represent a hash-consed regular expression term
+    (Note: terms should only be created through a BrzozowskiCompiler so that equal terms are the same object)
+
+    ...
+
+    Attributes
+    ----------
+    id -> int
+        unique identifier of the term within its compiler
+    kind -> int
+        the TermKind of the term
+    symbol -> str | None
+        the character matched by a SYMBOL term
+    children -> tuple[DerivativeTerm, ...]
+        sub terms of CONCAT, UNION and STAR terms
+    nullable -> bool
+        whether the term accepts the empty string
+    """
+
+    __slots__ = ("_id", "_kind", "_symbol", "_children", "_nullable")
+
+    def __init__(self, term_id: int, kind: int, symbol: str | None, children: tuple[DerivativeTerm, ...]):
+
+        self._id = term_id
+        self._kind = kind
+        self._symbol = symbol
+        self._children = children
+        self._nullable = self._calculate_nullable()
+
+    def _calculate_nullable(self) -> bool:
+        if self._kind in (TermKind.LAMBDA, TermKind.STAR):
+            return True
+        if self._kind == TermKind.CONCAT:
+            return all(child.nullable for child in self._children)
+        if self._kind == TermKind.UNION:
+            return any(child.nullable for child in self._children)
+        return False
+
+    def __str__(self) -> str:
+        if self._kind == TermKind.EMPTY:
+            return "∅"
+        if self._kind == TermKind.LAMBDA:
+            return "λ"
+        if self._kind == TermKind.SYMBOL:
+            return self._symbol
+        if self._kind == TermKind.STAR:
+            return f"({self._children[0]})*"
+        if self._kind == TermKind.CONCAT:
+            return "".join(map(str, self._children))
+        return "(" + "∨".join(map(str, self._children)) + ")"
+
+    def __hash__(self) -> int:
+        return self._id
+
+    @property
+    def id(self) -> int:
+        return self._id
+
+    @property
+    def kind(self) -> int:
+        return self._kind
+
+    @property
+    def symbol(self) -> str | None:
+        return self._symbol
+
+    @property
+    def children(self) -> tuple[DerivativeTerm, ...]:
+        return self._children
+
+    @property
+    def nullable(self) -> bool:
+        return self._nullable
+
+
+class BrzozowskiCompiler:
+    """
+    Class used to compile regular expressions directly to a DFA using Brzozowski derivatives
+
+    Terms are normalised on construction (associativity, commutativity and idempotence of union along with the
+    usual identities for ∅, λ and nested stars) and hash-consed, so each distinct term exists once and each
+    derivative is only ever computed once.
+
+    ...
+
+    Attributes
+    ----------
+    empty -> DerivativeTerm
+        the term accepting no strings
+    lambda_term -> DerivativeTerm
+        the term accepting only the empty string
+
+    Methods
+    -------
+    symbol(char: str) -> DerivativeTerm
+        returns the term matching a single character
+    concat(term1: DerivativeTerm, term2: DerivativeTerm) -> DerivativeTerm
+        returns the normalised concatenation of two terms
+    union(term1: DerivativeTerm, term2: DerivativeTerm) -> DerivativeTerm
+        returns the normalised union of two terms
+    star(term: DerivativeTerm) -> DerivativeTerm
+        returns the normalised kleene star of a term
+    term_from_ast(node: LanguageNode) -> DerivativeTerm
+        builds a term from the syntax tree of an automata language
+    derivative(term: DerivativeTerm, char: str) -> DerivativeTerm
+        returns the (memoised) derivative of a term with respect to a character
+    get_symbols(term: DerivativeTerm) -> list[str]
+        returns the characters used by a term in order of first appearance
+    lazy_automaton(term: DerivativeTerm, symbols: list[str] = None) -> LazyDerivativeAutomaton
+        returns an automaton whose states are generated on demand
+    to_deterministic(term: DerivativeTerm, symbols: list[str] = None) -> DeterministicFiniteAutomaton
+        explores every derivative of a term and returns the resulting DFA
+    """
+
+    def __init__(self):
+
+        self._terms: dict[tuple, DerivativeTerm] = {}
+        self._derivatives: dict[tuple[int, str], DerivativeTerm] = {}
+
+        self._empty = self._intern(TermKind.EMPTY, None, ())
+        self._lambda = self._intern(TermKind.LAMBDA, None, ())
+
+    @property
+    def empty(self) -> DerivativeTerm:
+        return self._empty
+
+    @property
+    def lambda_term(self) -> DerivativeTerm:
+        return self._lambda
+
+    def _intern(self, kind: int, symbol: str | None, children: tuple[DerivativeTerm, ...]) -> DerivativeTerm:
+        key = (kind, symbol, tuple(child.id for child in children))
+        term = self._terms.get(key)
+        if term is None:
+            term = DerivativeTerm(len(self._terms), kind, symbol, children)
+            self._terms[key] = term
+        return term
+
+    def symbol(self, char: str) -> DerivativeTerm:
+        if char == "λ":
+            return self._lambda
+        return self._intern(TermKind.SYMBOL, char, ())
+
+    def concat(self, term1: DerivativeTerm, term2: DerivativeTerm) -> DerivativeTerm:
+        if term1 is self._empty or term2 is self._empty:
+            return self._empty
+        if term1 is self._lambda:
+            return term2
+        if term2 is self._lambda:
+            return term1
+        if term1.kind == TermKind.CONCAT:  # keep concatenations right associative
+            head, tail = term1.children
+            return self.concat(head, self.concat(tail, term2))
+        return self._intern(TermKind.CONCAT, None, (term1, term2))
+
+    def union(self, term1: DerivativeTerm, term2: DerivativeTerm) -> DerivativeTerm:
+        members: dict[int, DerivativeTerm] = {}
+        for term in (term1, term2):
+            if term.kind == TermKind.UNION:
+                for child in term.children:
+                    members[child.id] = child
+            elif term is not self._empty:
+                members[term.id] = term
+        if not members:
+            return self._empty
+        if len(members) == 1:
+            return next(iter(members.values()))
+        children = tuple(members[term_id] for term_id in sorted(members))
+        return self._intern(TermKind.UNION, None, children)
+
+    def star(self, term: DerivativeTerm) -> DerivativeTerm:
+        if term is self._empty or term is self._lambda:
+            return self._lambda
+        if term.kind == TermKind.STAR:
+            return term
+        return self._intern(TermKind.STAR, None, (term,))
+
+    def term_from_ast(self, node: LanguageNode) -> DerivativeTerm:
+        if isinstance(node, SymbolNode):
+            return self.symbol(node.symbol)
+        if isinstance(node, ConcatNode):
+            term = self.lambda_term
+            for child in reversed(node.children):  # build right to left so concat never needs to reassociate
+                term = self.concat(self.term_from_ast(child), term)
+            return term
+        if isinstance(node, UnionNode):
+            term = self.empty
+            for child in node.children:
+                term = self.union(term, self.term_from_ast(child))
+            return term
+        if isinstance(node, StarNode):
+            return self.star(self.term_from_ast(node.child))
+        return self.lambda_term  # LambdaNode
+
+    def derivative(self, term: DerivativeTerm, char: str) -> DerivativeTerm:
+        key = (term.id, char)
+        result = self._derivatives.get(key)
+        if result is not None:
+            return result
+
+        if term.kind == TermKind.SYMBOL:
+            result = self._lambda if term.symbol == char else self._empty
+        elif term.kind == TermKind.CONCAT:
+            head, tail = term.children
+            result = self.concat(self.derivative(head, char), tail)
+            if head.nullable:
+                result = self.union(result, self.derivative(tail, char))
+        elif term.kind == TermKind.UNION:
+            result = self._empty
+            for child in term.children:
+                result = self.union(result, self.derivative(child, char))
+        elif term.kind == TermKind.STAR:
+            result = self.concat(self.derivative(term.children[0], char), term)
+        else:
+            result = self._empty
+
+        self._derivatives[key] = result
+        return result
+
+    @staticmethod
+    def get_symbols(term: DerivativeTerm) -> list[str]:
+        symbols: list[str] = []
+        seen_symbols: set[str] = set()
+        seen_terms: set[int] = set()
+        stack = Stack()
+        stack.push(term)
+        while not stack.is_empty():
+            current = stack.pop()
+            if current.id in seen_terms:
+                continue
+            seen_terms.add(current.id)
+            if current.kind == TermKind.SYMBOL and current.symbol not in seen_symbols:
+                seen_symbols.add(current.symbol)
+                symbols.append(current.symbol)
+            for child in reversed(current.children):
+                stack.push(child)
+        return symbols
+
+    def lazy_automaton(self, term: DerivativeTerm, symbols: list[str] = None) -> LazyDerivativeAutomaton:
+        return LazyDerivativeAutomaton(self, term, symbols)
+
+    def to_deterministic(self, term: DerivativeTerm, symbols: list[str] = None) -> DeterministicFiniteAutomaton:
+        automaton = self.lazy_automaton(term, symbols)
+        automaton.expand()
+        return automaton.to_deterministic()
+
+
+class LazyDerivativeAutomaton:
+    """
+    Class used to represent a DFA whose states are derivatives of a term, generated only when first reached
+    (Note: state 0 is always the start term, the dead state (∅) is never given an id)
+
+    ...
+
+    Attributes
+    ----------
+    compiler -> BrzozowskiCompiler
+        the compiler the terms belong to
+    symbols -> list[str]
+        the alphabet of the automaton
+    state_count -> int
+        the amount of states generated so far
+
+    Methods
+    -------
+    get_term(state_id: int) -> DerivativeTerm
+        returns the term represented by a generated state
+    is_final(state_id: int) -> bool
+        checks if a generated state is a final state
+    step(state_id: int, char: str) -> int | None
+        returns the state reached from a state by a character (None for the dead state)
+    run(input_string: str) -> bool
+        runs the automaton on the input string, only generating the states that are visited
+    expand() -> None
+        generates every reachable state
+    to_deterministic() -> DeterministicFiniteAutomaton
+        converts the states generated so far into a DFA
+    """
+
+    def __init__(self, compiler: BrzozowskiCompiler, term: DerivativeTerm, symbols: list[str] = None):
+
+        self._compiler = compiler
+        self._symbols = compiler.get_symbols(term) if symbols is None else symbols
+
+        self._terms: list[DerivativeTerm] = []
+        self._state_ids: dict[int, int] = {}  # term_id: state_id
+        self._transitions: list[dict[str, int | None]] = []
+
+        self._add_state(term)
+
+    @property
+    def compiler(self) -> BrzozowskiCompiler:
+        return self._compiler
+
+    @property
+    def symbols(self) -> list[str]:
+        return self._symbols
+
+    @property
+    def state_count(self) -> int:
+        return len(self._terms)
+
+    def _add_state(self, term: DerivativeTerm) -> int:
+        state_id = len(self._terms)
+        self._terms.append(term)
+        self._state_ids[term.id] = state_id
+        self._transitions.append({})
+        return state_id
+
+    def get_term(self, state_id: int) -> DerivativeTerm:
+        return self._terms[state_id]
+
+    def is_final(self, state_id: int) -> bool:
+        return self._terms[state_id].nullable
+
+    def step(self, state_id: int, char: str) -> int | None:
+        transitions = self._transitions[state_id]
+        if char in transitions:
+            return transitions[char]
+        next_term = self._compiler.derivative(self._terms[state_id], char)
+        if next_term is self._compiler.empty:
+            next_state = None
+        else:
+            next_state = self._state_ids.get(next_term.id)
+            if next_state is None:
+                next_state = self._add_state(next_term)
+        transitions[char] = next_state
+        return next_state
+
+    def run(self, input_string: str) -> bool:
+        current_state = 0
+        for char in input_string:
+            current_state = self.step(current_state, char)
+            if current_state is None:
+                return False
+        return self.is_final(current_state)
+
+    def expand(self):
+        state_id = 0
+        while state_id < len(self._terms):  # states appended while stepping are picked up by the loop
+            for char in self._symbols:
+                self.step(state_id, char)
+            state_id += 1
+
+    def to_deterministic(self) -> DeterministicFiniteAutomaton:
+        alphabet = AutomataAlphabet([AutomataChar(char) for char in self._symbols])
+        states: list[AutomataState] = []
+        final_states: list[int] = []
+        for state_id in range(len(self._terms)):
+            is_final = self.is_final(state_id)
+            states.append(AutomataState(state_id, is_final, state_id == 0))
+            if is_final:
+                final_states.append(state_id)
+
+        transitions: list[AutomataLink] = []
+        for state_id, state_transitions in enumerate(self._transitions):
+            for symbol in alphabet:
+                state_to = state_transitions.get(symbol.char)
+                if state_to is None:
+                    continue
+                transitions.append(AutomataLink(len(transitions), states[state_id], states[state_to], [symbol]))
+
+        return DeterministicFiniteAutomaton(states, alphabet, transitions, 0, final_states)
@@ -0,0 +1,79 @@
+# FlippyFlappingTheJ
+# ./src/utils/Language/LanguageCompiler.py
+
+from src.utils.Automata.DFA import DeterministicFiniteAutomaton
+from src.utils.DataStruct.LRUCache import LRUCache
+from src.utils.IO.CompiledLanguageCache import CompiledLanguageCache
+from src.utils.Language.BrzozowskiCompiler import BrzozowskiCompiler
+from src.utils.Language.LanguageParser import LanguageParser, LanguageNode
+
+
+class LanguageCompiler:
+    """
+    Class used to compile automata languages to minimised DFAs with an in process LRU cache
+    (Note: the cache is keyed by the normalised language text, so the same language written differently is
+    only compiled once, and callers are always given their own copy of the cached DFA)
+    (Note: when a disk cache is set, languages missing from memory are looked up there before being compiled)
+
+    ...
+
+    Attributes
+    ----------
+    COMPILER_VERSION -> int
+        version of the compilation pipeline (to be increased whenever its output changes)
+    CACHE_SIZE -> int
+        the amount of compiled languages kept in memory
+
+    Methods
+    -------
+    compile(language: str) -> DeterministicFiniteAutomaton
+        returns the minimised DFA of a language
+    compile_syntax_tree(syntax_tree: LanguageNode) -> DeterministicFiniteAutomaton
+        returns the minimised DFA of an already parsed language
+    clear_cache()
+        clears the in process cache
+    set_disk_cache(folder: str | None, max_size: int = 64 MiB)
+        persists compiled languages in the given folder (None disables the disk cache)
+    """
+
+    COMPILER_VERSION: int = 1
+    CACHE_SIZE: int = 256
+
+    _cache: LRUCache = LRUCache(CACHE_SIZE)
+    _disk_cache: CompiledLanguageCache | None = None
+
+    @staticmethod
+    def compile(language: str) -> DeterministicFiniteAutomaton:
+        return LanguageCompiler.compile_syntax_tree(LanguageParser.parse(language))
+
+    @staticmethod
+    def compile_syntax_tree(syntax_tree: LanguageNode) -> DeterministicFiniteAutomaton:
+        key = str(syntax_tree)
+        dfa = LanguageCompiler._cache.get(key)
+        if dfa is not None:
+            return dfa.copy()
+
+        disk_cache = LanguageCompiler._disk_cache
+        if disk_cache is not None:
+            dfa = disk_cache.get(key)
+        if dfa is None:
+            compiler = BrzozowskiCompiler()
+            dfa = compiler.to_deterministic(compiler.term_from_ast(syntax_tree)).simplify()
+            if disk_cache is not None:
+                try:
+                    disk_cache.put(key, dfa)
+                except OSError:
+                    pass  # the disk cache is only an optimisation, compiling must still succeed without it
+        LanguageCompiler._cache.put(key, dfa)
+        return dfa.copy()
+
+    @staticmethod
+    def clear_cache():
+        LanguageCompiler._cache.clear()
+
+    @staticmethod
+    def set_disk_cache(folder: str | None, max_size: int = 64 * 1024 * 1024):
+        if folder is None:
+            LanguageCompiler._disk_cache = None
+            return
+        LanguageCompiler._disk_cache = CompiledLanguageCache(folder, LanguageCompiler.COMPILER_VERSION, max_size)
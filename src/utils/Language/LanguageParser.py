@@ -0,0 +1,419 @@
+# FlippyFlappingTheJ
+# ./src/utils/Language/LanguageParser.py
+
+from __future__ import annotations
+
+import re
+
+
+class TokenType:  # Enum to make token types easier to manage
+    OPEN_GROUP, CLOSE_GROUP, LITERAL, STAR, AND, OR, END = range(7)
+
+
+class LanguageToken:
+    """
+    Class used to represent a token of an automata language
+
+    ...
+
+    Attributes
+    ----------
+    type -> int
+        the TokenType of the token
+    value -> str
+        the text of the token (the characters of the group for LITERAL tokens)
+    position -> int
+        the index of the token in the language text
+    """
+
+    __slots__ = ("_type", "_value", "_position")
+
+    def __init__(self, token_type: int, value: str, position: int):
+
+        self._type = token_type
+        self._value = value
+        self._position = position
+
+    def __str__(self) -> str:
+        return f"Token(Type: {self.type}, Value: {self.value}, Position: {self.position})"
+
+    @property
+    def type(self) -> int:
+        return self._type
+
+    @property
+    def value(self) -> str:
+        return self._value
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+
+class LanguageNode:
+    """
+    Class used as primitive type of a node in the syntax tree of an automata language
+    (Note: str() of a node gives the normalised language text, equal languages written differently share it)
+
+    ...
+
+    Methods
+    -------
+    to_postfix() -> list[str]
+        returns the postfix form of the node as a list of tokens (symbols, "λ", "∧", "∨" and "*")
+    get_symbols() -> list[str]
+        returns the symbols used by the node in order of first appearance
+    """
+
+    def __str__(self) -> str:
+        return self._group()
+
+    def _group(self) -> str:
+        return "{" + str(self) + "}"
+
+    def to_postfix(self) -> list[str]:
+        output: list[str] = []
+        self._write_postfix(output)
+        return output
+
+    def _write_postfix(self, output: list[str]): ...
+
+    def get_symbols(self) -> list[str]:
+        symbols: dict[str, None] = {}  # dicts keep insertion order
+        self._collect_symbols(symbols)
+        return list(symbols)
+
+    def _collect_symbols(self, symbols: dict[str, None]): ...
+
+
+class SymbolNode(LanguageNode):
+    """
+    Node matching a single symbol of the alphabet
+
+    ...
+
+    Attributes
+    ----------
+    symbol -> str
+        the symbol matched by the node
+    """
+
+    def __init__(self, symbol: str):
+        self._symbol = symbol
+
+    @property
+    def symbol(self) -> str:
+        return self._symbol
+
+    def _group(self) -> str:
+        return "{" + self._symbol + "}"
+
+    def _write_postfix(self, output: list[str]):
+        output.append(self._symbol)
+
+    def _collect_symbols(self, symbols: dict[str, None]):
+        symbols[self._symbol] = None
+
+
+class LambdaNode(LanguageNode):
+    """
+    Node matching only the empty string
+    """
+
+    def _group(self) -> str:
+        return "{}"
+
+    def _write_postfix(self, output: list[str]):
+        output.append("λ")
+
+    def _collect_symbols(self, symbols: dict[str, None]):
+        pass
+
+
+class ConcatNode(LanguageNode):
+    """
+    Node matching each of its children one after the other
+
+    ...
+
+    Attributes
+    ----------
+    children -> tuple[LanguageNode, ...]
+        the nodes to concatenate (nested concatenations are flattened)
+    """
+
+    def __init__(self, children: list[LanguageNode]):
+        flattened: list[LanguageNode] = []
+        for child in children:
+            if isinstance(child, ConcatNode):
+                flattened.extend(child.children)
+            else:
+                flattened.append(child)
+        self._children = tuple(flattened)
+
+    @property
+    def children(self) -> tuple[LanguageNode, ...]:
+        return self._children
+
+    def __str__(self) -> str:
+        # runs of single symbols are written as one group, e.g. {ab}∧{c}*
+        parts: list[str] = []
+        run = ""
+        for child in self._children:
+            if isinstance(child, SymbolNode):
+                run += child.symbol
+                continue
+            if run:
+                parts.append("{" + run + "}")
+                run = ""
+            parts.append(child._group())
+        if run:
+            parts.append("{" + run + "}")
+        return "∧".join(parts)
+
+    def _group(self) -> str:
+        if all(isinstance(child, SymbolNode) for child in self._children):
+            return str(self)
+        return "{" + str(self) + "}"
+
+    def _write_postfix(self, output: list[str]):
+        self._children[0]._write_postfix(output)
+        for child in self._children[1:]:
+            child._write_postfix(output)
+            output.append("∧")
+
+    def _collect_symbols(self, symbols: dict[str, None]):
+        for child in self._children:
+            child._collect_symbols(symbols)
+
+
+class UnionNode(LanguageNode):
+    """
+    Node matching any one of its children
+
+    ...
+
+    Attributes
+    ----------
+    children -> tuple[LanguageNode, ...]
+        the alternatives of the node (nested unions are flattened)
+    """
+
+    def __init__(self, children: list[LanguageNode]):
+        flattened: list[LanguageNode] = []
+        for child in children:
+            if isinstance(child, UnionNode):
+                flattened.extend(child.children)
+            else:
+                flattened.append(child)
+        self._children = tuple(flattened)
+
+    @property
+    def children(self) -> tuple[LanguageNode, ...]:
+        return self._children
+
+    def __str__(self) -> str:
+        return "∨".join(child._group() if not isinstance(child, ConcatNode) else str(child)
+                        for child in self._children)
+
+    def _write_postfix(self, output: list[str]):
+        self._children[0]._write_postfix(output)
+        for child in self._children[1:]:
+            child._write_postfix(output)
+            output.append("∨")
+
+    def _collect_symbols(self, symbols: dict[str, None]):
+        for child in self._children:
+            child._collect_symbols(symbols)
+
+
+class StarNode(LanguageNode):
+    """
+    Node matching its child repeated between 0 and inf times
+
+    ...
+
+    Attributes
+    ----------
+    child -> LanguageNode
+        the repeated node
+    """
+
+    def __init__(self, child: LanguageNode):
+        self._child = child
+
+    @property
+    def child(self) -> LanguageNode:
+        return self._child
+
+    def __str__(self) -> str:
+        return self._child._group() + "*"
+
+    def _group(self) -> str:
+        return str(self)
+
+    def _write_postfix(self, output: list[str]):
+        self._child._write_postfix(output)
+        output.append("*")
+
+    def _collect_symbols(self, symbols: dict[str, None]):
+        self._child._collect_symbols(symbols)
+
+
+class LanguageParser:
+    """
+    Class used to tokenize and parse automata languages into syntax trees in a single pass
+
+    Grammar (AND and OR may also be written as ∧ and ∨, whitespace between tokens is ignored)
+        expression := term (OR term)*
+        term       := factor (AND factor)*
+        factor     := group *...
+        group      := {characters} | {} | {expression} | {characters OR characters ...}
+    (Note: a group's characters are only split into alternatives when a whitespace separated word in it is OR or ∨,
+    otherwise all of its characters, spaces included, are concatenated)
+
+    ...
+
+    Methods
+    -------
+    tokenize(language: str) -> list[LanguageToken]
+        splits the language text into tokens
+    parse(language: str) -> LanguageNode
+        parses the language text into a syntax tree
+    normalise(language: str) -> str
+        returns the normalised text of a language
+    """
+
+    KEYWORDS: dict[str, int] = {"AND": TokenType.AND, "∧": TokenType.AND, "OR": TokenType.OR, "∨": TokenType.OR}
+
+    @staticmethod
+    def tokenize(language: str) -> list[LanguageToken]:
+        tokens: list[LanguageToken] = []
+        length = len(language)
+        i = 0
+        while i < length:
+            char = language[i]
+            if char.isspace():
+                i += 1
+                continue
+            if char == "{":
+                j = i + 1
+                while j < length and language[j].isspace():
+                    j += 1
+                if j < length and language[j] == "{":  # group containing an expression
+                    tokens.append(LanguageToken(TokenType.OPEN_GROUP, char, i))
+                    i += 1
+                    continue
+                end = language.find("}", i + 1)
+                if end == -1:
+                    raise ValueError(f"Invalid brackets! : unclosed group at position {i}")
+                literal = language[i + 1:end]
+                if "{" in literal:
+                    raise ValueError(f"Invalid brackets! : unexpected '{{' at position {i + 1 + literal.index('{')}")
+                LanguageParser._tokenize_literal(literal, i, tokens)
+                i = end + 1
+                continue
+            if char == "}":
+                tokens.append(LanguageToken(TokenType.CLOSE_GROUP, char, i))
+                i += 1
+                continue
+            if char == "*":
+                tokens.append(LanguageToken(TokenType.STAR, char, i))
+                i += 1
+                continue
+            for keyword, token_type in LanguageParser.KEYWORDS.items():
+                if language.startswith(keyword, i):
+                    tokens.append(LanguageToken(token_type, keyword, i))
+                    i += len(keyword)
+                    break
+            else:
+                raise ValueError(f"Invalid char! : {char} at position {i}")
+        tokens.append(LanguageToken(TokenType.END, "", length))
+        return tokens
+
+    @staticmethod
+    def _tokenize_literal(literal: str, position: int, tokens: list[LanguageToken]):
+        # {ab OR c} is the union of the words either side of each OR, tokenized as if written {{ab} OR {c}}
+        words = [(match.group(), match.start()) for match in re.finditer(r"\S+", literal)]
+        if not any(LanguageParser.KEYWORDS.get(word) == TokenType.OR for word, _ in words):
+            tokens.append(LanguageToken(TokenType.LITERAL, literal, position))
+            return
+        tokens.append(LanguageToken(TokenType.OPEN_GROUP, "{", position))
+        for word, offset in words:
+            token_type = LanguageParser.KEYWORDS.get(word, TokenType.LITERAL)
+            tokens.append(LanguageToken(token_type, word, position + 1 + offset))
+        tokens.append(LanguageToken(TokenType.CLOSE_GROUP, "}", position + 1 + len(literal)))
+
+    @staticmethod
+    def parse(language: str) -> LanguageNode:
+        tokens = LanguageParser.tokenize(language)
+        if tokens[0].type == TokenType.END:
+            return LambdaNode()
+        parser = _TokenStream(tokens)
+        syntax_tree = parser.parse_expression()
+        parser.expect(TokenType.END, "end of language")
+        return syntax_tree
+
+    @staticmethod
+    def normalise(language: str) -> str:
+        return str(LanguageParser.parse(language))
+
+
+class _TokenStream:  # Recursive descent over a list of tokens (see LanguageParser for the grammar)
+
+    def __init__(self, tokens: list[LanguageToken]):
+        self._tokens = tokens
+        self._index = 0
+
+    def peek(self) -> LanguageToken:
+        return self._tokens[self._index]
+
+    def next(self) -> LanguageToken:
+        token = self._tokens[self._index]
+        if token.type != TokenType.END:
+            self._index += 1
+        return token
+
+    def expect(self, token_type: int, description: str) -> LanguageToken:
+        token = self.next()
+        if token.type != token_type:
+            found = token.value if token.type != TokenType.END else "end of language"
+            raise ValueError(f"Language is not valid. : expected {description} but found '{found}' "
+                             f"at position {token.position}")
+        return token
+
+    def parse_expression(self) -> LanguageNode:
+        terms = [self.parse_term()]
+        while self.peek().type == TokenType.OR:
+            self.next()
+            terms.append(self.parse_term())
+        return terms[0] if len(terms) == 1 else UnionNode(terms)
+
+    def parse_term(self) -> LanguageNode:
+        factors = [self.parse_factor()]
+        while self.peek().type == TokenType.AND:
+            self.next()
+            factors.append(self.parse_factor())
+        return factors[0] if len(factors) == 1 else ConcatNode(factors)
+
+    def parse_factor(self) -> LanguageNode:
+        token = self.next()
+        if token.type == TokenType.LITERAL:
+            if token.value == "":
+                node = LambdaNode()
+            elif len(token.value) == 1:
+                node = SymbolNode(token.value)
+            else:
+                node = ConcatNode([SymbolNode(char) for char in token.value])
+        elif token.type == TokenType.OPEN_GROUP:
+            node = self.parse_expression()
+            self.expect(TokenType.CLOSE_GROUP, "'}'")
+        else:
+            found = token.value if token.type != TokenType.END else "end of language"
+            raise ValueError(f"Language is not valid. : expected a group but found '{found}' "
+                             f"at position {token.position}")
+        while self.peek().type == TokenType.STAR:
+            self.next()
+            if not isinstance(node, StarNode):  # {x}** is the same language as {x}*
+                node = StarNode(node)
+        return node
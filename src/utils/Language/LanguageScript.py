@@ -5,12 +5,12 @@ from __future__ import annotations
 
 import os
 import re
-import time
 
-from src.utils.AppDataConfig.Datafolder import DataFolder
 from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
 from src.utils.Language.AutomataAlphabet import AutomataAlphabet
 from src.utils.Language.AutomataLanguage import AutomataLanguage
+from src.utils.Language.LanguageParser import LanguageParser
+from src.utils.Language.LanguageScriptReader import LanguageScriptReader
 
 
 class LanguageScriptFile:
@@ -21,15 +21,19 @@ class LanguageScriptFile:
 
     Attributes
     ----------
-    path -> str
-        path to the language script file
+    path -> str | None
+        path to the language script file (None when parsed from a string)
     alphabet -> AutomataAlphabet
         alphabet of the language script file
     language -> AutomataLanguage
-        language of the language script file
+        language of the language script file (the first language when the file defines several)
+    languages -> list[tuple[str | None, AutomataLanguage]]
+        every (name, language) pair defined in the file in order (unnamed languages have the name None)
 
     Methods
     -------
+    from_string(contents: str) -> LanguageScriptFile
+        parses a language script held in memory without touching the filesystem
     load_file() -> str
         loads the contents of the file
     parse_alphabet(lines: str) -> AutomataAlphabet
@@ -37,24 +41,24 @@ class LanguageScriptFile:
     parse_language(lines: str) -> AutomataLanguage
         parses the language from the file
     parse() -> None
-        parses the alphabet and language from the file
+        parses the alphabet and languages from the file
+    get_language(name: str) -> AutomataLanguage
+        returns the language defined with the given name
     """
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str | None, contents: str | None = None):
 
         self._path = file_path
-        self._file_contents = self.load_file()
+        self._file_contents = self.load_file() if contents is None else contents
 
         self._alphabet: AutomataAlphabet = AutomataAlphabet()
         self._language: AutomataLanguage = AutomataLanguage(self.alphabet)
+        self._languages: list[tuple[str | None, AutomataLanguage]] = []
         self.parse()
 
     @staticmethod
-    def load_by_string(contents: str, datafolder: DataFolder) -> LanguageScriptFile:
-        fp = os.path.join(datafolder.temp_folder, f"temp_lsf_{time.time()}.lsf")
-        with open(fp, "w") as w_file:
-            w_file.write(contents)
-        return LanguageScriptFile(fp)
+    def from_string(contents: str) -> LanguageScriptFile:
+        return LanguageScriptFile(None, contents)
 
     def load_file(self) -> str:
         if not os.path.exists(self.path):
@@ -93,69 +97,33 @@ class LanguageScriptFile:
 
     @staticmethod
     def parse_language(alphabet, lines: str) -> AutomataLanguage:
-        language_chars = re.search(r"(language:=)|(language := ){((.|\n)*)}", lines)
-        if language_chars is None:
-            raise ValueError("No language found but invalid.")
-        raw_language = language_chars.group(3)
-        language_lines = raw_language.split("\n")
-        language_lines = map(str.strip, language_lines)  # Remove leading/trailing whitespace
-        language_lines = filter(None, language_lines)  # Remove empty lines
-        return AutomataLanguage(alphabet, list(language_lines))
-
-    def _check_for_invalid_characters(self, string: str) -> bool:
-        # example string: "{{a} OR {b} OR {c}}*" "valid characters: {a, b, c}"
-        match = re.match(r"{(.*)}", string).group(1)
-        values = match.split(" OR ")
-
-        for charset in values:
-            if "{" in charset:
-                charset = re.match(r"{(.*)}", charset).group(1)
-            set_of_chars = set(list(charset))
-            if not set_of_chars.intersection(self.alphabet) == set_of_chars:
-                return True
-        return False
+        for _, language in LanguageScriptReader(lines.splitlines(), alphabet=alphabet):
+            return language
+        raise ValueError("No language found but invalid.")
 
     def _check_language_validity(self):
-        for lang in self._language:
-            if lang == "AND":
-                continue
-            if lang == "OR":
-                continue
-            matches = re.search(r"{(.*?)}(.*)", lang)
-            if matches is None:
-                raise ValueError("Language is not valid.")
-            # Ensure no illegal characters are present with alphabet
-            if self._check_for_invalid_characters(lang):
-                raise ValueError("Language contains characters not in alphabet.")
-            # set_of_chars = set(list(str(matches.group(1))))
-            # if not set_of_chars.intersection(self._alphabet) == set_of_chars:
-            #     raise ValueError("Language contains characters not in alphabet.")
+        syntax_tree = LanguageParser.parse(str(self._language))  # raises ValueError on invalid syntax
+        # Ensure no illegal characters are present with alphabet
+        if not set(syntax_tree.get_symbols()).issubset(set(self._alphabet)):
+            raise ValueError("Language contains characters not in alphabet.")
 
     def parse(self):
-        self._language = None
-        self._alphabet = None
-
-        lines = self._file_contents.split('\n')
-
-        for line in lines:
-            if line.startswith("//") or line == "":
-                continue
-
-            if self._language is not None and self._alphabet is not None:
-                break
-
-            if line.startswith("alphabet := ") or line.startswith("alphabet:="):
-                self._alphabet = self.parse_alphabet(self._file_contents)
+        reader = LanguageScriptReader(self._file_contents.splitlines(), self.path or "<string>")
+        self._languages = list(reader)  # the reader checks the validity of each language as it is read
 
-            if line.startswith("language := ") or line.startswith("language:="):
-                self._language = self.parse_language(self._alphabet, self._file_contents)
-
-        if self._alphabet is None:
+        if reader.alphabet is None:
             raise ValueError("No alphabet found in file.")
-        if self._language is None:
+        if not self._languages:
             raise ValueError("No language found in file.")
 
-        self._check_language_validity()
+        self._language = self._languages[0][1]
+        self._alphabet = self._language.alphabet
+
+    def get_language(self, name: str) -> AutomataLanguage:
+        for language_name, language in self._languages:
+            if language_name == name:
+                return language
+        raise KeyError(f"No language named '{name}' in file.")
 
     @property
     def alphabet(self) -> AutomataAlphabet:
@@ -170,3 +138,7 @@ class LanguageScriptFile:
     @property
     def language(self) -> AutomataLanguage:
         return self._language
+
+    @property
+    def languages(self) -> list[tuple[str | None, AutomataLanguage]]:
+        return self._languages
@@ -0,0 +1,135 @@
+# FlippyFlappingTheJ
+# ./src/utils/Language/LanguageScriptReader.py
+
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Iterable, Iterator
+
+from src.utils.Language.AutomataAlphabet import AutomataAlphabet
+from src.utils.Language.AutomataLanguage import AutomataLanguage
+from src.utils.Language.LanguageParser import LanguageParser
+
+
+class LanguageScriptReader:
+    """
+    Class used to read language script files in a single streaming pass
+    (Note: each language is yielded as soon as its block closes, so files holding thousands of languages never
+    need to be held in memory at once)
+
+    A script may define any number of languages, each optionally named, e.g.
+        alphabet := "ab"
+        language := {...}
+        language evens := {...}
+    and an alphabet applies to every language after it until the next alphabet definition.
+
+    ...
+
+    Attributes
+    ----------
+    source -> str
+        the name of the script used in error messages
+    alphabet -> AutomataAlphabet | None
+        the alphabet currently in effect (the last one read)
+
+    Methods
+    -------
+    read_file(file_path: str) -> Iterator[tuple[str | None, AutomataLanguage]]
+        streams the (name, language) pairs of a language script file line by line
+    """
+
+    ALPHABET_PATTERN = re.compile(r'alphabet\s*:=\s*"(.*?)"\s*$')
+    LANGUAGE_PATTERN = re.compile(r'language(?:\s+([A-Za-z_]\w*))?\s*:=\s*')
+
+    def __init__(self, lines: Iterable[str], source: str = "<string>", alphabet: AutomataAlphabet | None = None):
+
+        self._lines = lines
+        self._source = source
+        self._alphabet = alphabet
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    @property
+    def alphabet(self) -> AutomataAlphabet | None:
+        return self._alphabet
+
+    @staticmethod
+    def read_file(file_path: str) -> Iterator[tuple[str | None, AutomataLanguage]]:
+        if not os.path.basename(file_path).endswith('.lsf'):
+            raise ValueError(f"File '{file_path}' is not a Language Script File.")
+        with open(file_path, 'r') as rfile:
+            yield from LanguageScriptReader(rfile, file_path)
+
+    def _error(self, line_number: int, message: str) -> ValueError:
+        return ValueError(f"{self._source}:{line_number}: {message}")
+
+    def __iter__(self) -> Iterator[tuple[str | None, AutomataLanguage]]:
+        depth = 0  # brace depth of the language block being read (0 when outside a block)
+        name: str | None = None
+        start_line = 0
+        language_lines: list[str] = []
+
+        for line_number, line in enumerate(self._lines, 1):
+            line = line.rstrip("\r\n")
+            stripped = line.strip()
+
+            if not stripped or stripped.startswith("//"):
+                continue
+
+            if depth == 0:
+                alphabet_match = self.ALPHABET_PATTERN.match(stripped)
+                if alphabet_match is not None:
+                    self._alphabet = AutomataAlphabet(list(alphabet_match.group(1)))
+                    continue
+                language_match = self.LANGUAGE_PATTERN.match(stripped)
+                if language_match is None:
+                    raise self._error(line_number, f"Unexpected line '{stripped}'.")
+                if self._alphabet is None:
+                    raise self._error(line_number, "Language defined before an alphabet.")
+                line = stripped[language_match.end():]
+                if not line.startswith("{"):
+                    raise self._error(line_number, "Expected '{' to open the language.")
+                name = language_match.group(1)
+                start_line = line_number
+                language_lines = []
+                depth = 1
+                line = line[1:]
+
+            block_end = -1
+            for i, char in enumerate(line):
+                if char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                    if depth == 0:
+                        block_end = i
+                        break
+
+            if block_end == -1:
+                language_lines.append(line)
+                continue
+
+            language_lines.append(line[:block_end])
+            trailing = line[block_end + 1:].strip()
+            if trailing and not trailing.startswith("//"):
+                raise self._error(line_number, f"Unexpected '{trailing}' after the language.")
+            yield name, self._build_language(language_lines, start_line)
+
+        if depth > 0:
+            raise self._error(start_line, "Language is never closed.")
+
+    def _build_language(self, language_lines: list[str], start_line: int) -> AutomataLanguage:
+        language_lines = map(str.strip, language_lines)  # Remove leading/trailing whitespace
+        language_lines = filter(None, language_lines)  # Remove empty lines
+        language = AutomataLanguage(self._alphabet, list(language_lines))
+        try:
+            syntax_tree = LanguageParser.parse(str(language))
+        except ValueError as e:
+            raise self._error(start_line, str(e)) from e
+        # Ensure no illegal characters are present with alphabet
+        if not set(syntax_tree.get_symbols()).issubset(set(self._alphabet)):
+            raise self._error(start_line, "Language contains characters not in alphabet.")
+        return language
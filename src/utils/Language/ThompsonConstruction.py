@@ -0,0 +1,223 @@
+# FlippyFlappingTheJ
+# ./src/utils/Language/ThompsonConstruction.py
+
+from __future__ import annotations
+
+from collections import deque
+
+from src.utils.Automata.AutomataLink import AutomataLink
+from src.utils.Automata.AutomataState import AutomataState
+from src.utils.Automata.NDFA import NonDeterministicFiniteAutomaton
+from src.utils.DataStruct.Stack import Stack
+from src.utils.Language.AutomataAlphabet import AutomataAlphabet
+from src.utils.Language.AutomataChar import AutomataChar
+from src.utils.Language.LanguageParser import LanguageNode, SymbolNode, ConcatNode, UnionNode, StarNode
+
+
+class NFAFragment:
+    """
+    Class used to represent a partially built automaton inside a ThompsonArena
+
+    ...
+
+    Attributes
+    ----------
+    start -> int
+        index of the fragment's start state in the arena (never has incoming links)
+    accept -> int
+        index of the fragment's accept state in the arena (never has outgoing links)
+    """
+
+    __slots__ = ("_start", "_accept")
+
+    def __init__(self, start: int, accept: int):
+
+        self._start = start
+        self._accept = accept
+
+    def __str__(self) -> str:
+        return f"NFAFragment(Start: {self.start}, Accept: {self.accept})"
+
+    @property
+    def start(self) -> int:
+        return self._start
+
+    @property
+    def accept(self) -> int:
+        return self._accept
+
+
+class ThompsonArena:
+    """
+    Class used to perform thompson's construction in linear time
+    (Note: every fragment shares the arena's state and link storage, so combining fragments only ever adds a
+    constant amount of states and links and never copies or mutates existing automata)
+
+    ...
+
+    Attributes
+    ----------
+    state_count -> int
+        the amount of states allocated in the arena
+
+    Methods
+    -------
+    new_state() -> int
+        allocates a new state and returns its index
+    add_link(state_from: int, state_to: int, char: str | None)
+        adds a link between two states of the arena (lambda links are represented by None)
+    symbol(char: str | None) -> NFAFragment
+        returns a fragment accepting a single character (or the empty string for None and "λ")
+    concat(fragment1: NFAFragment, fragment2: NFAFragment) -> NFAFragment
+        returns the concatenation of two fragments
+    union(fragment1: NFAFragment, fragment2: NFAFragment) -> NFAFragment
+        returns the union of two fragments
+    star(fragment: NFAFragment) -> NFAFragment
+        returns the kleene star of a fragment
+    add_automaton(automaton: NonDeterministicFiniteAutomaton) -> NFAFragment
+        copies an existing automaton into the arena with its ids offset and returns it as a fragment
+    from_postfix(postfix: str | list[str]) -> NFAFragment
+        builds the fragment for the postfix form of an automata language
+    from_ast(node: LanguageNode) -> NFAFragment
+        builds the fragment for the syntax tree of an automata language
+    to_non_deterministic(fragment: NFAFragment) -> NonDeterministicFiniteAutomaton
+        converts a fragment into a finite automaton containing only the states reachable from its start
+    """
+
+    def __init__(self):
+
+        self._links: list[list[tuple[int, str | None]]] = []  # state index: [(state_to, char)...]
+
+    @property
+    def state_count(self) -> int:
+        return len(self._links)
+
+    def new_state(self) -> int:
+        self._links.append([])
+        return len(self._links) - 1
+
+    def add_link(self, state_from: int, state_to: int, char: str | None):
+        self._links[state_from].append((state_to, char))
+
+    def symbol(self, char: str | None) -> NFAFragment:
+        start = self.new_state()
+        accept = self.new_state()
+        self.add_link(start, accept, None if char == "λ" else char)
+        return NFAFragment(start, accept)
+
+    def concat(self, fragment1: NFAFragment, fragment2: NFAFragment) -> NFAFragment:
+        # The accept state of fragment1 has no outgoing links and the start state of fragment2 has no incoming
+        # links, so the two can be merged by handing over fragment2's start links (fragment2's start is orphaned)
+        self._links[fragment1.accept] = self._links[fragment2.start]
+        self._links[fragment2.start] = []
+        return NFAFragment(fragment1.start, fragment2.accept)
+
+    def union(self, fragment1: NFAFragment, fragment2: NFAFragment) -> NFAFragment:
+        start = self.new_state()
+        accept = self.new_state()
+        self.add_link(start, fragment1.start, None)
+        self.add_link(start, fragment2.start, None)
+        self.add_link(fragment1.accept, accept, None)
+        self.add_link(fragment2.accept, accept, None)
+        return NFAFragment(start, accept)
+
+    def star(self, fragment: NFAFragment) -> NFAFragment:
+        start = self.new_state()
+        accept = self.new_state()
+        self.add_link(start, fragment.start, None)
+        self.add_link(fragment.accept, accept, None)
+        self.add_link(start, accept, None)
+        self.add_link(fragment.accept, fragment.start, None)
+        return NFAFragment(start, accept)
+
+    def add_automaton(self, automaton: NonDeterministicFiniteAutomaton) -> NFAFragment:
+        state_index: dict[int, int] = {}
+        for state in automaton.states:
+            state_index[state.id] = self.new_state()
+
+        for transition in automaton.transitions:
+            state_from = state_index[transition.state_from.id]
+            state_to = state_index[transition.state_to.id]
+            if transition.link_by is None:
+                self.add_link(state_from, state_to, None)
+                continue
+            for char in transition.link_by:
+                self.add_link(state_from, state_to, char.char)
+
+        # Wrap the copy with a fresh start and accept state so the fragment invariants hold for any automaton
+        start = self.new_state()
+        accept = self.new_state()
+        self.add_link(start, state_index[automaton.start_state], None)
+        for final_state in automaton.final_states:
+            self.add_link(state_index[final_state], accept, None)
+        return NFAFragment(start, accept)
+
+    def from_postfix(self, postfix: str | list[str]) -> NFAFragment:
+        if postfix == "":
+            return self.symbol(None)
+
+        stack = Stack()
+        for char in postfix:
+            if char == "∧":
+                fragment2 = stack.pop()
+                fragment1 = stack.pop()
+                stack.push(self.concat(fragment1, fragment2))
+            elif char == "∨":
+                fragment2 = stack.pop()
+                fragment1 = stack.pop()
+                stack.push(self.union(fragment1, fragment2))
+            elif char == "*":
+                stack.push(self.star(stack.pop()))
+            else:
+                stack.push(self.symbol(char))
+        return stack.pop()
+
+    def from_ast(self, node: LanguageNode) -> NFAFragment:
+        if isinstance(node, SymbolNode):
+            return self.symbol(node.symbol)
+        if isinstance(node, ConcatNode):
+            fragment = self.from_ast(node.children[0])
+            for child in node.children[1:]:
+                fragment = self.concat(fragment, self.from_ast(child))
+            return fragment
+        if isinstance(node, UnionNode):
+            fragment = self.from_ast(node.children[0])
+            for child in node.children[1:]:
+                fragment = self.union(fragment, self.from_ast(child))
+            return fragment
+        if isinstance(node, StarNode):
+            return self.star(self.from_ast(node.child))
+        return self.symbol(None)  # LambdaNode
+
+    def to_non_deterministic(self, fragment: NFAFragment) -> NonDeterministicFiniteAutomaton:
+        # Renumber the reachable states breadth first so the start state is always 0
+        state_ids: dict[int, int] = {fragment.start: 0}
+        order: list[int] = [fragment.start]
+        queue = deque([fragment.start])
+        while queue:
+            state = queue.popleft()
+            for state_to, _ in self._links[state]:
+                if state_to not in state_ids:
+                    state_ids[state_to] = len(order)
+                    order.append(state_to)
+                    queue.append(state_to)
+
+        states = [AutomataState(state_ids[state], state == fragment.accept, state == fragment.start)
+                  for state in order]
+        final_states = [state_ids[fragment.accept]] if fragment.accept in state_ids else []
+
+        chars: dict[str, AutomataChar] = {}  # intern one AutomataChar per symbol
+        transitions: list[AutomataLink] = []
+        for state in order:
+            state_from = states[state_ids[state]]
+            for state_to, char in self._links[state]:
+                if char is None:
+                    link_by = None
+                else:
+                    if char not in chars:
+                        chars[char] = AutomataChar(char)
+                    link_by = [chars[char]]
+                transitions.append(AutomataLink(len(transitions), state_from, states[state_ids[state_to]], link_by))
+
+        alphabet = AutomataAlphabet(list(chars.values()))
+        return NonDeterministicFiniteAutomaton(states, alphabet, transitions, 0, final_states)
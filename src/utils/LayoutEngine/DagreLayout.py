@@ -1,58 +1,456 @@
-import networkx as nx
+# FlippyFlappingTheJ
+# ./src/utils/LayoutEngine/DagreLayout.py
+
+import heapq
+from collections import deque
+from collections.abc import Hashable, Mapping, Sequence
+
+from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
 
 
 class DagreLayout:
-    def __init__(self, automaton_builder, node_spacing=50, rank_spacing=100):
+    """
+    Class used to lay out an automaton in layers with as many transitions as possible pointing down, as done by dagre
+    (Note: this is a Sugiyama layout in four steps. Cycles are broken by reversing the transitions against an order
+    found with Eades, Lin and Smyth's greedy heuristic, with the initial state first. States are put in layers by
+    longest path and transitions spanning several layers are split into a chain of dummy nodes. Crossings are
+    reduced by barycentric sweeps and each node is given an x coordinate with Brandes and Koepf's method, which keeps
+    long transitions straight.)
+    (Note: every step is O((S + T) log(S + T)), apart from crossing reduction which is that for each of up to
+    max_sweeps sweeps, where T counts the dummy nodes too)
+    (Note: crossing reduction is limited to SWEEP_NODE_BUDGET nodes reordered in total, so the more nodes there are
+    the fewer sweeps are made (at least one) and, once that is fewer than max_sweeps, it stops at the first sweep
+    that does not reduce the crossings. Long transitions in large automata add many dummy nodes, a random DFA of
+    10000 states has around 650000 nodes and gets 3 sweeps.)
+
+    ...
+
+    Attributes
+    ----------
+    SWEEP_NODE_BUDGET -> int
+        the most nodes reordered in total by the sweeps reducing crossings
+    automaton_builder -> AutomatonBuilder
+        the automaton being laid out
+    node_spacing -> float
+        the least horizontal distance between two states, or the transitions passing between layers
+    rank_spacing -> float
+        the distance between layers
+    max_sweeps -> int
+        the most barycentric sweeps made to reduce crossings (fewer are made for large automata)
+    seed -> int | None
+        accepted so every layout engine can be made the same way, the layout has no randomness so it is unused
+    layers -> list[list[int]]
+        the state ids in each layer from left to right
+    reversed_transitions -> int
+        the number of transitions (ignoring loops and duplicates) drawn pointing up to break cycles
+    crossings -> int
+        the number of crossings between transitions (split at dummy nodes) left after reducing them
+    positions -> dict[int, tuple[float, float]]
+        the position of each state id
+
+    Methods
+    -------
+    get_positions() -> dict[int, tuple[float, float]]
+        returns the position of each state id
+    """
+
+    SWEEP_NODE_BUDGET: int = 2_000_000
+
+    def __init__(self, automaton_builder: AutomatonBuilder, node_spacing: float = 50, rank_spacing: float = 100,
+                 max_sweeps: int = 24, seed: int | None = None):
         self._automaton_builder = automaton_builder
         self._node_spacing = node_spacing
         self._rank_spacing = rank_spacing
+        self._max_sweeps = max_sweeps
+        self._seed = seed
+        self._layers: list[list[int]] = []
+        self._reversed_transitions = 0
+        self._crossings = 0
         self._positions = self._calculate_positions()
 
-    def _calculate_positions(self):
-        graph = self._build_graph()
-        ranks = self._assign_ranks(graph)
-        ordered_ranks = self._order_nodes(graph, ranks)
-        positions = self._position_nodes(ordered_ranks)
-        return positions
-
-    def _build_graph(self):
-        graph = nx.DiGraph()
-        for state in self._automaton_builder.states:
-            graph.add_node(state.id)
-        for state in self._automaton_builder.states:
-            for transition in self._automaton_builder.get_transitions_from_state(state.id):
-                graph.add_edge(state.id, transition.state_to.id)
-        return graph
-
-    def _assign_ranks(self, graph):
-        ranks = {}
-        for node in nx.topological_sort(graph):
-            if graph.in_degree(node) == 0:
-                ranks[node] = 0
+    @property
+    def automaton_builder(self) -> AutomatonBuilder:
+        return self._automaton_builder
+
+    @property
+    def node_spacing(self) -> float:
+        return self._node_spacing
+
+    @property
+    def rank_spacing(self) -> float:
+        return self._rank_spacing
+
+    @property
+    def max_sweeps(self) -> int:
+        return self._max_sweeps
+
+    @property
+    def seed(self) -> int | None:
+        return self._seed
+
+    @property
+    def layers(self) -> list[list[int]]:
+        return self._layers
+
+    @property
+    def reversed_transitions(self) -> int:
+        return self._reversed_transitions
+
+    @property
+    def crossings(self) -> int:
+        return self._crossings
+
+    @property
+    def positions(self) -> dict[int, tuple[float, float]]:
+        return self._positions
+
+    def get_positions(self) -> dict[int, tuple[float, float]]:
+        return self._positions
+
+    def _calculate_positions(self) -> dict[int, tuple[float, float]]:
+        # Nodes are numbered 0..n-1 for the states (in builder order) and from n for the dummy nodes
+        state_ids = [state.id for state in self._automaton_builder.states]
+        state_count = len(state_ids)
+        if state_count == 0:
+            return {}
+        index = {state_id: i for i, state_id in enumerate(state_ids)}
+        edges = {(index[transition.state_from.id], index[transition.state_to.id])
+                 for transition in self._automaton_builder.transitions}
+        edges = sorted((node_from, node_to) for node_from, node_to in edges if node_from != node_to)
+        initial_state = self._automaton_builder.initial_state
+        first = index.get(initial_state) if initial_state is not None else None
+
+        order = self._greedy_order(state_count, edges, first)
+        edges, self._reversed_transitions = self._make_acyclic(edges, order)
+        ranks = self._longest_path_ranks(state_count, edges, order, first)
+        up, down, ranks = self._split_long_edges(edges, ranks)
+        is_dummy = [node >= state_count for node in range(len(ranks))]
+
+        layers = self._initial_layers(order, down, ranks)
+        sweeps = min(self._max_sweeps, max(1, self.SWEEP_NODE_BUDGET // len(ranks)))
+        patience = 4 if sweeps == self._max_sweeps else 1  # a cut down budget is better spent on sweeps that help
+        layers, self._crossings = order_layers(layers, up, down, sweeps, patience)
+        xs = self._brandes_kopf(layers, up, down, is_dummy)
+
+        self._layers = [[state_ids[node] for node in layer if not is_dummy[node]] for layer in layers]
+        return {state_ids[node]: (xs[node], ranks[node] * self._rank_spacing) for node in range(state_count)}
+
+    @staticmethod
+    def _greedy_order(node_count: int, edges: list[tuple[int, int]], first: int | None) -> list[int]:
+        # Eades, Lin and Smyth: sinks go to the end, sources to the start and otherwise the node with the most
+        # outgoing less incoming transitions goes to the start, so few transitions point backwards in the order
+        successors: list[list[int]] = [[] for _ in range(node_count)]
+        predecessors: list[list[int]] = [[] for _ in range(node_count)]
+        for node_from, node_to in edges:
+            successors[node_from].append(node_to)
+            predecessors[node_to].append(node_from)
+        out_degree = [len(nodes) for nodes in successors]
+        in_degree = [len(nodes) for nodes in predecessors]
+        removed = [False] * node_count
+        sinks: deque[int] = deque()
+        sources: deque[int] = deque()
+        by_delta: list[tuple[int, int]] = []  # (-delta, node), entries whose degrees have since changed are skipped
+
+        def classify(node: int):
+            if out_degree[node] == 0:
+                sinks.append(node)
+            elif in_degree[node] == 0:
+                sources.append(node)
+            else:
+                heapq.heappush(by_delta, (in_degree[node] - out_degree[node], node))
+
+        def remove(node: int):
+            removed[node] = True
+            for successor in successors[node]:
+                if not removed[successor]:
+                    in_degree[successor] -= 1
+                    classify(successor)
+            for predecessor in predecessors[node]:
+                if not removed[predecessor]:
+                    out_degree[predecessor] -= 1
+                    classify(predecessor)
+
+        start: list[int] = []
+        end: list[int] = []
+        if first is not None:
+            start.append(first)  # the initial state is drawn at the top, whatever points back to it
+            remove(first)
+        for node in range(node_count):
+            if not removed[node]:
+                classify(node)
+
+        while len(start) + len(end) < node_count:
+            if sinks:
+                node = sinks.popleft()
+                if removed[node] or out_degree[node] != 0:
+                    continue
+                end.append(node)
+            elif sources:
+                node = sources.popleft()
+                if removed[node] or in_degree[node] != 0:
+                    continue
+                start.append(node)
             else:
-                ranks[node] = max(ranks[pred] + 1 for pred in graph.predecessors(node))
+                negative_delta, node = heapq.heappop(by_delta)
+                if removed[node] or negative_delta != in_degree[node] - out_degree[node]:
+                    continue
+                start.append(node)
+            remove(node)
+        return start + end[::-1]
+
+    @staticmethod
+    def _make_acyclic(edges: list[tuple[int, int]], order: list[int]) -> tuple[list[tuple[int, int]], int]:
+        # Reverses every edge pointing backwards in order, returning the edges (without duplicates) and how many
+        # were reversed
+        position = {node: i for i, node in enumerate(order)}
+        acyclic = set()
+        reversed_count = 0
+        for node_from, node_to in edges:
+            if position[node_from] > position[node_to]:
+                node_from, node_to = node_to, node_from
+                reversed_count += 1
+            acyclic.add((node_from, node_to))
+        return sorted(acyclic), reversed_count
+
+    @staticmethod
+    def _longest_path_ranks(node_count: int, edges: list[tuple[int, int]], order: list[int],
+                            first: int | None) -> list[int]:
+        # order is a topological order of the acyclic edges, so every node's predecessors are ranked before it
+        predecessors: list[list[int]] = [[] for _ in range(node_count)]
+        successors: list[list[int]] = [[] for _ in range(node_count)]
+        for node_from, node_to in edges:
+            predecessors[node_to].append(node_from)
+            successors[node_from].append(node_to)
+        ranks = [0] * node_count
+        for node in order:
+            if predecessors[node]:
+                ranks[node] = max(ranks[predecessor] for predecessor in predecessors[node]) + 1
+
+        # Longest path puts every source in the top layer, move them down to just above their first successor
+        for node in order:
+            if not predecessors[node] and successors[node] and node != first:
+                ranks[node] = min(ranks[successor] for successor in successors[node]) - 1
         return ranks
 
-    def _order_nodes(self, graph, ranks):
-        ordered_ranks = {}
-        for node, rank in ranks.items():
-            if rank not in ordered_ranks:
-                ordered_ranks[rank] = []
-            ordered_ranks[rank].append(node)
-        for rank in ordered_ranks:
-            ordered_ranks[rank].sort(key=lambda node: graph.out_degree(node), reverse=True)
-        return ordered_ranks
-
-    def _position_nodes(self, ordered_ranks):
-        positions = {}
-        for rank, nodes in ordered_ranks.items():
-            y = rank * self._rank_spacing
-            x_start = (len(nodes) - 1) * self._node_spacing / -2
-            for i, node in enumerate(nodes):
-                x = x_start + i * self._node_spacing
-                positions[node] = (x, y)
-        return positions
-
-    @property
-    def positions(self):
-        return self._positions
+    @staticmethod
+    def _split_long_edges(edges: list[tuple[int, int]], ranks: list[int]) \
+            -> tuple[list[list[int]], list[list[int]], list[int]]:
+        # Replaces every edge spanning more than one layer with a chain of dummy nodes, one per layer it passes
+        ranks = list(ranks)
+        up: list[list[int]] = [[] for _ in ranks]
+        down: list[list[int]] = [[] for _ in ranks]
+        for node_from, node_to in edges:
+            previous = node_from
+            for rank in range(ranks[node_from] + 1, ranks[node_to]):
+                dummy = len(ranks)
+                ranks.append(rank)
+                up.append([previous])
+                down.append([])
+                down[previous].append(dummy)
+                previous = dummy
+            down[previous].append(node_to)
+            up[node_to].append(previous)
+        return up, down, ranks
+
+    @staticmethod
+    def _initial_layers(order: list[int], down: list[list[int]], ranks: list[int]) -> list[list[int]]:
+        # Depth first from each state in order, so nodes reached from each other start out next to each other
+        layers: list[list[int]] = [[] for _ in range(max(ranks) + 1)]
+        visited = [False] * len(ranks)
+        for start in order:
+            if visited[start]:
+                continue
+            visited[start] = True
+            stack = [start]
+            while stack:
+                node = stack.pop()
+                layers[ranks[node]].append(node)
+                for child in reversed(down[node]):
+                    if not visited[child]:
+                        visited[child] = True
+                        stack.append(child)
+        return layers
+
+    def _brandes_kopf(self, layers: list[list[int]], up: list[list[int]], down: list[list[int]],
+                      is_dummy: list[bool]) -> list[float]:
+        # Four alignments (up or down, left or right) are compacted and combined by taking the average of the
+        # middle two x coordinates of each node
+        conflicts = self._type_one_conflicts(layers, up, is_dummy)
+        candidates: list[list[float]] = []
+        for downwards in (True, False):
+            for leftwards in (True, False):
+                oriented = layers if downwards else layers[::-1]
+                if not leftwards:
+                    oriented = [layer[::-1] for layer in oriented]
+                neighbours = up if downwards else down  # the neighbours in the layer aligned to
+                root = self._vertical_alignment(oriented, neighbours, conflicts)
+                xs = self._horizontal_compaction(oriented, root, len(is_dummy))
+                candidates.append(xs if leftwards else [-x for x in xs])
+
+        widths = [max(xs) - min(xs) for xs in candidates]
+        narrowest = candidates[widths.index(min(widths))]
+        for i, xs in enumerate(candidates):
+            # left aligned layouts line up on their left edge, right aligned ones on their right edge
+            shift = min(narrowest) - min(xs) if i % 2 == 0 else max(narrowest) - max(xs)
+            candidates[i] = [x + shift for x in xs]
+        combined = []
+        for node_xs in zip(*candidates):
+            node_xs = sorted(node_xs)
+            combined.append((node_xs[1] + node_xs[2]) / 2)
+        return combined
+
+    @staticmethod
+    def _type_one_conflicts(layers: list[list[int]], up: list[list[int]], is_dummy: list[bool]) \
+            -> set[tuple[int, int]]:
+        # The segments between a state and another layer that cross a segment between two dummy nodes, so long
+        # transitions are kept straight rather than the states next to them
+        position = {node: i for layer in layers for i, node in enumerate(layer)}
+        conflicts: set[tuple[int, int]] = set()
+        for upper, lower in zip(layers, layers[1:]):
+            k0 = 0
+            scanned = 0
+            for i, node in enumerate(lower):
+                inner = next((neighbour for neighbour in up[node] if is_dummy[neighbour]), None) \
+                    if is_dummy[node] else None
+                if i != len(lower) - 1 and inner is None:
+                    continue
+                k1 = position[inner] if inner is not None else len(upper) - 1
+                while scanned <= i:
+                    lower_node = lower[scanned]
+                    for upper_node in up[lower_node]:
+                        if is_dummy[upper_node] and is_dummy[lower_node]:
+                            continue
+                        if position[upper_node] < k0 or position[upper_node] > k1:
+                            conflicts.add((upper_node, lower_node))
+                            conflicts.add((lower_node, upper_node))
+                    scanned += 1
+                k0 = k1
+        return conflicts
+
+    @staticmethod
+    def _vertical_alignment(layers: list[list[int]], neighbours: list[list[int]],
+                            conflicts: set[tuple[int, int]]) -> dict[int, int]:
+        # Joins each node to a median neighbour in the layer before when that does not cross an earlier join,
+        # returning the first node (root) of the block each node is in
+        position = {node: i for layer in layers for i, node in enumerate(layer)}
+        root = {node: node for node in position}
+        align = dict(root)
+        for layer in layers[1:]:
+            last = -1
+            for node in layer:
+                ordered = sorted(neighbours[node], key=position.__getitem__)
+                count = len(ordered)
+                if count == 0:
+                    continue
+                for median in sorted({(count - 1) // 2, count // 2}):
+                    if align[node] != node:
+                        break
+                    neighbour = ordered[median]
+                    if (neighbour, node) not in conflicts and last < position[neighbour]:
+                        align[neighbour] = node
+                        root[node] = root[neighbour]
+                        align[node] = root[node]
+                        last = position[neighbour]
+        return root
+
+    def _horizontal_compaction(self, layers: list[list[int]], root: dict[int, int], node_count: int) -> list[float]:
+        # Places each block as far left as the blocks to its left allow, then moves blocks with a block to their
+        # right across towards it to close the gaps left behind
+        successors: dict[int, set[int]] = {block: set() for block in set(root.values())}
+        for layer in layers:
+            for left, right in zip(layer, layer[1:]):
+                successors[root[left]].add(root[right])
+        predecessors: dict[int, list[int]] = {block: [] for block in successors}
+        for block, block_successors in successors.items():
+            for successor in block_successors:
+                predecessors[successor].append(block)
+
+        in_degree = {block: len(blocks) for block, blocks in predecessors.items()}
+        queue = deque(block for block, degree in in_degree.items() if degree == 0)
+        topological: list[int] = []
+        while queue:
+            block = queue.popleft()
+            topological.append(block)
+            for successor in successors[block]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    queue.append(successor)
+
+        block_xs: dict[int, float] = {}
+        for block in topological:
+            block_xs[block] = max((block_xs[predecessor] + self._node_spacing
+                                   for predecessor in predecessors[block]), default=0.0)
+        for block in reversed(topological):
+            if successors[block]:
+                nearest = min(block_xs[successor] for successor in successors[block]) - self._node_spacing
+                block_xs[block] = max(block_xs[block], nearest)
+
+        xs = [0.0] * node_count
+        for node, block in root.items():
+            xs[node] = block_xs[block]
+        return xs
+
+
+def order_layers(layers: list[list[Hashable]], up: Mapping | Sequence, down: Mapping | Sequence,
+                 max_sweeps: int = 24, patience: int = 4) -> tuple[list[list[Hashable]], int]:
+    # Reorders each layer by the barycentre (mean position) of its nodes' neighbours in the layer above, then
+    # below, alternately, keeping the order with the fewest crossings. up and down give the neighbours of each node
+    # in the layers above and below. Stops after max_sweeps sweeps, patience sweeps in a row without improvement, or
+    # once there are no crossings.
+    layers = [list(layer) for layer in layers]
+    best = [list(layer) for layer in layers]
+    best_crossings = count_crossings(layers, down)
+    position = {node: i for layer in layers for i, node in enumerate(layer)}
+    stale = 0
+    for sweep in range(max_sweeps):
+        if best_crossings == 0 or stale >= patience:
+            break
+        if sweep % 2 == 0:
+            indices, neighbours = range(1, len(layers)), up
+        else:
+            indices, neighbours = range(len(layers) - 2, -1, -1), down
+        for i in indices:
+            def barycentre(node):
+                adjacent = neighbours[node]
+                if not adjacent:
+                    return position[node]  # nodes with no neighbours there keep their place
+                return sum(position[neighbour] for neighbour in adjacent) / len(adjacent)
+
+            layers[i].sort(key=barycentre)
+            for j, node in enumerate(layers[i]):
+                position[node] = j
+
+        crossings = count_crossings(layers, down)
+        if crossings < best_crossings:
+            best = [list(layer) for layer in layers]
+            best_crossings = crossings
+            stale = 0
+        else:
+            stale += 1
+    return best, best_crossings
+
+
+def count_crossings(layers: list[list[Hashable]], down: Mapping | Sequence) -> int:
+    # Counts the crossings between each pair of consecutive layers as the inversions of the lower ends of their
+    # edges (sorted by upper end) with a Fenwick tree, O(E log V). Edges to nodes outside the next layer are ignored.
+    total = 0
+    for upper, lower in zip(layers, layers[1:]):
+        lower_position = {node: i for i, node in enumerate(lower)}
+        ends: list[int] = []
+        for node in upper:
+            ends.extend(sorted(lower_position[neighbour] for neighbour in down[node] if neighbour in lower_position))
+        size = len(lower)
+        tree = [0] * (size + 1)
+        for seen, end in enumerate(ends):
+            # the number of earlier edges ending to the right of this one
+            i = end + 1
+            not_after = 0
+            while i > 0:
+                not_after += tree[i]
+                i &= i - 1
+            total += seen - not_after
+            i = end + 1
+            while i <= size:
+                tree[i] += 1
+                i += i & -i
+    return total
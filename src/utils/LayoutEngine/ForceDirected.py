@@ -3,25 +3,162 @@
 
 import math
 import random
+import time
+from collections import deque
+from collections.abc import Callable
+from functools import cache
 
 from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
+from src.utils.DataStruct.QuadTree import QuadTree
+
+
+@cache
+def _import_numpy():
+    # numpy is optional, without it layouts fall back to the pure Python backend
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
 
 
 class ForceDirectedLayout:
+    """
+    Class used to lay out an automaton by simulating states repelling each other and transitions pulling them together
+    (Note: the "numpy" backend keeps the positions in an (n, 2) array and computes every force with broadcasting,
+    the all pairs repulsion is computed a block of rows at a time so memory stays bounded for large automata)
+    (Note: with repulsion="barnes_hut" the repulsion is approximated with a quadtree rebuilt every step, groups of
+    states further away than they are wide (relative to theta) act as one, making each step O(n log n) not O(n^2))
+    (Note: iterations is only an upper limit, the simulation stops as soon as no state moves further than tolerance
+    in a step or time_budget_ms runs out. With adaptive set the step size grows while the energy (the sum of the
+    squared forces) keeps falling and shrinks when it rises, otherwise it is multiplied by cooling after every step)
+    (Note: given initial_positions the layout is incremental, states keep the position they are given and only the
+    states without one, and the states up to relax_depth transitions away from them, are moved. States without a
+    position start next to their neighbours that have one)
+    (Note: everything calculate_layout() needs from the builder is copied when the layout is made, so it can be run
+    on another thread while the builder is edited, see LayoutWorker)
+
+    ...
+
+    Attributes
+    ----------
+    BACKENDS -> tuple[str, ...]
+        the backends that can be asked for ("auto" picks numpy when it is installed and worth using)
+    NUMPY_MIN_STATES -> int
+        the number of states from which "auto" uses the numpy backend
+    BLOCK_ELEMENTS -> int
+        the number of state pairs the numpy backend computes the repulsion of at once
+    REPULSIONS -> tuple[str, ...]
+        the ways repulsion can be asked to be computed ("auto" picks Barnes-Hut for large automata)
+    BARNES_HUT_MIN_STATES -> int
+        the number of states from which "auto" uses Barnes-Hut repulsion
+    automaton_builder -> AutomatonBuilder
+        the automaton being laid out
+    width -> int
+        the width of the area to lay the automaton out in
+    height -> int
+        the height of the area to lay the automaton out in
+    iterations -> int
+        the number of steps simulated
+    cooling -> float
+        the factor the maximum step size is multiplied by after each step when not adaptive
+    adaptive -> bool
+        whether the step size follows the energy rather than cooling
+    tolerance -> float
+        the largest move of any state in a step below which the layout has converged
+    time_budget_ms -> float | None
+        the most time calculate_layout() may take (None for no limit)
+    relax_depth -> int
+        how many transitions away from a state without an initial position states are still moved
+    movable -> set[int]
+        the ids of the states calculate_layout() moves
+    backend -> str
+        the backend used by calculate_layout(), "python" or "numpy"
+    repulsion -> str
+        how repulsion is computed, "exact" or "barnes_hut"
+    theta -> float
+        the Barnes-Hut accuracy, smaller is more accurate and slower (0 is exact)
+    positions -> dict[int, tuple[float, float]]
+        the position of each state id
+    iterations_run -> int
+        the number of steps the last calculate_layout() simulated
+    converged -> bool
+        whether the last calculate_layout() stopped because the layout converged
+    energy -> float
+        the energy of the layout after the last step
+    seed -> int | None
+        the seed of the random starting positions (None for different positions every time)
+    cancelled -> bool
+        whether cancel() has been called
 
-    def __init__(self, automaton_builder: AutomatonBuilder, width: int = 730, height: int = 480, iterations: int = 1000, cooling: float = 0.99):
+    Methods
+    -------
+    calculate_layout(on_snapshot: Callable[[dict[int, tuple[float, float]]], None] | None = None,
+                     snapshot_interval_ms: float = 33)
+        runs the simulation, updating positions and passing a copy of them to on_snapshot every snapshot_interval_ms
+    cancel()
+        stops calculate_layout() after the step it is on, from any thread
+    get_positions() -> dict[int, tuple[float, float]]
+        returns the position of each state id
+    """
+
+    BACKENDS: tuple[str, ...] = ("auto", "python", "numpy")
+    NUMPY_MIN_STATES: int = 30
+    BLOCK_ELEMENTS: int = 1 << 20
+    REPULSIONS: tuple[str, ...] = ("auto", "exact", "barnes_hut")
+    BARNES_HUT_MIN_STATES: int = 1000
+
+    def __init__(self, automaton_builder: AutomatonBuilder, width: int = 730, height: int = 480, iterations: int = 1000,
+                 cooling: float = 0.99, backend: str = "auto", repulsion: str = "auto", theta: float = 0.8,
+                 adaptive: bool = True, tolerance: float = 0.05, time_budget_ms: float | None = None,
+                 initial_positions: dict[int, tuple[float, float]] | None = None, relax_depth: int = 1,
+                 seed: int | None = None):
         self._automaton_builder = automaton_builder
         self._width = width
         self._height = height
         self._iterations = iterations
         self._cooling = cooling
+        self._adaptive = adaptive
+        self._tolerance = tolerance
+        self._time_budget_ms = time_budget_ms
+        self._relax_depth = relax_depth
+        self._seed = seed
+        self._random = random.Random(seed)  # not the global generator, so a seed gives the same layout every time
         self._radius = 50
+        self._iterations_run = 0
+        self._converged = False
+        self._energy = math.inf
+        self._cancelled = False
+        self._edges: list[tuple[int, int]] = [(transition.state_from.id, transition.state_to.id)
+                                              for transition in automaton_builder.transitions]
+
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown layout backend '{backend}', expected one of {', '.join(self.BACKENDS)}.")
+        if backend == "numpy" and _import_numpy() is None:
+            raise ValueError("The numpy layout backend needs numpy to be installed.")
+        if backend == "auto":
+            use_numpy = _import_numpy() is not None and len(automaton_builder.states) >= self.NUMPY_MIN_STATES
+            backend = "numpy" if use_numpy else "python"
+        self._backend = backend
+        if repulsion not in self.REPULSIONS:
+            raise ValueError(f"Unknown repulsion '{repulsion}', expected one of {', '.join(self.REPULSIONS)}.")
+        if repulsion == "auto":
+            repulsion = "barnes_hut" if len(automaton_builder.states) >= self.BARNES_HUT_MIN_STATES else "exact"
+        self._repulsion = repulsion
+        self._theta = theta
+
+        if initial_positions:
+            self._start_step = width / 40.0  # the layout only needs touching up, not building from scratch
+            self._positions, self._movable = self._warm_start(initial_positions)
+            return
+        self._start_step = width / 10.0
+        self._movable: set[int] = {state.id for state in automaton_builder.states}
 
         center_x = width / 2
         center_y = height / 2
         self._positions: dict[int, tuple[float, float]] = {
-            state.id: (center_x + random.uniform(-width / 10, width / 10),
-                       center_y + random.uniform(-height / 10, height / 10))
+            state.id: (center_x + self._random.uniform(-width / 10, width / 10),
+                       center_y + self._random.uniform(-height / 10, height / 10))
             for state in automaton_builder.states}
 
         # Ensure the initial state is the leftmost state
@@ -29,6 +166,41 @@ class ForceDirectedLayout:
             initial_state = automaton_builder.get_state(automaton_builder.initial_state)
             self._positions[initial_state.id] = (0, center_y)
 
+    def _warm_start(self, initial_positions: dict[int, tuple[float, float]]) \
+            -> tuple[dict[int, tuple[float, float]], set[int]]:
+        neighbours: dict[int, set[int]] = {state.id: set() for state in self._automaton_builder.states}
+        for state_from, state_to in self._edges:
+            neighbours[state_from].add(state_to)
+            neighbours[state_to].add(state_from)
+
+        positions = {state_id: initial_positions[state_id] for state_id in neighbours if state_id in initial_positions}
+        new_states = [state_id for state_id in neighbours if state_id not in positions]
+
+        # Place new states breadth first out from the placed states, each next to its placed neighbours
+        queue = deque(positions)
+        while queue:
+            for neighbour in neighbours[queue.popleft()]:
+                if neighbour in positions:
+                    continue
+                placed = [positions[state_id] for state_id in neighbours[neighbour] if state_id in positions]
+                jitter_x = self._random.uniform(-self._radius, self._radius)
+                jitter_y = self._random.uniform(-self._radius, self._radius)
+                positions[neighbour] = (sum(x for x, _ in placed) / len(placed) + jitter_x,
+                                        sum(y for _, y in placed) / len(placed) + jitter_y)
+                queue.append(neighbour)
+        for state_id in new_states:
+            if state_id not in positions:  # not connected to any placed state
+                positions[state_id] = (self._width / 2 + self._random.uniform(-self._width / 10, self._width / 10),
+                                       self._height / 2 + self._random.uniform(-self._height / 10,
+                                                                               self._height / 10))
+
+        movable = set(new_states)
+        frontier = set(new_states)
+        for _ in range(self._relax_depth):
+            frontier = {neighbour for state_id in frontier for neighbour in neighbours[state_id]} - movable
+            movable |= frontier
+        return positions, movable
+
     @property
     def automaton_builder(self) -> AutomatonBuilder:
         return self._automaton_builder
@@ -49,34 +221,89 @@ class ForceDirectedLayout:
     def cooling(self) -> float:
         return self._cooling
 
+    @property
+    def adaptive(self) -> bool:
+        return self._adaptive
+
+    @property
+    def tolerance(self) -> float:
+        return self._tolerance
+
+    @property
+    def time_budget_ms(self) -> float | None:
+        return self._time_budget_ms
+
+    @property
+    def relax_depth(self) -> int:
+        return self._relax_depth
+
+    @property
+    def movable(self) -> set[int]:
+        return self._movable
+
+    @property
+    def iterations_run(self) -> int:
+        return self._iterations_run
+
+    @property
+    def converged(self) -> bool:
+        return self._converged
+
+    @property
+    def energy(self) -> float:
+        return self._energy
+
+    @property
+    def seed(self) -> int | None:
+        return self._seed
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def backend(self) -> str:
+        return self._backend
+
+    @property
+    def repulsion(self) -> str:
+        return self._repulsion
+
+    @property
+    def theta(self) -> float:
+        return self._theta
+
     @property
     def positions(self) -> dict[int: tuple[float, float]]:
         return self._positions
 
-    def calculate_layout(self) -> None:
-        temperature = self._width / 10.0
-
-        for _ in range(self._iterations):
-            forces: dict[int, list[float]] = {state_id: [0, 0] for state_id in self._positions}
-
-            # Calculate repulsive forces (node collision detection)
-            for state_id1, pos1 in self._positions.items():
-                for state_id2, pos2 in self._positions.items():
-                    if state_id1 != state_id2:
-                        dx = pos1[0] - pos2[0]
-                        dy = pos1[1] - pos2[1]
-                        distance = math.sqrt(dx ** 2 + dy ** 2)
-                        if distance > 0:
-                            min_distance = self._radius * 2
-                            if distance < min_distance:
-                                repulsive_force = 1000 / (distance ** 2)
-                                forces[state_id1][0] += repulsive_force * dx / distance
-                                forces[state_id1][1] += repulsive_force * dy / distance
+    def cancel(self) -> None:
+        self._cancelled = True  # a single assignment, so safe to make while another thread is in calculate_layout()
+
+    def calculate_layout(self, on_snapshot: Callable[[dict[int, tuple[float, float]]], None] | None = None,
+                         snapshot_interval_ms: float = 33) -> None:
+        schedule = _StepSchedule(self, self._start_step, snapshot_interval_ms if on_snapshot is not None else None)
+        if not self._movable:  # e.g. an incremental layout of an automaton with no new states
+            schedule.converged = True
+        if self._backend == "numpy":
+            self._calculate_layout_numpy(schedule, on_snapshot)
+        else:
+            self._calculate_layout_python(schedule, on_snapshot)
+        self._iterations_run = schedule.iterations_run
+        self._converged = schedule.converged
+        self._energy = schedule.energy
+
+    def _calculate_layout_python(self, schedule: "_StepSchedule",
+                                 on_snapshot: Callable[[dict[int, tuple[float, float]]], None] | None) -> None:
+        while not schedule.finished:
+            temperature = schedule.step
+            if self._repulsion == "barnes_hut":
+                forces = self._barnes_hut_repulsion()
+            else:
+                forces = self._exact_repulsion()
 
             # Calculate attractive forces (edge length constraints)
-            for transition in self._automaton_builder.transitions:
-                from_state = transition.state_from.id
-                to_state = transition.state_to.id
+            for from_state, to_state in self._edges:
                 pos1 = self._positions[from_state]
                 pos2 = self._positions[to_state]
                 dx = pos2[0] - pos1[0]
@@ -90,7 +317,11 @@ class ForceDirectedLayout:
                     forces[to_state][1] -= attractive_force * dy / distance
 
             # Update positions
+            energy = 0.0
+            max_displacement = 0.0
             for state_id, force in forces.items():
+                if state_id not in self._movable:
+                    continue
                 dx, dy = force
                 distance = math.sqrt(dx ** 2 + dy ** 2)
                 if distance > 0:
@@ -99,9 +330,216 @@ class ForceDirectedLayout:
                         self._positions[state_id][0] + (dx / distance) * displacement,
                         self._positions[state_id][1] + (dy / distance) * displacement
                     )
+                    energy += distance ** 2
+                    max_displacement = max(max_displacement, displacement)
 
             # Cool down
-            temperature *= self._cooling
+            schedule.update(energy, max_displacement)
+            if schedule.snapshot_due():
+                on_snapshot(dict(self._positions))
+
+    def _exact_repulsion(self) -> dict[int, list[float]]:
+        forces: dict[int, list[float]] = {state_id: [0, 0] for state_id in self._positions}
+
+        # Calculate repulsive forces (node collision detection), states that can not move need no forces
+        for state_id1 in self._movable:
+            pos1 = self._positions[state_id1]
+            for state_id2, pos2 in self._positions.items():
+                if state_id1 != state_id2:
+                    dx = pos1[0] - pos2[0]
+                    dy = pos1[1] - pos2[1]
+                    distance = math.sqrt(dx ** 2 + dy ** 2)
+                    if distance > 0:
+                        min_distance = self._radius * 2
+                        if distance < min_distance:
+                            repulsive_force = 1000 / (distance ** 2)
+                            forces[state_id1][0] += repulsive_force * dx / distance
+                            forces[state_id1][1] += repulsive_force * dy / distance
+        return forces
+
+    def _barnes_hut_repulsion(self) -> dict[int, list[float]]:
+        # Same repulsion as _exact_repulsion, with far away groups of states acting as a single heavier state
+        min_distance = self._radius * 2
+        min_distance_sq = min_distance ** 2
+        tree = QuadTree(list(self._positions.values()))
+        forces: dict[int, list[float]] = {state_id: [0, 0] for state_id in self._positions}
+        for state_id in self._movable:
+            x, y = self._positions[state_id]
+            force_x = force_y = 0.0
+            for other_x, other_y, mass in tree.approximate(x, y, self._theta, min_distance):
+                dx = x - other_x
+                dy = y - other_y
+                distance_sq = dx * dx + dy * dy
+                if 0 < distance_sq < min_distance_sq:
+                    weight = mass * 1000 / (distance_sq * math.sqrt(distance_sq))
+                    force_x += weight * dx
+                    force_y += weight * dy
+            forces[state_id] = [force_x, force_y]
+        return forces
+
+    def _calculate_layout_numpy(self, schedule: "_StepSchedule",
+                                on_snapshot: Callable[[dict[int, tuple[float, float]]], None] | None) -> None:
+        # Same forces as the python backend, computed for every state at once
+        np = _import_numpy()
+        state_ids = list(self._positions)
+        state_count = len(state_ids)
+        if state_count == 0:
+            return
+        index = {state_id: i for i, state_id in enumerate(state_ids)}
+        positions = np.array([self._positions[state_id] for state_id in state_ids], dtype=np.float64)
+        edges_from = np.array([index[state_from] for state_from, _ in self._edges], dtype=np.intp)
+        edges_to = np.array([index[state_to] for _, state_to in self._edges], dtype=np.intp)
+
+        forces = np.empty((state_count, 2), dtype=np.float64)
+        fixed = np.array([state_id not in self._movable for state_id in state_ids], dtype=bool)
+        has_fixed = bool(fixed.any())
+        movable = np.flatnonzero(~fixed)  # only these states need their repulsion computed
+        # Reused every step, allocating the state pair arrays anew each step costs more than the arithmetic on them
+        pair_buffers = self._pair_buffers_numpy(state_count, len(movable)) if self._repulsion == "exact" else None
+
+        while not schedule.finished:
+            temperature = schedule.step
+            forces.fill(0)
+            xs = positions[:, 0]
+            ys = positions[:, 1]
+
+            # Repulsion 1000 / d^2 along (dx, dy) / d between states closer than min_distance
+            if self._repulsion == "barnes_hut":
+                self._barnes_hut_repulsion_numpy(positions, forces, movable)
+            else:
+                self._exact_repulsion_numpy(positions, forces, movable, pair_buffers)
+
+            # Attraction d^2 / 100 along each transition, i.e. (dx, dy) * d / 100
+            if len(edges_from):
+                dx = xs[edges_to] - xs[edges_from]
+                dy = ys[edges_to] - ys[edges_from]
+                scale = np.sqrt(dx * dx + dy * dy) / 100
+                dx *= scale
+                dy *= scale
+                forces[:, 0] += (np.bincount(edges_from, dx, state_count) - np.bincount(edges_to, dx, state_count))
+                forces[:, 1] += (np.bincount(edges_from, dy, state_count) - np.bincount(edges_to, dy, state_count))
+
+            # Move each state along its force by at most temperature
+            if has_fixed:
+                forces[fixed] = 0
+            magnitude_sq = forces[:, 0] * forces[:, 0] + forces[:, 1] * forces[:, 1]
+            magnitude = np.sqrt(magnitude_sq)
+            displacement = np.minimum(magnitude, temperature)
+            step = np.zeros_like(magnitude)
+            np.divide(displacement, magnitude, out=step, where=magnitude > 0)
+            positions += forces * step[:, None]
+
+            schedule.update(float(magnitude_sq.sum()), float(displacement.max()))
+            if schedule.snapshot_due():
+                on_snapshot(dict(zip(state_ids, map(tuple, positions.tolist()))))
+
+        self._positions = {state_id: (float(x), float(y)) for state_id, (x, y) in zip(state_ids, positions.tolist())}
+
+    def _pair_buffers_numpy(self, state_count: int, row_count: int):
+        # The arrays _exact_repulsion_numpy works in, one block of rows of the state pairs large
+        np = _import_numpy()
+        shape = (max(1, min(row_count, self.BLOCK_ELEMENTS // state_count)), state_count)
+        return np.empty(shape, dtype=np.float64), np.empty(shape, dtype=np.float64), np.empty(shape, dtype=bool)
+
+    def _exact_repulsion_numpy(self, positions, forces, rows, pair_buffers) -> None:
+        # Adds the repulsion on the states at rows to forces, a block of rows of the state pairs at a time.
+        # sum_j w_ij * (p_i - p_j) is summed as p_i * sum_j w_ij - (w @ p)_i, so only the weights go through the
+        # pair arrays and the matrix product does the summing
+        np = _import_numpy()
+        min_distance_sq = (self._radius * 2) ** 2
+        distance_buffer, weight_buffer, close_buffer = pair_buffers
+        block = len(distance_buffer)
+        # The forces only depend on differences, and p_i * sum_j w_ij loses less precision to cancellation when the
+        # coordinates are small
+        points = positions - positions.mean(axis=0)
+        xs = points[:, 0]
+        ys = points[:, 1]
+        for start in range(0, len(rows), block):
+            block_rows = rows[start:start + block]
+            distance_sq = np.subtract(xs[block_rows, None], xs[None, :], out=distance_buffer[:len(block_rows)])
+            distance_sq *= distance_sq
+            weight = np.subtract(ys[block_rows, None], ys[None, :], out=weight_buffer[:len(block_rows)])
+            weight *= weight
+            distance_sq += weight
+            close = np.less(distance_sq, min_distance_sq, out=close_buffer[:len(block_rows)])
+            close &= distance_sq > 0
+            np.maximum(distance_sq, 1e-12, out=distance_sq)  # coincident states are masked out below
+            np.sqrt(distance_sq, out=weight)
+            weight *= distance_sq
+            np.divide(1000.0, weight, out=weight)
+            weight *= close
+            forces[block_rows] += points[block_rows] * weight.sum(axis=1)[:, None] - weight @ points
+
+    def _barnes_hut_repulsion_numpy(self, positions, forces, rows) -> None:
+        # Adds the repulsion on the states at rows to forces, walking the quadtree for all of them at once
+        np = _import_numpy()
+        min_distance = self._radius * 2
+        tree = QuadTree(positions.tolist())
+        state, other_x, other_y, mass = tree.approximate_all(self._theta, min_distance, rows)
+        dx = positions[state, 0] - other_x
+        dy = positions[state, 1] - other_y
+        distance_sq = dx * dx + dy * dy
+        close = (distance_sq > 0) & (distance_sq < min_distance ** 2)
+        np.maximum(distance_sq, 1e-12, out=distance_sq)
+        weight = mass * 1000.0 / (distance_sq * np.sqrt(distance_sq))
+        weight *= close
+        forces[:, 0] += np.bincount(state, weight * dx, len(positions))
+        forces[:, 1] += np.bincount(state, weight * dy, len(positions))
 
     def get_positions(self) -> dict[int: tuple[float, float]]:
         return self._positions
+
+
+class _StepSchedule:
+    # The step size and stopping rules of one ForceDirectedLayout.calculate_layout() call, shared by both backends.
+    # The adaptive schedule is Hu's: the step grows by 1 / STEP_FACTOR after PROGRESS_STEPS steps in a row lowered
+    # the energy and shrinks by STEP_FACTOR whenever a step raises it, never exceeding the starting step.
+
+    STEP_FACTOR: float = 0.9
+    PROGRESS_STEPS: int = 5
+
+    def __init__(self, layout: ForceDirectedLayout, start_step: float, snapshot_interval_ms: float | None = None):
+        self.step = start_step
+        self.iterations_run = 0
+        self.converged = False
+        self.energy = math.inf
+        self._max_step = self.step
+        self._layout = layout
+        self._progress = 0
+        self._deadline = None if layout.time_budget_ms is None else \
+            time.perf_counter() + layout.time_budget_ms / 1000
+        self._out_of_time = False
+        self._snapshot_interval = None if snapshot_interval_ms is None else snapshot_interval_ms / 1000
+        self._next_snapshot = time.perf_counter()
+
+    @property
+    def finished(self) -> bool:
+        return (self.converged or self._out_of_time or self._layout.cancelled
+                or self.iterations_run >= self._layout.iterations)
+
+    def snapshot_due(self) -> bool:
+        # Whether the positions should be passed to on_snapshot, at most once per snapshot interval
+        if self._snapshot_interval is None:
+            return False
+        now = time.perf_counter()
+        if now < self._next_snapshot:
+            return False
+        self._next_snapshot = now + self._snapshot_interval
+        return True
+
+    def update(self, energy: float, max_displacement: float):
+        self.iterations_run += 1
+        if not self._layout.adaptive:
+            self.step *= self._layout.cooling
+        elif energy < self.energy:
+            self._progress += 1
+            if self._progress >= self.PROGRESS_STEPS:
+                self._progress = 0
+                self.step = min(self.step / self.STEP_FACTOR, self._max_step)
+        else:
+            self._progress = 0
+            self.step *= self.STEP_FACTOR
+        self.energy = energy
+
+        self.converged = max_displacement < self._layout.tolerance
+        self._out_of_time = self._deadline is not None and time.perf_counter() >= self._deadline
@@ -1,40 +1,139 @@
+# FlippyFlappingTheJ
+# ./src/utils/LayoutEngine/Layered.py
+
+from collections import deque
+
 from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
+from src.utils.LayoutEngine.DagreLayout import order_layers
 
 
 class LayeredLayout:
-    def __init__(self, automaton_builder: AutomatonBuilder, layer_height=100, node_spacing=50):
+    """
+    Class used to lay out an automaton in layers by the number of transitions each state is from the initial state
+    (Note: the layers are found with a breadth first search over an index of each state's successors built once,
+    so layering is O(S + T). States not reachable from the initial state are searched from in turn, each starting
+    in the top layer.)
+    (Note: the states in each layer are then reordered by barycentric sweeps to reduce the crossings between the
+    transitions joining consecutive layers, see DagreLayout.order_layers)
+
+    ...
+
+    Attributes
+    ----------
+    automaton_builder -> AutomatonBuilder
+        the automaton being laid out
+    layer_height -> float
+        the distance between layers
+    node_spacing -> float
+        the horizontal distance between two states in a layer
+    max_sweeps -> int
+        the most barycentric sweeps made to reduce crossings (0 keeps the breadth first order)
+    seed -> int | None
+        accepted so every layout engine can be made the same way, the layout has no randomness so it is unused
+    layers -> list[list[int]]
+        the state ids in each layer from left to right
+    crossings -> int
+        the number of crossings between transitions joining consecutive layers
+    positions -> dict[int, tuple[float, float]]
+        the position of each state id
+
+    Methods
+    -------
+    get_positions() -> dict[int, tuple[float, float]]
+        returns the position of each state id
+    """
+
+    def __init__(self, automaton_builder: AutomatonBuilder, layer_height: float = 100, node_spacing: float = 50,
+                 max_sweeps: int = 24, seed: int | None = None):
         self._automaton_builder = automaton_builder
         self._layer_height = layer_height
         self._node_spacing = node_spacing
+        self._max_sweeps = max_sweeps
+        self._seed = seed
+        self._layers: list[list[int]] = []
+        self._crossings = 0
         self._positions = self._calculate_positions()
 
-    def _calculate_positions(self):
+    @property
+    def automaton_builder(self) -> AutomatonBuilder:
+        return self._automaton_builder
+
+    @property
+    def layer_height(self) -> float:
+        return self._layer_height
+
+    @property
+    def node_spacing(self) -> float:
+        return self._node_spacing
+
+    @property
+    def max_sweeps(self) -> int:
+        return self._max_sweeps
+
+    @property
+    def seed(self) -> int | None:
+        return self._seed
+
+    @property
+    def layers(self) -> list[list[int]]:
+        return self._layers
+
+    @property
+    def crossings(self) -> int:
+        return self._crossings
+
+    @property
+    def positions(self) -> dict[int, tuple[float, float]]:
+        return self._positions
+
+    def get_positions(self) -> dict[int, tuple[float, float]]:
+        return self._positions
+
+    def _calculate_positions(self) -> dict[int, tuple[float, float]]:
+        successors: dict[int, list[int]] = {state.id: [] for state in self._automaton_builder.states}
+        for transition in self._automaton_builder.transitions:
+            successors[transition.state_from.id].append(transition.state_to.id)
+
+        layer_of, layers = self._assign_layers(successors)
+
+        # Only transitions between consecutive layers can be uncrossed by reordering, the rest are left as they are
+        up: dict[int, set[int]] = {state_id: set() for state_id in successors}
+        down: dict[int, set[int]] = {state_id: set() for state_id in successors}
+        for state_from, states_to in successors.items():
+            for state_to in states_to:
+                if layer_of[state_to] == layer_of[state_from] + 1:
+                    down[state_from].add(state_to)
+                    up[state_to].add(state_from)
+        self._layers, self._crossings = order_layers(layers, up, down, self._max_sweeps)
+
         positions = {}
-        layers = self._assign_layers()
-        for layer, states in layers.items():
+        for layer, states in enumerate(self._layers):
             y = layer * self._layer_height
             x_start = (len(states) - 1) * self._node_spacing / -2
-            for i, state in enumerate(states):
-                x = x_start + i * self._node_spacing
-                positions[state.id] = (x, y)
+            for i, state_id in enumerate(states):
+                positions[state_id] = (x_start + i * self._node_spacing, y)
         return positions
 
-    def _assign_layers(self):
-        layers = {}
-        visited = set()
-        queue = [(self._automaton_builder.initial_state, 0)]
-        while queue:
-            state_id, layer = queue.pop(0)
-            if state_id not in visited:
-                visited.add(state_id)
-                if layer not in layers:
-                    layers[layer] = []
-                state = self._automaton_builder.get_state(state_id)
-                layers[layer].append(state)
-                for transition in self._automaton_builder.get_transitions_from_state(state_id):
-                    queue.append((transition.state_to.id, layer + 1))
-        return layers
-
-    @property
-    def positions(self):
-        return self._positions
+    def _assign_layers(self, successors: dict[int, list[int]]) -> tuple[dict[int, int], list[list[int]]]:
+        # Each state is queued once, when it is first reached, so its layer is its distance from where the search
+        # started
+        layer_of: dict[int, int] = {}
+        layers: list[list[int]] = []
+        initial_state = self._automaton_builder.initial_state
+        roots = ([initial_state] if initial_state is not None else []) + list(successors)
+        for root in roots:
+            if root in layer_of:
+                continue
+            layer_of[root] = 0
+            queue = deque([root])
+            while queue:
+                state_id = queue.popleft()
+                layer = layer_of[state_id]
+                if layer == len(layers):
+                    layers.append([])
+                layers[layer].append(state_id)
+                for successor in successors[state_id]:
+                    if successor not in layer_of:
+                        layer_of[successor] = layer + 1
+                        queue.append(successor)
+        return layer_of, layers
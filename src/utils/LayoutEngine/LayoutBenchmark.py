@@ -0,0 +1,309 @@
+# FlippyFlappingTheJ
+# ./src/utils/LayoutEngine/LayoutBenchmark.py
+
+import math
+import platform
+import random
+import statistics
+import time
+import traceback
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, asdict
+
+from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
+from src.utils.Language.ThompsonConstruction import ThompsonArena
+from src.utils.LayoutEngine.DagreLayout import DagreLayout
+from src.utils.LayoutEngine.ForceDirected import ForceDirectedLayout, _import_numpy
+from src.utils.LayoutEngine.Layered import LayeredLayout
+from src.utils.LayoutEngine.Multilevel import MultilevelLayout
+
+
+@dataclass
+class LayoutBenchmarkResult:
+    """
+    The time taken by one layout engine to lay out one synthetic automaton and the quality of its layout
+    """
+
+    automaton: str
+    engine: str
+    states: int = 0
+    transitions: int = 0
+    seconds: float = 0.0
+    crossings: int = 0  # pairs of transitions (drawn as straight lines) that cross
+    stress: float = 0.0  # mean squared relative error of distances against transition counts, after scaling
+    overlaps: int = 0  # pairs of states closer than OVERLAP_FRACTION of the median transition length
+    seeded: bool = True  # whether the layout depends on the seed, layered layouts are the same for every seed
+    error: str | None = None
+
+
+class LayoutBenchmark:
+    """
+    Class used to time the layout engines on synthetic automata and measure the quality of their layouts
+    (Note: everything random, the automata and the layouts, comes from the seed, so two runs with the same seed and
+    size lay out the same automata the same way and their results can be compared to track regressions)
+    (Note: every engine takes the seed, but only SEEDED_ENGINES use it. The dagre and layered layouts have no
+    randomness, so for them the seed only changes the random DFAs, and each result records whether it is seeded.)
+
+    The automata are chains, square grids, random DFAs, the Thompson construction of nested stars (a*b)*a)*... and
+    the DFA of (a|b)*a(a|b)^(n-1), whose subset construction has 2^n states.
+
+    ...
+
+    Attributes
+    ----------
+    ENGINES -> tuple[str, ...]
+        the layout engines that can be benchmarked
+    SEEDED_ENGINES -> tuple[str, ...]
+        the engines whose layouts depend on the seed (every engine takes one, the others are deterministic)
+    SIZES -> dict[str, dict[str, int]]
+        the parameters of the synthetic automata for each size
+    OVERLAP_FRACTION -> float
+        the fraction of the median transition length two states must be closer than to overlap
+    STRESS_SOURCES -> int
+        the most states the graph distances used for stress are measured from
+    seed -> int
+        the seed of the automata and of the layouts
+    size -> str
+        the size of the synthetic automata, a key of SIZES
+    engines -> tuple[str, ...]
+        the engines benchmarked
+
+    Methods
+    -------
+    automata() -> list[tuple[str, AutomatonBuilder]]
+        generates the synthetic automata
+    run(progress: Callable[[LayoutBenchmarkResult], None] | None = None) -> list[LayoutBenchmarkResult]
+        lays out every automaton with every engine, calling progress after each layout
+    report(results: list[LayoutBenchmarkResult]) -> dict
+        returns the results with the settings they were made with, ready to be written as JSON
+    chain(length: int) -> AutomatonBuilder
+    grid(width: int) -> AutomatonBuilder
+    random_dfa(state_count: int, alphabet: str, rng: random.Random) -> AutomatonBuilder
+    nested_stars(depth: int) -> AutomatonBuilder
+    subset_blow_up(n: int) -> AutomatonBuilder
+        generate each kind of synthetic automaton
+    count_crossings(positions: dict[int, tuple[float, float]], edges: list[tuple[int, int]]) -> int
+    stress(positions: dict[int, tuple[float, float]], edges: list[tuple[int, int]], sources: int, rng: random.Random)
+            -> float
+    count_overlaps(positions: dict[int, tuple[float, float]], edges: list[tuple[int, int]]) -> int
+        measure the quality of a layout
+    """
+
+    ENGINES: tuple[str, ...] = ("force_directed", "multilevel", "dagre", "layered")
+    SEEDED_ENGINES: tuple[str, ...] = ("force_directed", "multilevel")
+    SIZES: dict[str, dict[str, int]] = {
+        "small": {"chain": 50, "grid": 8, "random_dfa": 50, "nested_stars": 4, "subset_blow_up": 4},
+        "medium": {"chain": 500, "grid": 20, "random_dfa": 300, "nested_stars": 12, "subset_blow_up": 7},
+        "large": {"chain": 5000, "grid": 60, "random_dfa": 2000, "nested_stars": 40, "subset_blow_up": 10},
+    }
+    OVERLAP_FRACTION: float = 0.25
+    STRESS_SOURCES: int = 64
+
+    def __init__(self, seed: int = 0, size: str = "small", engines: list[str] | None = None):
+
+        if size not in self.SIZES:
+            raise ValueError(f"Unknown benchmark size '{size}', expected one of {', '.join(self.SIZES)}.")
+        engines = tuple(engines) if engines else self.ENGINES
+        for engine in engines:
+            if engine not in self.ENGINES:
+                raise ValueError(f"Unknown layout engine '{engine}', expected one of {', '.join(self.ENGINES)}.")
+
+        self._seed = seed
+        self._size = size
+        self._engines = engines
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def size(self) -> str:
+        return self._size
+
+    @property
+    def engines(self) -> tuple[str, ...]:
+        return self._engines
+
+    def automata(self) -> list[tuple[str, AutomatonBuilder]]:
+        sizes = self.SIZES[self._size]
+        rng = random.Random(self._seed)
+        return [
+            (f"chain_{sizes['chain']}", self.chain(sizes["chain"])),
+            (f"grid_{sizes['grid']}x{sizes['grid']}", self.grid(sizes["grid"])),
+            (f"random_dfa_{sizes['random_dfa']}", self.random_dfa(sizes["random_dfa"], "ab", rng)),
+            (f"nested_stars_{sizes['nested_stars']}", self.nested_stars(sizes["nested_stars"])),
+            (f"subset_blow_up_{sizes['subset_blow_up']}", self.subset_blow_up(sizes["subset_blow_up"])),
+        ]
+
+    def run(self, progress: Callable[[LayoutBenchmarkResult], None] | None = None) -> list[LayoutBenchmarkResult]:
+        results: list[LayoutBenchmarkResult] = []
+        for name, builder in self.automata():
+            edges = sorted({(min(transition.state_from.id, transition.state_to.id),
+                             max(transition.state_from.id, transition.state_to.id))
+                            for transition in builder.transitions
+                            if transition.state_from.id != transition.state_to.id})
+            for engine in self._engines:
+                result = LayoutBenchmarkResult(name, engine, len(builder.states), len(builder.transitions),
+                                               seeded=engine in self.SEEDED_ENGINES)
+                try:
+                    start = time.perf_counter()
+                    positions = self._lay_out(engine, builder)
+                    result.seconds = time.perf_counter() - start
+                    result.crossings = self.count_crossings(positions, edges)
+                    result.stress = self.stress(positions, edges, self.STRESS_SOURCES, random.Random(self._seed))
+                    result.overlaps = self.count_overlaps(positions, edges)
+                except Exception as e:  # one engine failing should not lose the results of the others
+                    result.error = "".join(traceback.format_exception_only(type(e), e)).strip()
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+        return results
+
+    def report(self, results: list[LayoutBenchmarkResult]) -> dict:
+        return {"seed": self._seed, "size": self._size, "python": platform.python_version(),
+                "numpy": _import_numpy() is not None, "results": [asdict(result) for result in results]}
+
+    def _lay_out(self, engine: str, builder: AutomatonBuilder) -> dict[int, tuple[float, float]]:
+        if engine == "force_directed":
+            layout = ForceDirectedLayout(builder, seed=self._seed)
+            layout.calculate_layout()
+            return layout.positions
+        if engine == "multilevel":
+            layout = MultilevelLayout(builder, seed=self._seed)
+            layout.calculate_layout()
+            return layout.positions
+        if engine == "dagre":
+            return DagreLayout(builder, seed=self._seed).positions
+        return LayeredLayout(builder, seed=self._seed).positions
+
+    @staticmethod
+    def chain(length: int) -> AutomatonBuilder:
+        builder = AutomatonBuilder()
+        for i in range(length):
+            builder.add_state(i == length - 1, i == 0)
+        for i in range(length - 1):
+            builder.add_transition(i, i + 1, "a")
+        return builder
+
+    @staticmethod
+    def grid(width: int) -> AutomatonBuilder:
+        builder = AutomatonBuilder()
+        for i in range(width * width):
+            builder.add_state(i == width * width - 1, i == 0)
+        for row in range(width):
+            for column in range(width):
+                state_id = row * width + column
+                if column + 1 < width:
+                    builder.add_transition(state_id, state_id + 1, "a")
+                if row + 1 < width:
+                    builder.add_transition(state_id, state_id + width, "b")
+        return builder
+
+    @staticmethod
+    def random_dfa(state_count: int, alphabet: str, rng: random.Random) -> AutomatonBuilder:
+        builder = AutomatonBuilder()
+        for i in range(state_count):
+            builder.add_state(rng.random() < 0.2, i == 0)
+        for i in range(state_count):
+            for char in alphabet:
+                builder.add_transition(i, rng.randrange(state_count), char)
+        return builder
+
+    @staticmethod
+    def nested_stars(depth: int) -> AutomatonBuilder:
+        # ((a*b)*a)*... in postfix, each level concatenating a symbol and starring the result
+        postfix = "a*"
+        for level in range(1, depth):
+            postfix += "ab"[level % 2] + "∧*"
+        arena = ThompsonArena()
+        automaton = arena.to_non_deterministic(arena.from_postfix(postfix))
+        return AutomatonBuilder.get_builder_from_finite_automata(automaton)
+
+    @staticmethod
+    def subset_blow_up(n: int) -> AutomatonBuilder:
+        # (a|b)*a(a|b)^(n-1), the nth symbol from the end is an a, needs every subset of the last n symbols
+        postfix = "ab∨*a∧" + "ab∨∧" * (n - 1)
+        arena = ThompsonArena()
+        automaton = arena.to_non_deterministic(arena.from_postfix(postfix)).to_deterministic()
+        return AutomatonBuilder.get_builder_from_finite_automata(automaton)
+
+    @staticmethod
+    def count_crossings(positions: dict[int, tuple[float, float]], edges: list[tuple[int, int]]) -> int:
+        # Sweeps the transitions from left to right, only comparing those whose x ranges overlap
+        segments = []
+        for state_from, state_to in edges:
+            (x1, y1), (x2, y2) = positions[state_from], positions[state_to]
+            segments.append((min(x1, x2), max(x1, x2), x1, y1, x2, y2, state_from, state_to))
+        segments.sort()
+
+        def orientation(ax, ay, bx, by, cx, cy) -> float:
+            return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+        crossings = 0
+        for i, (_, max_x, x1, y1, x2, y2, from1, to1) in enumerate(segments):
+            for min_x2, _, x3, y3, x4, y4, from2, to2 in segments[i + 1:]:
+                if min_x2 > max_x:
+                    break
+                if from2 in (from1, to1) or to2 in (from1, to1):
+                    continue  # transitions meeting at a state do not cross
+                d1 = orientation(x3, y3, x4, y4, x1, y1)
+                d2 = orientation(x3, y3, x4, y4, x2, y2)
+                d3 = orientation(x1, y1, x2, y2, x3, y3)
+                d4 = orientation(x1, y1, x2, y2, x4, y4)
+                if d1 * d2 < 0 and d3 * d4 < 0:
+                    crossings += 1
+        return crossings
+
+    @staticmethod
+    def stress(positions: dict[int, tuple[float, float]], edges: list[tuple[int, int]], sources: int,
+               rng: random.Random) -> float:
+        # sum((s d - g)^2 / g^2) / pairs, with g the number of transitions between two states (ignoring direction),
+        # d their distance and s the scale minimising it, so layouts of any size can be compared. The distances
+        # are only measured from a sample of sources states.
+        neighbours: dict[int, list[int]] = {state_id: [] for state_id in positions}
+        for state_from, state_to in edges:
+            neighbours[state_from].append(state_to)
+            neighbours[state_to].append(state_from)
+        state_ids = list(positions)
+        sampled = state_ids if len(state_ids) <= sources else rng.sample(state_ids, sources)
+
+        ratios: list[float] = []  # d / g for every pair
+        for source in sampled:
+            hops = {source: 0}
+            queue = deque([source])
+            while queue:
+                state_id = queue.popleft()
+                for neighbour in neighbours[state_id]:
+                    if neighbour not in hops:
+                        hops[neighbour] = hops[state_id] + 1
+                        queue.append(neighbour)
+            source_x, source_y = positions[source]
+            for state_id, hop_count in hops.items():
+                if hop_count:
+                    x, y = positions[state_id]
+                    ratios.append(math.hypot(x - source_x, y - source_y) / hop_count)
+        if not ratios:
+            return 0.0
+        square_sum = sum(ratio * ratio for ratio in ratios)
+        scale = sum(ratios) / square_sum if square_sum > 0 else 0.0
+        return sum((scale * ratio - 1) ** 2 for ratio in ratios) / len(ratios)
+
+    @staticmethod
+    def count_overlaps(positions: dict[int, tuple[float, float]], edges: list[tuple[int, int]]) -> int:
+        # Pairs of states closer than a fraction of the median transition length, found with a grid of that size
+        lengths = [math.dist(positions[state_from], positions[state_to]) for state_from, state_to in edges]
+        lengths = [length for length in lengths if length > 0]
+        threshold = LayoutBenchmark.OVERLAP_FRACTION * (statistics.median(lengths) if lengths else 1.0)
+        cells: dict[tuple[int, int], list[tuple[float, float]]] = {}
+        overlaps = 0
+        for x, y in positions.values():
+            cell_x = math.floor(x / threshold)
+            cell_y = math.floor(y / threshold)
+            for nearby_x in (cell_x - 1, cell_x, cell_x + 1):
+                for nearby_y in (cell_y - 1, cell_y, cell_y + 1):
+                    for other_x, other_y in cells.get((nearby_x, nearby_y), ()):
+                        if math.hypot(x - other_x, y - other_y) < threshold:
+                            overlaps += 1
+            cells.setdefault((cell_x, cell_y), []).append((x, y))
+        return overlaps
@@ -0,0 +1,89 @@
+# FlippyFlappingTheJ
+# ./src/utils/LayoutEngine/LayoutWorker.py
+
+import queue
+import threading
+
+from src.utils.LayoutEngine.ForceDirected import ForceDirectedLayout
+
+
+class LayoutWorker:
+    """
+    Class used to run layouts on a background thread so the UI keeps responding while they are calculated
+    (Note: positions are passed back through a thread safe queue, nothing but the layout itself is touched by the
+    worker thread, so tkinter widgets are only ever changed by whoever calls poll())
+    (Note: starting a layout cancels the one running, any positions the cancelled layout still sends are dropped)
+
+    The numpy backend releases the GIL while it computes so runs alongside the UI, the pure Python backend shares
+    the interpreter with it but is switched out often enough to keep the UI responsive.
+
+    ...
+
+    Attributes
+    ----------
+    snapshot_interval_ms -> float
+        the time between the positions sent while a layout runs
+    layout -> ForceDirectedLayout | None
+        the layout last started
+    busy -> bool
+        whether the layout last started is running or has positions that have not been polled
+
+    Methods
+    -------
+    start(layout: ForceDirectedLayout)
+        cancels the running layout and starts calculating another
+    cancel()
+        cancels the running layout, dropping any positions it has not been polled for
+    poll() -> dict[int, tuple[float, float]] | None
+        returns the latest positions of the layout last started (None if there are none new)
+    """
+
+    def __init__(self, snapshot_interval_ms: float = 33):
+
+        self._snapshot_interval_ms = snapshot_interval_ms
+        self._layout: ForceDirectedLayout | None = None
+        self._thread: threading.Thread | None = None
+        self._generation: int = 0  # tags the positions sent so those of a cancelled layout can be told apart
+        self._snapshots: queue.SimpleQueue[tuple[int, dict[int, tuple[float, float]]]] = queue.SimpleQueue()
+
+    @property
+    def snapshot_interval_ms(self) -> float:
+        return self._snapshot_interval_ms
+
+    @property
+    def layout(self) -> ForceDirectedLayout | None:
+        return self._layout
+
+    @property
+    def busy(self) -> bool:
+        return (self._thread is not None and self._thread.is_alive()) or not self._snapshots.empty()
+
+    def start(self, layout: ForceDirectedLayout):
+        self.cancel()
+        self._layout = layout
+        generation = self._generation
+        self._thread = threading.Thread(target=self._run, args=(layout, generation), daemon=True,
+                                        name=f"layout-{generation}")
+        self._thread.start()
+
+    def _run(self, layout: ForceDirectedLayout, generation: int):
+        try:
+            layout.calculate_layout(lambda positions: self._snapshots.put((generation, positions)),
+                                    self._snapshot_interval_ms)
+        finally:
+            self._snapshots.put((generation, dict(layout.positions)))  # the final positions, even if it failed
+
+    def cancel(self):
+        if self._layout is not None:
+            self._layout.cancel()
+        self._generation += 1
+
+    def poll(self) -> dict[int, tuple[float, float]] | None:
+        latest = None
+        while True:
+            try:
+                generation, positions = self._snapshots.get_nowait()
+            except queue.Empty:
+                return latest
+            if generation == self._generation:
+                latest = positions  # only the newest positions are worth showing
@@ -0,0 +1,346 @@
+# FlippyFlappingTheJ
+# ./src/utils/LayoutEngine/Multilevel.py
+
+import math
+import random
+
+from src.utils.Automata.AutomatonBuilder import AutomatonBuilder
+from src.utils.DataStruct.QuadTree import QuadTree
+from src.utils.LayoutEngine.ForceDirected import _import_numpy
+
+
+class MultilevelLayout:
+    """
+    Class used to lay out very large automata by laying out a much smaller automaton made by repeatedly merging
+    states together, then splitting the states back apart a level at a time (as done by Walshaw's multilevel
+    force directed placement)
+    (Note: states are merged in pairs by heavy edge matching, each state is matched with the unmatched neighbour it
+    shares the most transitions with, so each level has about half the states of the one before. Coarsening stops
+    at coarsest_size states or once matching barely shrinks the automaton, e.g. for stars.)
+    (Note: each level starts with the states of a merged pair next to where the pair was and is refined with
+    Walshaw's forces, a spring d^2 / k along every transition and repulsion C k^2 / d between states closer than 2k,
+    with k the natural length of a transition at that level. Repulsion is found with a quadtree (far away groups of
+    states act as one), so a step is O(n log n) and as the levels shrink geometrically the whole layout is too.)
+
+    ...
+
+    Attributes
+    ----------
+    BACKENDS -> tuple[str, ...]
+        the backends that can be asked for ("auto" picks numpy when it is installed and worth using)
+    NUMPY_MIN_STATES -> int
+        the number of states from which "auto" uses the numpy backend
+    REPULSION_STRENGTH -> float
+        Walshaw's C, how strongly states repel compared to how strongly transitions pull
+    LEVEL_SCALE -> float
+        the natural transition length of a level divided by that of the level below it
+    MIN_SHRINK -> float
+        the fraction of states a level must lose compared to the one below it for coarsening to continue
+    LEAF_SIZE -> int
+        the most states in a leaf of the quadtrees used to find the repulsion
+    automaton_builder -> AutomatonBuilder
+        the automaton being laid out
+    spacing -> float
+        the natural length of a transition in the finished layout
+    coarsest_size -> int
+        the number of states below which an automaton is not coarsened any further
+    iterations -> int
+        the most steps simulated to refine each level
+    coarsest_iterations -> int
+        the most steps simulated to lay out the coarsest level
+    cooling -> float
+        the factor the maximum step size is multiplied by after each step
+    tolerance -> float
+        the largest move of any state in a step, as a fraction of the level's natural length, below which a level
+        has converged
+    theta -> float
+        the Barnes-Hut accuracy, smaller is more accurate and slower (0 is exact)
+    backend -> str
+        the backend used by calculate_layout(), "python" or "numpy"
+    seed -> int | None
+        the seed of the matching order and starting positions (None for a different layout every time)
+    level_sizes -> list[int]
+        the number of states of each level of the last calculate_layout(), finest first
+    iterations_run -> int
+        the number of steps the last calculate_layout() simulated over every level
+    positions -> dict[int, tuple[float, float]]
+        the position of each state id
+
+    Methods
+    -------
+    calculate_layout()
+        coarsens the automaton, lays out the coarsest level and refines each level back to the automaton
+    get_positions() -> dict[int, tuple[float, float]]
+        returns the position of each state id
+    """
+
+    BACKENDS: tuple[str, ...] = ("auto", "python", "numpy")
+    NUMPY_MIN_STATES: int = 30
+    REPULSION_STRENGTH: float = 0.2
+    LEVEL_SCALE: float = math.sqrt(7 / 4)
+    MIN_SHRINK: float = 0.1
+    LEAF_SIZE: int = 8  # states per quadtree leaf, building the tree every step costs more than a few exact pairs
+
+    def __init__(self, automaton_builder: AutomatonBuilder, spacing: float = 100, coarsest_size: int = 50,
+                 iterations: int = 30, coarsest_iterations: int = 100, cooling: float = 0.9, tolerance: float = 0.01,
+                 theta: float = 0.8, backend: str = "auto", seed: int | None = None):
+        self._automaton_builder = automaton_builder
+        self._spacing = spacing
+        self._coarsest_size = max(2, coarsest_size)
+        self._iterations = iterations
+        self._coarsest_iterations = coarsest_iterations
+        self._cooling = cooling
+        self._tolerance = tolerance
+        self._theta = theta
+        self._seed = seed
+        self._random = random.Random(seed)  # replaced by every calculate_layout()
+        self._level_sizes: list[int] = []
+        self._iterations_run = 0
+        self._positions: dict[int, tuple[float, float]] = {}
+
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown layout backend '{backend}', expected one of {', '.join(self.BACKENDS)}.")
+        if backend == "numpy" and _import_numpy() is None:
+            raise ValueError("The numpy layout backend needs numpy to be installed.")
+        if backend == "auto":
+            use_numpy = _import_numpy() is not None and len(automaton_builder.states) >= self.NUMPY_MIN_STATES
+            backend = "numpy" if use_numpy else "python"
+        self._backend = backend
+
+    @property
+    def automaton_builder(self) -> AutomatonBuilder:
+        return self._automaton_builder
+
+    @property
+    def spacing(self) -> float:
+        return self._spacing
+
+    @property
+    def coarsest_size(self) -> int:
+        return self._coarsest_size
+
+    @property
+    def iterations(self) -> int:
+        return self._iterations
+
+    @property
+    def coarsest_iterations(self) -> int:
+        return self._coarsest_iterations
+
+    @property
+    def cooling(self) -> float:
+        return self._cooling
+
+    @property
+    def tolerance(self) -> float:
+        return self._tolerance
+
+    @property
+    def theta(self) -> float:
+        return self._theta
+
+    @property
+    def backend(self) -> str:
+        return self._backend
+
+    @property
+    def seed(self) -> int | None:
+        return self._seed
+
+    @property
+    def level_sizes(self) -> list[int]:
+        return self._level_sizes
+
+    @property
+    def iterations_run(self) -> int:
+        return self._iterations_run
+
+    @property
+    def positions(self) -> dict[int, tuple[float, float]]:
+        return self._positions
+
+    def calculate_layout(self) -> None:
+        state_ids = [state.id for state in self._automaton_builder.states]
+        index = {state_id: i for i, state_id in enumerate(state_ids)}
+        self._iterations_run = 0
+        self._random = random.Random(self._seed)  # every call with a seed gives the same layout
+        if not state_ids:
+            self._level_sizes = []
+            self._positions = {}
+            return
+
+        # A level is the transitions between its states (as {neighbour: transition count} for each state, in both
+        # directions and without loops) and how many states of the automaton each of its states stands for
+        adjacency: list[dict[int, int]] = [{} for _ in state_ids]
+        for transition in self._automaton_builder.transitions:
+            node_from = index[transition.state_from.id]
+            node_to = index[transition.state_to.id]
+            if node_from != node_to:
+                adjacency[node_from][node_to] = adjacency[node_from].get(node_to, 0) + 1
+                adjacency[node_to][node_from] = adjacency[node_to].get(node_from, 0) + 1
+        levels = [adjacency]
+        masses = [1] * len(state_ids)
+        parents: list[list[int]] = []  # parents[level][node] is the node of level + 1 it was merged into
+        while len(levels[-1]) > self._coarsest_size:
+            parent, coarse_adjacency, masses = self._coarsen(levels[-1], masses)
+            if len(coarse_adjacency) > (1 - self.MIN_SHRINK) * len(levels[-1]):
+                break
+            parents.append(parent)
+            levels.append(coarse_adjacency)
+        self._level_sizes = [len(level) for level in levels]
+
+        natural_length = self._spacing * self.LEVEL_SCALE ** (len(levels) - 1)
+        side = natural_length * math.sqrt(len(levels[-1]))
+        positions = [(self._random.uniform(0, side), self._random.uniform(0, side)) for _ in levels[-1]]
+        positions = self._refine(levels[-1], positions, natural_length, side / 2, self._coarsest_iterations)
+        for level in range(len(levels) - 2, -1, -1):
+            natural_length /= self.LEVEL_SCALE
+            positions = self._interpolate(parents[level], positions, natural_length)
+            positions = self._refine(levels[level], positions, natural_length, natural_length, self._iterations)
+
+        self._positions = {state_id: positions[i] for i, state_id in enumerate(state_ids)}
+
+    def _coarsen(self, adjacency: list[dict[int, int]], masses: list[int]) \
+            -> tuple[list[int], list[dict[int, int]], list[int]]:
+        # Heavy edge matching in a random order, preferring the lighter neighbour on ties so merged states stay
+        # about the same size
+        order = list(range(len(adjacency)))
+        self._random.shuffle(order)
+        parent = [-1] * len(adjacency)
+        coarse_masses: list[int] = []
+        for node in order:
+            if parent[node] != -1:
+                continue
+            best = -1
+            best_key = (0, 0)
+            for neighbour, weight in adjacency[node].items():
+                if parent[neighbour] == -1 and (weight, -masses[neighbour]) > best_key:
+                    best = neighbour
+                    best_key = (weight, -masses[neighbour])
+            parent[node] = len(coarse_masses)
+            if best == -1:
+                coarse_masses.append(masses[node])
+            else:
+                parent[best] = parent[node]
+                coarse_masses.append(masses[node] + masses[best])
+
+        coarse_adjacency: list[dict[int, int]] = [{} for _ in coarse_masses]
+        for node, neighbours in enumerate(adjacency):
+            coarse_node = parent[node]
+            coarse_neighbours = coarse_adjacency[coarse_node]
+            for neighbour, weight in neighbours.items():
+                coarse_neighbour = parent[neighbour]
+                if coarse_neighbour != coarse_node:
+                    coarse_neighbours[coarse_neighbour] = coarse_neighbours.get(coarse_neighbour, 0) + weight
+        return parent, coarse_adjacency, coarse_masses
+
+    def _interpolate(self, parent: list[int], coarse_positions: list[tuple[float, float]],
+                     natural_length: float) -> list[tuple[float, float]]:
+        # Each state starts where the state it was merged into is, shifted a little so merged pairs can separate
+        jitter = natural_length / 4
+        return [(coarse_positions[coarse_node][0] + self._random.uniform(-jitter, jitter),
+                 coarse_positions[coarse_node][1] + self._random.uniform(-jitter, jitter)) for coarse_node in parent]
+
+    def _refine(self, adjacency: list[dict[int, int]], positions: list[tuple[float, float]], natural_length: float,
+                start_step: float, iterations: int) -> list[tuple[float, float]]:
+        edges = [(node, neighbour) for node, neighbours in enumerate(adjacency)
+                 for neighbour in neighbours if node < neighbour]
+        if self._backend == "numpy":
+            return self._refine_numpy(edges, positions, natural_length, start_step, iterations)
+        return self._refine_python(edges, positions, natural_length, start_step, iterations)
+
+    def _refine_python(self, edges: list[tuple[int, int]], positions: list[tuple[float, float]],
+                       natural_length: float, start_step: float, iterations: int) -> list[tuple[float, float]]:
+        radius = 2 * natural_length
+        radius_sq = radius * radius
+        repulsion = self.REPULSION_STRENGTH * natural_length * natural_length
+        step = start_step
+        for _ in range(iterations):
+            tree = QuadTree(positions, leaf_size=self.LEAF_SIZE)
+            forces = []
+            for x, y in positions:
+                # C k^2 / d along (dx, dy) / d
+                force_x = force_y = 0.0
+                for other_x, other_y, mass in tree.approximate(x, y, self._theta, radius):
+                    dx = x - other_x
+                    dy = y - other_y
+                    distance_sq = dx * dx + dy * dy
+                    if 0 < distance_sq < radius_sq:
+                        weight = mass * repulsion / distance_sq
+                        force_x += weight * dx
+                        force_y += weight * dy
+                forces.append([force_x, force_y])
+
+            for node, neighbour in edges:
+                # d^2 / k along (dx, dy) / d
+                dx = positions[neighbour][0] - positions[node][0]
+                dy = positions[neighbour][1] - positions[node][1]
+                scale = math.sqrt(dx * dx + dy * dy) / natural_length
+                forces[node][0] += dx * scale
+                forces[node][1] += dy * scale
+                forces[neighbour][0] -= dx * scale
+                forces[neighbour][1] -= dy * scale
+
+            max_displacement = 0.0
+            for node, (force_x, force_y) in enumerate(forces):
+                magnitude = math.sqrt(force_x * force_x + force_y * force_y)
+                if magnitude > 0:
+                    displacement = min(magnitude, step)
+                    positions[node] = (positions[node][0] + force_x / magnitude * displacement,
+                                       positions[node][1] + force_y / magnitude * displacement)
+                    max_displacement = max(max_displacement, displacement)
+
+            self._iterations_run += 1
+            step *= self._cooling
+            if max_displacement < self._tolerance * natural_length:
+                break
+        return positions
+
+    def _refine_numpy(self, edges: list[tuple[int, int]], positions: list[tuple[float, float]],
+                      natural_length: float, start_step: float, iterations: int) -> list[tuple[float, float]]:
+        # Same forces as the python backend, computed for every state at once
+        np = _import_numpy()
+        node_count = len(positions)
+        radius = 2 * natural_length
+        repulsion = self.REPULSION_STRENGTH * natural_length * natural_length
+        points = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        edges_from = np.array([node for node, _ in edges], dtype=np.intp)
+        edges_to = np.array([neighbour for _, neighbour in edges], dtype=np.intp)
+        step = start_step
+        for _ in range(iterations):
+            forces = np.zeros((node_count, 2), dtype=np.float64)
+            tree = QuadTree(points.tolist(), leaf_size=self.LEAF_SIZE)
+            node, other_x, other_y, mass = tree.approximate_all(self._theta, radius)
+            dx = points[node, 0] - other_x
+            dy = points[node, 1] - other_y
+            distance_sq = dx * dx + dy * dy
+            close = (distance_sq > 0) & (distance_sq < radius * radius)
+            np.maximum(distance_sq, 1e-12, out=distance_sq)  # the weight of coincident states is masked out below
+            weight = mass * repulsion / distance_sq
+            weight *= close
+            forces[:, 0] += np.bincount(node, weight * dx, node_count)
+            forces[:, 1] += np.bincount(node, weight * dy, node_count)
+
+            if len(edges_from):
+                dx = points[edges_to, 0] - points[edges_from, 0]
+                dy = points[edges_to, 1] - points[edges_from, 1]
+                scale = np.sqrt(dx * dx + dy * dy) / natural_length
+                dx *= scale
+                dy *= scale
+                forces[:, 0] += np.bincount(edges_from, dx, node_count) - np.bincount(edges_to, dx, node_count)
+                forces[:, 1] += np.bincount(edges_from, dy, node_count) - np.bincount(edges_to, dy, node_count)
+
+            magnitude = np.sqrt(forces[:, 0] * forces[:, 0] + forces[:, 1] * forces[:, 1])
+            displacement = np.minimum(magnitude, step)
+            scale = np.zeros_like(magnitude)
+            np.divide(displacement, magnitude, out=scale, where=magnitude > 0)
+            points += forces * scale[:, None]
+
+            self._iterations_run += 1
+            step *= self._cooling
+            if float(displacement.max()) < self._tolerance * natural_length:
+                break
+        return [(float(x), float(y)) for x, y in points.tolist()]
+
+    def get_positions(self) -> dict[int, tuple[float, float]]:
+        return self._positions
@@ -6,6 +6,16 @@ import tkinter as ttk
 import time
 import math
 from functools import cache
+from typing import Protocol
+
+
+class PositionSource(Protocol):
+    # Anything calculating positions in the background that can be polled for them, e.g. a LayoutWorker
+
+    @property
+    def busy(self) -> bool: ...
+
+    def poll(self) -> dict[int, tuple[float, float]] | None: ...
 
 
 class UpdateJob:
@@ -28,6 +38,8 @@ class UpdateJob:
         a command to be called when the job is closed (to be left as None if not used)
     update_exec_cmd -> Callable[..., None]:
         a command to be called on every frame while the job is running (to be left as None if not used)
+    finished -> bool:
+        whether the job has finished before its duration is up (always False unless overridden)
 
     (protected) start_time -> int:
         used by the update manager to save the start time of the job
@@ -74,6 +86,10 @@ class UpdateJob:
     def update_tag(self) -> str:
         return self._update_tag
 
+    @property
+    def finished(self) -> bool:
+        return False
+
 
 class PulseColour(UpdateJob):
     """
@@ -143,6 +159,51 @@ class PulseColour(UpdateJob):
         self._master.itemconfigure(self._tag_bind_id, fill=self._item_colour)
 
 
+class LayoutAnimation(UpdateJob):
+    """
+    A possible job for this tkinter update manager to show the positions of a layout as it is calculated
+    (Note: finishes once the worker has no layout running and every position has been shown)
+
+
+    ...
+
+
+    Attributes
+    ----------
+    worker -> PositionSource:
+        the worker calculating the layout (e.g. a LayoutWorker)
+    apply_positions -> Callable[[dict[int, tuple[float, float]]], None]:
+        a command moving the rendered states to the positions of each state id
+    duration -> int:
+        the longest the animation runs for on nanoseconds
+    """
+
+    def __init__(self, worker: PositionSource, apply_positions: Callable[[dict[int, tuple[float, float]]], None],
+                 duration: int = int(60e+9)):
+        UpdateJob.__init__(self, duration, "layout_animation", update_exec_cmd=self._show_latest,
+                           final_exec_cmd=self._show_latest)
+
+        self._worker = worker
+        self._apply_positions = apply_positions
+
+    @property
+    def worker(self) -> PositionSource:
+        return self._worker
+
+    @property
+    def apply_positions(self) -> Callable[[dict[int, tuple[float, float]]], None]:
+        return self._apply_positions
+
+    @property
+    def finished(self) -> bool:
+        return not self._worker.busy
+
+    def _show_latest(self):
+        positions = self._worker.poll()
+        if positions is not None:
+            self._apply_positions(positions)
+
+
 class RealTimeUpdateManager:
     """
     An update manager for tkinter interfaces to control real time changes
@@ -199,7 +260,7 @@ class RealTimeUpdateManager:
         for job in self._todo:
             if not job.start_time == 0:
                 time_elapsed = time.time_ns() - job.start_time
-                if time_elapsed > job.duration:
+                if time_elapsed > job.duration or job.finished:
                     if job.final_exec:
                         job.final_exec()
                     continue
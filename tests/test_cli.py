@@ -0,0 +1,62 @@
+# FlippyFlappingTheJ
+# ./tests/test_cli.py
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from src.cli import main
+
+EXAMPLE_LSF = os.path.join(os.path.dirname(__file__), "..", "src", "utils", "Language", "example", "example2.lsf")
+
+
+def run_cli(*argv: str) -> str:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        main(list(argv))
+    return output.getvalue()
+
+
+class ConvertedAutomatonTest(unittest.TestCase):
+    # Files store states sorted by their id as a string ("0", "1", "10", "11", "2", ...), so with more than 10
+    # states the start state's id is not its position once the automaton is loaded again
+
+    INPUTS = ["aa", "ab", "aaa", "aaabbb", "aab", "aabaaa"]
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.expected = run_cli("run", EXAMPLE_LSF, *self.INPUTS)
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def test_example_has_more_than_ten_states(self):
+        fp = os.path.join(self._folder.name, "converted.automaton")
+        self.assertIn("12 states", run_cli("convert", EXAMPLE_LSF, fp))
+
+    def test_converted_file_runs_like_language(self):
+        fp = os.path.join(self._folder.name, "converted.automaton")
+        run_cli("convert", EXAMPLE_LSF, fp)
+        self.assertEqual(run_cli("run", fp, *self.INPUTS), self.expected)
+
+    def test_minimised_file_runs_like_language(self):
+        converted_fp = os.path.join(self._folder.name, "converted.automaton")
+        minimised_fp = os.path.join(self._folder.name, "minimised.automaton")
+        run_cli("convert", EXAMPLE_LSF, converted_fp)
+        run_cli("minimise", converted_fp, minimised_fp)
+        self.assertEqual(run_cli("run", minimised_fp, *self.INPUTS), self.expected)
+
+    def test_binary_file_runs_like_language(self):
+        converted_fp = os.path.join(self._folder.name, "converted.automaton")
+        binary_fp = os.path.join(self._folder.name, "converted.bautomaton")
+        run_cli("convert", EXAMPLE_LSF, converted_fp)
+        run_cli("pack", converted_fp, binary_fp)
+        reloaded_fp = os.path.join(self._folder.name, "reloaded.automaton")
+        run_cli("pack", binary_fp, reloaded_fp)
+        self.assertEqual(run_cli("run", reloaded_fp, *self.INPUTS), self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()